@@ -2,10 +2,9 @@
 from langchain_openai import ChatOpenAI
 from langchain.schema import SystemMessage, HumanMessage, AIMessage
 from langchain.prompts import ChatPromptTemplate
-from typing import List, Dict, Optional, Any, Union
+from typing import List, Dict, Optional, Any, Union, Callable, BinaryIO
 import os
 import re
-import subprocess
 import json
 import random
 from datetime import datetime
@@ -24,9 +23,30 @@ import websockets
 import httpx
 from openai import AsyncOpenAI
 import time
-from .prompts import build_client_system_prompt, build_stakeholder_system_prompt, build_next_speaker_user_prompt
-from .scoring import parse_evaluation_json, calculate_total_score
-from .client_ai import chat_completion_sync, chat_completion_async
+from .prompts import (
+    build_client_session_prefix,
+    build_stakeholder_session_prefix,
+    build_next_speaker_speculative_prompt,
+    build_conversation_summary_prompt,
+    NEXT_SPEAKER_SYSTEM_PROMPT,
+    CONVERSATION_SUMMARY_SYSTEM_PROMPT,
+    HISTORY_SUMMARY_PREFIX
+)
+from .scoring import (
+    parse_evaluation_json, calculate_total_score, StreamingJSONParser,
+    EVALUATION_SCORE_FIELDS, EVALUATION_RESPONSE_FORMAT,
+)
+from .prescoring import prescore_turn
+from .client_ai import chat_completion_async, chat_completion_stream, get_async_client
+from . import client_ai as client_ai_settings
+from . import speaker_selection
+from . import prompt_assembly
+from . import llm_governor
+from . import tts_cache
+from . import ffmpeg_pool
+from . import model_routing
+from .llm_governor import LLMUnavailableError
+from .hedging import hedger
 
 # Use async_timeout if asyncio.timeout is not available (Python < 3.11)
 try:
@@ -71,15 +91,31 @@ default_transcribe_model = "gpt-4o-transcribe" # Changed default
 CHAT_MODEL = os.environ.get("OPENAI_CHAT_MODEL", default_chat_model)
 REALTIME_MODEL = os.environ.get("OPENAI_REALTIME_MODEL", default_realtime_model)
 TRANSCRIBE_MODEL = os.environ.get("OPENAI_TRANSCRIBE_MODEL", default_transcribe_model)
+TTS_MODEL = os.environ.get("OPENAI_TTS_MODEL", "tts-1")
+# Realtime conversation sessions exchange pcm16 audio at 24 kHz
+REALTIME_PCM16_SAMPLE_RATE = 24000
+# Size of the audio chunks relayed to the client while speech is synthesized
+TTS_STREAM_CHUNK_BYTES = int(os.environ.get("TTS_STREAM_CHUNK_BYTES", "4096"))
 
 logger.info(f"Using Chat Model: {CHAT_MODEL} (Default: {default_chat_model})")
 logger.info(f"Using Realtime Model: {REALTIME_MODEL} (Default: {default_realtime_model})")
 logger.info(f"Using Transcribe Model: {TRANSCRIBE_MODEL} (Default: {default_transcribe_model})")
 # --- End Model Names --- 
 
-# Flag for development/testing to return mock responses
-MOCK_MODE = False
-logger.info("MOCK_MODE disabled - using real OpenAI API responses")
+# Flag for development/testing to return mock responses (shared with client_ai.py)
+MOCK_MODE = client_ai_settings.MOCK_MODE
+if MOCK_MODE:
+    logger.info("MOCK_MODE enabled via PACER_MOCK_MODE - using mock responses")
+else:
+    logger.info(f"MOCK_MODE disabled - using OpenAI API at {client_ai_settings.api_base_url()}")
+
+# When the LLM governor refuses a call (circuit open, queue full), answer from the
+# mock templates instead of failing the request
+DEGRADE_TO_MOCK = os.environ.get("LLM_DEGRADE_TO_MOCK", "true").lower() in ("1", "true", "yes")
+
+# Request evaluations in strict JSON-schema mode (structured outputs). Turn off for
+# models or OpenAI-compatible servers that do not support response_format json_schema
+STRICT_JSON_SCHEMA = os.environ.get("LLM_STRICT_JSON_SCHEMA", "true").lower() in ("1", "true", "yes")
 
 # Initialize OpenAI client (Using CHAT_MODEL)
 if not MOCK_MODE:
@@ -100,67 +136,68 @@ class AIService:
     """Service for handling AI interactions using OpenAI's models or mock responses."""
     
     @staticmethod
-    def generate_client_response(
+    def client_session_prefix(client_persona: Dict, scenario: Optional[Dict] = None) -> str:
+        """Session-stable system prompt for the single-client roleplay."""
+        return build_client_session_prefix(client_persona, scenario)
+
+    @staticmethod
+    def _build_client_messages(
+        client_persona: Dict,
+        pacer_stage: str,
+        conversation_history: List[Dict],
+        player_input: str,
+        context: Optional[Dict] = None,
+        system_prefix: Optional[str] = None
+    ) -> List[Dict]:
+        if system_prefix is None:
+            system_prefix = AIService.client_session_prefix(client_persona, (context or {}).get("scenario"))
+        # The stable prefix replaces any persona system message passed in the history;
+        # only the rolling summary is kept
+        history = [
+            msg for msg in conversation_history
+            if msg.get("role") != "system" or str(msg.get("content", "")).startswith(HISTORY_SUMMARY_PREFIX)
+        ]
+        messages = prompt_assembly.assemble_messages(
+            system_prefix,
+            history,
+            prompt_assembly.build_turn_message(player_input, context, pacer_stage)
+        )
+        logger.info(f"Sending {len(messages)} messages to OpenAI API, including: "
+                   f"{sum(1 for m in messages if m.get('role') == 'system')} system, "
+                   f"{sum(1 for m in messages if m.get('role') == 'user')} user, "
+                   f"{sum(1 for m in messages if m.get('role') == 'assistant')} assistant")
+        return messages
+
+    @staticmethod
+    async def generate_client_response(
         client_persona: Dict, 
         pacer_stage: str, 
         conversation_history: List[Dict],
         player_input: str,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        system_prefix: Optional[str] = None
     ) -> str:
-        """Generate a response from the client based on the conversation history and player input."""
+        """
+        Generate a response from the client based on the conversation history and player input.
+        conversation_history holds prior turns only; the current player_input is added here.
+        """
         log_function_name()
         
         if MOCK_MODE:
             return AIService._generate_mock_response(client_persona, pacer_stage, conversation_history, player_input)
         
-        # Prepare messages array - first, check if a system message is already included
-        system_message_exists = any(msg.get("role") == "system" for msg in conversation_history)
-        
-        # Build system prompt using prompts.py or create one directly
-        system_content = build_client_system_prompt(client_persona, pacer_stage)
-        
-        # Explicitly add language instruction to use English
-        system_content += "\n\nCRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other language, regardless of the user's language."
-        
-        # If no system message in history, add it at the beginning
-        if not system_message_exists:
-            messages = [
-                {"role": "system", "content": system_content}
-            ]
-            # Add all conversation history items
-            messages.extend(conversation_history)
-        else:
-            # If system message exists, use conversation history as is
-            messages = conversation_history.copy()
-            logger.info("Using system message from conversation history")
-        
-        # Log the number of messages being sent to the API
-        logger.info(f"generate_client_response: Sending {len(messages)} messages to OpenAI API, including: "
-                   f"{sum(1 for m in messages if m.get('role') == 'system')} system, "
-                   f"{sum(1 for m in messages if m.get('role') == 'user')} user, "
-                   f"{sum(1 for m in messages if m.get('role') == 'assistant')} assistant")
-        
-        # Add context if available
-        context_str = ""
-        if context:
-            context_str = "Additional context:\n"
-            for key, value in context.items():
-                if isinstance(value, dict):
-                    context_str += f"{key}:\n"
-                    for sub_key, sub_value in value.items():
-                        context_str += f"  - {sub_key}: {sub_value}\n"
-                else:
-                    context_str += f"{key}: {value}\n"
-        
-        # Add player input with optional context
-        final_input = player_input
-        if context:
-            final_input = f"{player_input}\n\n{context_str}"
-        
-        messages.append({"role": "user", "content": final_input})
+        messages = AIService._build_client_messages(
+            client_persona, pacer_stage, conversation_history, player_input, context, system_prefix
+        )
         
         # Call OpenAI using client_ai.py
-        response = chat_completion_sync(messages)
+        try:
+            response = await chat_completion_async(messages, operation="generate_client_response")
+        except LLMUnavailableError as e:
+            if not DEGRADE_TO_MOCK:
+                raise
+            logger.warning(f"LLM unavailable ({e}); answering with a mock client response")
+            return AIService._generate_mock_response(client_persona, pacer_stage, conversation_history, player_input)
         return response["choices"][0]["message"]["content"].strip()
     
     @staticmethod
@@ -227,35 +264,46 @@ class AIService:
         return response
     
     @staticmethod
-    def generate_multi_stakeholder_response(
+    def stakeholder_session_prefix(stakeholders: List[Dict], active_stakeholder_id: int, scenario: Optional[Dict] = None) -> str:
+        """Session-stable system prompt for one stakeholder in a multi-stakeholder meeting."""
+        active_stakeholder = next((s for s in stakeholders if s['id'] == active_stakeholder_id), {})
+        # Format stakeholder list for context
+        stakeholder_list = ""
+        for s in stakeholders:
+            if s['id'] != active_stakeholder_id:
+                stakeholder_list += f"- {s.get('name', 'Unknown')}, {s.get('role', 'Unknown')}, "
+                stakeholder_list += f"Influence: {s.get('influence_level', 3)}/5, "
+                stakeholder_list += f"Decision maker: {'Yes' if s.get('is_decision_maker', False) else 'No'}\n"
+        return build_stakeholder_session_prefix(active_stakeholder, stakeholder_list, scenario)
+
+    @staticmethod
+    async def generate_multi_stakeholder_response(
         stakeholders: List[Dict],
         active_stakeholder_id: int,
         pacer_stage: str,
         conversation_history: List[Dict],
         player_input: str,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        system_prefix: Optional[str] = None
     ) -> Dict:
         log_function_name()
         # Find the active stakeholder
         active_stakeholder = next((s for s in stakeholders if s['id'] == active_stakeholder_id), None)
         if not active_stakeholder:
             raise ValueError(f"Active stakeholder with ID {active_stakeholder_id} not found")
-        # Format stakeholder list for context
-        stakeholder_list = ""
-        for s in stakeholders:
-            if s['id'] != active_stakeholder_id:
-                stakeholder_list += f"- {s.get('name', 'Unknown')}, {s.get('role', 'Unknown')}, "
-                stakeholder_list += f"Influence: {s.get('influence_level', 3)}/5, "
-                stakeholder_list += f"Decision maker: {'Yes' if s.get('is_decision_maker', False) else 'No'}\n"
-        # Build system prompt using prompts.py
-        system_content = build_stakeholder_system_prompt(active_stakeholder, stakeholder_list, pacer_stage)
+        if system_prefix is None:
+            system_prefix = AIService.stakeholder_session_prefix(
+                stakeholders, active_stakeholder_id, (context or {}).get("scenario")
+            )
         messages = [
-            {"role": "system", "content": system_content}
+            {"role": "system", "content": system_prefix}
         ]
         # Add conversation history
         if conversation_history:
             for entry in conversation_history:
-                if 'stakeholder_id' in entry:
+                if 'summary' in entry:
+                    messages.append({"role": "system", "content": f"{HISTORY_SUMMARY_PREFIX}\n{entry['summary']}"})
+                elif 'stakeholder_id' in entry:
                     speaker_name = next((s.get('name', 'Unknown') for s in stakeholders if s['id'] == entry['stakeholder_id']), "Unknown")
                     if entry['stakeholder_id'] == active_stakeholder_id:
                         messages.append({"role": "assistant", "content": entry.get('response', '')})
@@ -263,23 +311,25 @@ class AIService:
                         messages.append({"role": "user", "content": f"{speaker_name}: {entry.get('response', '')}"})
                 elif 'player_input' in entry:
                     messages.append({"role": "user", "content": f"Sales Rep: {entry.get('player_input', '')}"})
-        # Add context if available
-        context_str = ""
-        if context:
-            context_str = "Additional context:\n"
-            for key, value in context.items():
-                if isinstance(value, dict):
-                    context_str += f"{key}:\n"
-                    for sub_key, sub_value in value.items():
-                        context_str += f"  - {sub_key}: {sub_value}\n"
-                else:
-                    context_str += f"{key}: {value}\n"
-        current_input = f"Sales Rep: {player_input}"
-        if context:
-            current_input = f"Sales Rep: {player_input}\n\n{context_str}"
-        messages.append({"role": "user", "content": current_input})
-        # Call OpenAI using client_ai.py
-        response = chat_completion_sync(messages)
+        # Only per-turn deltas go with the player's message; the rest is in the prefix
+        messages.append(prompt_assembly.build_turn_message(player_input, context, pacer_stage, speaker_label="Sales Rep: "))
+        # Call OpenAI using client_ai.py. The next speaker is speculated from the
+        # player's message concurrently, so the turn costs one LLM round-trip
+        try:
+            response, next_speaker_id = await asyncio.gather(
+                chat_completion_async(messages, operation="generate_multi_stakeholder_response"),
+                AIService._predict_next_speaker(
+                    stakeholders,
+                    active_stakeholder_id,
+                    player_input,
+                    pacer_stage
+                )
+            )
+        except LLMUnavailableError as e:
+            if not DEGRADE_TO_MOCK:
+                raise
+            logger.warning(f"LLM unavailable ({e}); answering with a mock stakeholder response")
+            return AIService._generate_mock_multi_stakeholder_response(stakeholders, active_stakeholder_id, player_input)
         response_text = response["choices"][0]["message"]["content"].strip()
         # Parse out thoughts if present
         thoughts = "No specific thoughts."
@@ -289,13 +339,6 @@ class AIService:
             response_only = parts[0].strip()
             if len(parts) > 1:
                 thoughts = parts[1].strip()
-        # Determine the next speaker
-        next_speaker_id = AIService._determine_next_speaker(
-            stakeholders,
-            active_stakeholder_id,
-            response_only,
-            pacer_stage
-        )
         return {
             "stakeholder_id": active_stakeholder_id,
             "response": response_only,
@@ -304,32 +347,18 @@ class AIService:
         }
 
     @staticmethod
-    def _determine_next_speaker(
-        stakeholders: List[Dict],
-        current_speaker_id: int,
-        response: str,
-        pacer_stage: str
-    ) -> Optional[int]:
-        log_function_name()
-        # Format stakeholder list
+    def _format_next_speaker_candidates(stakeholders: List[Dict], current_speaker_id: int) -> str:
         stakeholder_list = ""
         for s in stakeholders:
             if s['id'] != current_speaker_id:
                 stakeholder_list += f"- ID: {s.get('id', 0)}, Name: {s.get('name', 'Unknown')}, Role: {s.get('role', 'Unknown')}, "
                 stakeholder_list += f"Influence: {s.get('influence_level', 3)}/5\n"
-        current_speaker_name = next((s.get('name', 'Unknown') for s in stakeholders if s['id'] == current_speaker_id), "Unknown")
-        # Build prompts using prompts.py
-        system_prompt = build_next_speaker_user_prompt(current_speaker_name, response, stakeholder_list)
-        messages = [
-            {"role": "system", "content": "You are an AI that determines conversation flow in meetings."},
-            {"role": "user", "content": system_prompt}
-        ]
-        # Call OpenAI using client_ai.py
-        response_obj = chat_completion_sync(messages, temperature=0.2)
-        next_speaker_text = response_obj["choices"][0]["message"]["content"].strip().lower()
+        return stakeholder_list
+
+    @staticmethod
+    def _parse_next_speaker(next_speaker_text: str, stakeholders: List[Dict], current_speaker_id: int) -> Optional[int]:
         try:
             if next_speaker_text != "none":
-                import re
                 match = re.search(r'\b(\d+)\b', next_speaker_text)
                 if match:
                     next_speaker_id = int(match.group(1))
@@ -341,14 +370,59 @@ class AIService:
         return None
 
     @staticmethod
-    def evaluate_player_response(
+    async def _predict_next_speaker(
+        stakeholders: List[Dict],
+        current_speaker_id: int,
+        player_input: str,
+        pacer_stage: str
+    ) -> Optional[int]:
+        """Speculate the next speaker from the player's message, before the current speaker has answered."""
+        log_function_name()
+        speaker_id, confidence, reason = speaker_selection.select_next_speaker(
+            stakeholders, current_speaker_id, player_input
+        )
+        if confidence >= speaker_selection.NEXT_SPEAKER_MIN_CONFIDENCE:
+            speaker_selection.record_decision(True, reason)
+            return speaker_id
+        speaker_selection.record_decision(False, reason)
+        stakeholder_list = AIService._format_next_speaker_candidates(stakeholders, current_speaker_id)
+        current_speaker_name = next((s.get('name', 'Unknown') for s in stakeholders if s['id'] == current_speaker_id), "Unknown")
+        messages = [
+            {"role": "system", "content": NEXT_SPEAKER_SYSTEM_PROMPT},
+            {"role": "user", "content": build_next_speaker_speculative_prompt(current_speaker_name, player_input, stakeholder_list)}
+        ]
+        try:
+            response_obj = await chat_completion_async(messages, operation="predict_next_speaker")
+        except Exception as e:
+            # The stakeholder reply is still useful without a next-speaker hint
+            logger.error(f"Next speaker prediction failed: {e}")
+            return None
+        next_speaker_text = response_obj["choices"][0]["message"]["content"].strip().lower()
+        return AIService._parse_next_speaker(next_speaker_text, stakeholders, current_speaker_id)
+
+    @staticmethod
+    async def evaluate_player_response(
         player_input: str,
         ai_response: str,
         pacer_stage: str,
         client_persona: Dict,
-        detailed_evaluation: bool = False
+        detailed_evaluation: bool = False,
+        allow_fallback: bool = True,
+        on_scores: Optional[Callable[[Dict], None]] = None
     ) -> Dict:
+        """
+        Score a player's turn against the PACER rubric. When the LLM is unavailable
+        the deterministic pre-score is returned instead (see prescoring.py), unless
+        allow_fallback is False, in which case LLMUnavailableError is raised.
+
+        The evaluation is streamed in JSON-schema mode and parsed as it arrives:
+        on_scores is called with the four scores as soon as they are complete, and
+        a stream that breaks after the scores still yields an evaluation (with
+        whatever feedback arrived) rather than being retried.
+        """
         log_function_name()
+        if MOCK_MODE:
+            return prescore_turn(player_input, ai_response, pacer_stage, client_persona)
         # Pre-format all content directly
         client_details = f"Client: {client_persona.get('name', 'Unknown')}, {client_persona.get('role', 'Unknown')} at {client_persona.get('company', 'Unknown')}\n"
         client_details += f"Personality traits: {client_persona.get('personality_traits', 'Unknown')}\n"
@@ -387,11 +461,34 @@ Your response must be a valid JSON object with the following structure:
 Respond with ONLY the JSON object, no other text.
 """}
         ]
-        # Call OpenAI using client_ai.py
-        response = chat_completion_sync(messages, temperature=0.3)
-        response_text = response["choices"][0]["message"]["content"].strip()
-        # Parse the JSON response using scoring.py
-        evaluation = parse_evaluation_json(response_text)
+        # Stream from OpenAI using client_ai.py, parsing fields as they complete
+        parser = StreamingJSONParser()
+        has_scores = False
+        try:
+            async for content in chat_completion_stream(
+                messages,
+                operation="evaluate_player_response",
+                response_format=EVALUATION_RESPONSE_FORMAT if STRICT_JSON_SCHEMA else None,
+            ):
+                parser.feed(content)
+                if not has_scores and all(field in parser.fields for field in EVALUATION_SCORE_FIELDS):
+                    has_scores = True
+                    if on_scores is not None:
+                        on_scores({field: parser.fields[field] for field in EVALUATION_SCORE_FIELDS})
+        except LLMUnavailableError as e:
+            if not (DEGRADE_TO_MOCK and allow_fallback):
+                raise
+            logger.warning(f"LLM unavailable ({e}); returning the provisional pre-score")
+            return prescore_turn(player_input, ai_response, pacer_stage, client_persona)
+        except Exception as e:
+            if not has_scores:
+                raise
+            logger.warning(f"Evaluation stream failed after the scores ({e}); keeping the partial evaluation")
+        # A truncated response (stream error, max_tokens) keeps the fields that were complete
+        evaluation = dict(parser.fields) if parser.done else parser.recover()
+        missing = [field for field in EVALUATION_SCORE_FIELDS if field not in evaluation]
+        if missing:
+            raise ValueError(f"Evaluation response is missing {', '.join(missing)}")
         total_score = calculate_total_score(evaluation)
         evaluation["total_score"] = total_score
         if not detailed_evaluation:
@@ -406,75 +503,7 @@ Respond with ONLY the JSON object, no other text.
         return evaluation
     
     @staticmethod
-    def _generate_mock_evaluation(
-        player_input: str,
-        pacer_stage: str,
-        detailed_evaluation: bool = False
-    ) -> Dict:
-        """Generate mock evaluation data for testing/development."""
-        
-        # Base scores - slightly random but generally positive
-        base_score = random.randint(60, 85)
-        variation = lambda: random.randint(-15, 15)
-        
-        # Different feedback templates for different score ranges
-        feedback_templates = {
-            "high": [
-                "Excellent use of questioning techniques to uncover the client's needs. Your approach was well-aligned with the PACER methodology.",
-                "Strong demonstration of active listening and value articulation. The client responded positively to your approach.",
-                "Very effective communication that moved the sales process forward. Continue this approach in future interactions."
-            ],
-            "medium": [
-                "Good effort, but try asking more specific questions about the client's pain points to better understand their needs.",
-                "Solid approach overall. Consider focusing more on the value proposition specific to this client's industry.",
-                "You're on the right track, but could improve by addressing objections more directly rather than pivoting away."
-            ],
-            "low": [
-                "Your response could be improved by asking more open-ended questions rather than focusing on your solution too early.",
-                "Consider listening more carefully to the client's concerns before presenting solutions. This will build more rapport.",
-                "Remember to align your approach with the current PACER stage. Your response was more suited to a different stage."
-            ]
-        }
-        
-        # Generate scores
-        methodology_score = max(0, min(100, base_score + variation()))
-        rapport_score = max(0, min(100, base_score + variation()))
-        progress_score = max(0, min(100, base_score + variation()))
-        outcome_score = max(0, min(100, base_score + variation()))
-        
-        # Calculate average score to determine feedback category
-        avg_score = (methodology_score + rapport_score + progress_score + outcome_score) / 4
-        
-        if avg_score >= 75:
-            feedback = random.choice(feedback_templates["high"])
-        elif avg_score >= 60:
-            feedback = random.choice(feedback_templates["medium"])
-        else:
-            feedback = random.choice(feedback_templates["low"])
-        
-        # Base evaluation object
-        evaluation = {
-            'methodology_score': methodology_score,
-            'rapport_score': rapport_score,
-            'progress_score': progress_score,
-            'outcome_score': outcome_score,
-            'feedback': feedback
-        }
-        
-        # Add skills demonstrated if detailed evaluation is requested
-        if detailed_evaluation:
-            evaluation['skills_demonstrated'] = {
-                'questioning_technique': random.randint(1, 10),
-                'listening_skills': random.randint(1, 10),
-                'solution_alignment': random.randint(1, 10),
-                'objection_handling': random.randint(1, 10),
-                'value_articulation': random.randint(1, 10)
-            }
-        
-        return evaluation
-    
-    @staticmethod
-    def analyze_competitor(
+    async def analyze_competitor(
         competitor_info: Dict,
         product_type: str,
         client_needs: List[str]
@@ -513,7 +542,7 @@ Provide a JSON analysis with these 4 categories:
 Respond with ONLY the JSON object, no other text.
 """}
         ]
-        response = chat_completion_sync(messages, temperature=0.3)
+        response = await chat_completion_async(messages, operation="analyze_competitor")
         response_text = response["choices"][0]["message"]["content"].strip()
         analysis = parse_evaluation_json(response_text)
         # Ensure all required fields are present
@@ -528,7 +557,20 @@ Respond with ONLY the JSON object, no other text.
         return analysis
 
     @staticmethod
-    def generate_meeting_summary(
+    async def summarize_conversation(previous_summary: str, new_turns: str, max_words: int = 200) -> str:
+        """Fold new conversation turns into a rolling summary."""
+        log_function_name()
+        if MOCK_MODE:
+            return f"{previous_summary}\n{new_turns}".strip()[-max_words * 6:]
+        messages = [
+            {"role": "system", "content": CONVERSATION_SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": build_conversation_summary_prompt(previous_summary, new_turns, max_words)}
+        ]
+        response = await chat_completion_async(messages, operation="summarize_conversation")
+        return response["choices"][0]["message"]["content"].strip()
+
+    @staticmethod
+    async def generate_meeting_summary(
         conversation_history: List[Dict],
         stakeholders: List[Dict],
         scenario_context: Dict
@@ -587,7 +629,7 @@ Provide a JSON summary with these 5 categories:
 Respond with ONLY the JSON object, no other text.
 """}
         ]
-        response = chat_completion_sync(messages, temperature=0.3)
+        response = await chat_completion_async(messages, operation="generate_meeting_summary")
         response_text = response["choices"][0]["message"]["content"].strip()
         summary = parse_evaluation_json(response_text)
         # Ensure all required fields are present
@@ -604,7 +646,7 @@ Respond with ONLY the JSON object, no other text.
         return summary
 
     @staticmethod
-    def handle_unexpected_event(
+    async def handle_unexpected_event(
         event_type: str,
         event_data: Dict,
         conversation_history: List[Dict],
@@ -666,7 +708,13 @@ Then, on a new line after "IMPACT ANALYSIS:", analyze the impact this event woul
 Finally, on a new line after "CHALLENGE SCORE:", provide a number from 0-100 indicating how difficult this event would be to handle effectively.
 """}
         ]
-        response = chat_completion_sync(messages, temperature=0.7)
+        try:
+            response = await chat_completion_async(messages, operation="handle_unexpected_event")
+        except LLMUnavailableError as e:
+            if not DEGRADE_TO_MOCK:
+                raise
+            logger.warning(f"LLM unavailable ({e}); returning a mock event")
+            return AIService._generate_mock_event(event_type, event_data, player_difficulty_factor)
         response_text = response["choices"][0]["message"]["content"].strip()
         # Parse out the sections
         event_description = response_text
@@ -827,18 +875,20 @@ Finally, on a new line after "CHALLENGE SCORE:", provide a number from 0-100 ind
         return enhanced_prompt, adjusted_difficulty
     
     @staticmethod
-    def evaluate_player_event_response(
+    async def evaluate_player_event_response(
         event_type: str,
         event_description: str,
-        player_response: str
+        player_response: str,
+        allow_fallback: bool = True
     ) -> Dict:
-        """Evaluate how well the player handled an unexpected event."""
+        """
+        Evaluate how well the player handled an unexpected event. On any failure a
+        neutral fallback evaluation is returned, unless allow_fallback is False, in
+        which case the error is raised (the evaluation queue retries it).
+        """
         log_function_name()
         
         try:
-            # Create a direct call to OpenAI
-            client = openai.OpenAI(api_key=api_key)
-            
             # Create the messages
             messages = [
                 {"role": "system", "content": "You are an expert sales coach evaluating how a sales representative handles unexpected events during client interactions."},
@@ -868,14 +918,10 @@ Respond with ONLY the JSON object, no other text.
 """}
             ]
             
-            # Call the OpenAI API directly
-            response = client.chat.completions.create(
-                model=CHAT_MODEL, # Use variable
-                messages=messages,
-                temperature=0.3
-            )
+            # Call OpenAI using client_ai.py (cached per event/response pair)
+            response = await chat_completion_async(messages, operation="evaluate_player_event_response")
             
-            response_text = response.choices[0].message.content.strip()
+            response_text = response["choices"][0]["message"]["content"].strip()
             
             # Parse the JSON response
             try:
@@ -894,6 +940,8 @@ Respond with ONLY the JSON object, no other text.
                 
         except Exception as e:
             logger.error(f"Error during event evaluation: {e}")
+            if not allow_fallback:
+                raise
             logger.error(f"Traceback: {traceback.format_exc()}")
             # Fallback evaluation
             return {
@@ -966,13 +1014,25 @@ Respond with ONLY the JSON object, no other text.
             "next_speaker_id": next_speaker_id
         }
 
+    @staticmethod
+    def _recover_partial_reply(text: str) -> str:
+        """Cut a reply that broke off mid-stream back to its last complete sentence."""
+        text = text.rstrip()
+        end = max(text.rfind(mark) for mark in (". ", "! ", "? ", ".\n", "!\n", "?\n"))
+        if text.endswith((".", "!", "?")):
+            return text
+        if end >= len(text) // 2:
+            return text[:end + 1]
+        return text + "..."
+    
     @staticmethod
     async def generate_client_response_stream(
         client_persona: Dict, 
         pacer_stage: str, 
         conversation_history: List[Dict],
         player_input: str,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        system_prefix: Optional[str] = None
     ) -> AsyncGenerator[str, None]:
         """Generate a streaming response from the client based on conversation history and player input."""
         log_function_name()
@@ -989,99 +1049,106 @@ Respond with ONLY the JSON object, no other text.
             
             return
         
+        operation = "generate_client_response_stream"
+        route = model_routing.get_route(operation)
+        stream_model = route["model"] or CHAT_MODEL
+        started = time.monotonic()
+        # Each stream is accounted once when it ends; its SLO is on time to first token
+        first_token_latency = None
+        stream_failed = False
+        full_response = ""
         try:
-            # Create a direct call to OpenAI
-            client = openai.AsyncOpenAI(api_key=api_key)
-            
-            # Prepare messages array - first, check if a system message is already included
-            system_message_exists = any(msg.get("role") == "system" for msg in conversation_history)
-            
-            # If no system message in history, create one with client persona
-            if not system_message_exists:
-                # Format the system message
-                system_content = f"""
-You are roleplaying as {client_persona.get('name', 'Unknown')}, a {client_persona.get('role', 'Unknown')} at {client_persona.get('company', 'Unknown')}.
-Your personality traits: {client_persona.get('personality_traits', 'Unknown')}
-Your primary pain points: {client_persona.get('pain_points', 'Unknown')}
-Your decision criteria: {client_persona.get('decision_criteria', 'Unknown')}
-
-Current sales stage: {pacer_stage}
-
-Respond naturally as {client_persona.get('name', 'the client')} would, keeping consistent with your persona traits and the current stage.
-Your response should be conversational and direct, with no additional formatting or metadata.
-
-CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other language, regardless of the user's language.
-"""
-                
-                messages = [
-                    {"role": "system", "content": system_content}
-                ]
-                
-                # Add all conversation history
-                messages.extend(conversation_history)
-            else:
-                # If system message exists, use conversation history as is
-                messages = conversation_history.copy()
-                logger.info("Using system message from conversation history")
-            
-            # Log the number of messages being sent to the API
-            logger.info(f"Sending {len(messages)} messages to OpenAI API, including: "
-                       f"{sum(1 for m in messages if m.get('role') == 'system')} system, "
-                       f"{sum(1 for m in messages if m.get('role') == 'user')} user, "
-                       f"{sum(1 for m in messages if m.get('role') == 'assistant')} assistant")
-            
-            # Add the player's input as the final message
-            messages.append({"role": "user", "content": player_input})
+            # Use the shared pooled OpenAI client
+            client = get_async_client()
             
-            # Stream the response (Using CHAT_MODEL, as this is for text streaming)
-            stream = await client.chat.completions.create(
-                model=CHAT_MODEL, # Use variable
-                messages=messages,
-                stream=True,
-                temperature=0.7,
-                max_tokens=300,
+            messages = AIService._build_client_messages(
+                client_persona, pacer_stage, conversation_history, player_input, context, system_prefix
             )
             
-            full_response = ""
+            async def open_stream():
+                # The governor slot is held for the whole stream; its latency signal is time to first token
+                async with llm_governor.slot(stream_model, operation) as llm_slot:
+                    # Stream the response (model and sampling come from the operation's route)
+                    stream = await client.chat.completions.create(
+                        model=stream_model,
+                        messages=messages,
+                        stream=True,
+                        temperature=route["temperature"],
+                        max_tokens=route["max_tokens"] or 300,
+                    )
+                    try:
+                        async for chunk in stream:
+                            if chunk.choices:
+                                content = chunk.choices[0].delta.content
+                                if content:
+                                    llm_slot.mark_first_token()
+                                    yield content
+                    finally:
+                        # Release the connection promptly, e.g. when this attempt lost a hedge race
+                        await stream.close()
             
-            async for chunk in stream:
-                if chunk.choices:
-                    content = chunk.choices[0].delta.content
-                    if content:
-                        full_response += content
-                        yield content
+            # A stream that is slow to produce its first token may be hedged (see hedging.py)
+            async for content in hedger.stream(operation, stream_model, open_stream):
+                if first_token_latency is None:
+                    first_token_latency = time.monotonic() - started
+                full_response += content
+                yield content
+            model_routing.record_usage(operation, completion_text=full_response)
             
-            # Evaluate the interaction once it's complete
-            # This gives time for evaluation while maintaining streaming UX
+            # Close the stream as soon as the reply is complete. The evaluation is
+            # scheduled by the caller as a background job (see evaluation_jobs.py)
             if full_response:
-                evaluation = AIService.evaluate_player_response(
-                    player_input, 
-                    full_response, 
-                    pacer_stage, 
-                    client_persona
-                )
-                
-                # Yield evaluation data as a separate JSON object
-                yield json.dumps({"text": full_response, "is_final": True, "evaluation": evaluation})
+                yield json.dumps({"text": full_response, "is_final": True})
                 
+        except LLMUnavailableError as e:
+            logger.warning(f"LLM unavailable for streaming reply: {e}")
+            stream_failed = True
+            if not DEGRADE_TO_MOCK:
+                yield json.dumps({"error": f"AI service temporarily unavailable: {e}"})
+                return
+            mock_response = AIService._generate_mock_response(
+                client_persona, pacer_stage, conversation_history, player_input
+            )
+            yield mock_response
+            yield json.dumps({"text": mock_response, "is_final": True, "degraded": True})
         except Exception as e:
             error_msg = f"Error in generate_client_response_stream: {str(e)}"
             logger.error(error_msg)
+            stream_failed = True
+            if full_response:
+                # The player has already seen most of the reply: finish it at the last
+                # complete sentence instead of regenerating it from scratch
+                yield json.dumps({
+                    "text": AIService._recover_partial_reply(full_response), "is_final": True, "partial": True
+                })
+                return
             yield json.dumps({"error": error_msg})
             
-            # Fallback to non-streaming response in case of error
+            # Nothing was streamed: fall back to a non-streaming response
             try:
-                fallback_response = AIService.generate_client_response(
-                    client_persona, pacer_stage, conversation_history, player_input, context
+                fallback_response = await AIService.generate_client_response(
+                    client_persona, pacer_stage, conversation_history, player_input, context, system_prefix
                 )
                 yield json.dumps({"text": fallback_response, "is_final": True, "fallback": True})
             except Exception as fallback_error:
                 logger.error(f"Fallback also failed: {str(fallback_error)}")
                 yield json.dumps({"error": "Both streaming and fallback failed."})
+        finally:
+            if stream_failed:
+                model_routing.record_call(operation, stream_model, time.monotonic() - started, error=True)
+            else:
+                model_routing.record_call(
+                    operation,
+                    stream_model,
+                    first_token_latency if first_token_latency is not None else time.monotonic() - started
+                )
     
     @staticmethod
-    async def transcribe_audio(audio_file_path: str) -> str:
-        """Transcribe audio file to text using OpenAI's Whisper model."""
+    async def transcribe_audio(audio: Union[str, BinaryIO], filename: Optional[str] = None) -> str:
+        """
+        Transcribe audio to text using OpenAI's Whisper model. `audio` is a file
+        path or an open binary file (e.g. an upload's spooled buffer), named `filename`.
+        """
         log_function_name()
         
         if MOCK_MODE:
@@ -1096,16 +1163,26 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             return random.choice(mock_responses)
         
         try:
-            # Create a direct call to OpenAI
-            client = openai.AsyncOpenAI(api_key=api_key)
+            # Use the shared pooled OpenAI client
+            client = get_async_client()
+            
+            if not isinstance(audio, str):
+                # File-like upload: the filename tells the API the audio format
+                async with llm_governor.slot(TRANSCRIBE_MODEL):
+                    transcript = await client.audio.transcriptions.create(
+                        model=TRANSCRIBE_MODEL,
+                        file=(filename or "audio.wav", audio)
+                    )
+                return transcript.text
             
             # Open the audio file
-            with open(audio_file_path, "rb") as audio_file:
+            with open(audio, "rb") as audio_file:
                 # Call the OpenAI Whisper API
-                transcript = await client.audio.transcriptions.create(
-                    model=TRANSCRIBE_MODEL, # Use variable
-                    file=audio_file
-                )
+                async with llm_governor.slot(TRANSCRIBE_MODEL):
+                    transcript = await client.audio.transcriptions.create(
+                        model=TRANSCRIBE_MODEL, # Use variable
+                        file=audio_file
+                    )
                 
                 return transcript.text
                 
@@ -1117,95 +1194,137 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             return "I couldn't understand the audio. Please try again."
 
     @staticmethod
-    async def generate_speech(text: str, voice: str = "alloy", client_persona: Optional[Dict] = None) -> bytes:
-        """Generate speech from text using OpenAI TTS API"""
+    def _select_voice(voice: str, client_persona: Optional[Any] = None) -> str:
+        """Pick the TTS voice for a client persona; `voice` when there is no persona."""
+        # Select the appropriate voice based on client persona if available
+        selected_voice = voice
+        if client_persona:
+            # Convert client_persona to dict if it's a model object
+            persona_dict = {}
+            if hasattr(client_persona, '__dict__'):
+                # It's a model object, convert attributes to dict
+                for key in ['name', 'role', 'personality_traits']:
+                    if hasattr(client_persona, key):
+                        persona_dict[key] = getattr(client_persona, key)
+            else:
+                # It's already a dict
+                persona_dict = client_persona
+            
+            # Determine appropriate voice based on persona characteristics
+            # This is a simple example - you might want more sophisticated logic
+            gender_hint = None
+            
+            # Extract personality traits as a string for analysis
+            traits = ""
+            personality_traits = persona_dict.get('personality_traits', '')
+            if isinstance(personality_traits, list):
+                traits = ' '.join(personality_traits)
+            else:
+                traits = str(personality_traits)
+            
+            traits = traits.lower()
+            
+            # Simple gender detection based on name and role (this is a simplification)
+            name = persona_dict.get('name', '').lower()
+            role = persona_dict.get('role', '').lower()
+            
+            # Female-associated voices
+            if any(term in role for term in ['woman', 'female', 'lady', 'chairwoman', 'businesswoman']):
+                gender_hint = 'female'
+            # Male-associated voices
+            elif any(term in role for term in ['man', 'male', 'gentleman', 'chairman', 'businessman']):
+                gender_hint = 'male'
+            
+            # Voice selection logic based on personality and gender hints
+            if gender_hint == 'female':
+                if any(term in traits for term in ['authoritative', 'commanding', 'strong']):
+                    selected_voice = 'nova'
+                elif any(term in traits for term in ['friendly', 'warm', 'approachable']):
+                    selected_voice = 'shimmer'
+                else:
+                    selected_voice = 'nova'  # Default female voice
+            elif gender_hint == 'male':
+                if any(term in traits for term in ['authoritative', 'commanding', 'strong']):
+                    selected_voice = 'onyx'
+                elif any(term in traits for term in ['friendly', 'warm', 'approachable']):
+                    selected_voice = 'echo'
+                else:
+                    selected_voice = 'echo'  # Default male voice
+            else:
+                # No clear gender indication, use a neutral voice or default
+                selected_voice = 'alloy'
+        return selected_voice
+
+    @staticmethod
+    def cached_speech(text: str, voice: str = "alloy", client_persona: Optional[Any] = None) -> Optional[bytes]:
+        """Already synthesized audio for this text and voice (see tts_cache.py), or None."""
+        cache = tts_cache.get_cache()
+        if cache is None:
+            return None
+        selected_voice = AIService._select_voice(voice, client_persona)
+        # Read now rather than handing out the path: another worker may evict the file meanwhile
+        return cache.get(tts_cache.make_cache_key(text, selected_voice, TTS_MODEL))
+
+    @staticmethod
+    async def generate_speech(text: str, voice: str = "alloy", client_persona: Optional[Dict] = None,
+                              check_cache: bool = True) -> bytes:
+        """Generate speech from text using OpenAI TTS API, as one byte string (see stream_speech)"""
+        return b"".join([
+            chunk async for chunk in AIService.stream_speech(text, voice, client_persona, check_cache)
+        ])
+
+    @staticmethod
+    async def stream_speech(text: str, voice: str = "alloy", client_persona: Optional[Dict] = None,
+                            check_cache: bool = True) -> AsyncGenerator[bytes, None]:
+        """
+        Synthesize speech and yield the MP3 as the provider produces it. Audio is
+        served from the disk cache when possible (pass check_cache=False after a
+        cached_speech miss); a complete synthesis is teed into the cache.
+        """
         api_key = os.getenv("OPENAI_API_KEY")
         
         if not api_key or os.getenv("MOCK_AI_RESPONSES", "False").lower() == "true":
             # Return mock audio for testing (1 second of silence)
-            dummy_audio = b'\x00' * 16000  # 16kHz 1-second silence
-            return dummy_audio
+            yield b'\x00' * 16000  # 16kHz 1-second silence
+            return
+        
+        selected_voice = AIService._select_voice(voice, client_persona)
+        cache = tts_cache.get_cache()
+        cache_key = tts_cache.make_cache_key(text, selected_voice, TTS_MODEL)
+        if cache is not None and check_cache:
+            cached_audio = cache.get(cache_key)
+            if cached_audio is not None:
+                yield cached_audio
+                return
         
+        chunks = []
         try:
-            # Create a direct call to OpenAI
-            client = openai.AsyncOpenAI(api_key=api_key)
-            
-            # Select the appropriate voice based on client persona if available
-            selected_voice = voice
-            if client_persona:
-                # Convert client_persona to dict if it's a model object
-                persona_dict = {}
-                if hasattr(client_persona, '__dict__'):
-                    # It's a model object, convert attributes to dict
-                    for key in ['name', 'role', 'personality_traits']:
-                        if hasattr(client_persona, key):
-                            persona_dict[key] = getattr(client_persona, key)
-                else:
-                    # It's already a dict
-                    persona_dict = client_persona
-                
-                # Determine appropriate voice based on persona characteristics
-                # This is a simple example - you might want more sophisticated logic
-                gender_hint = None
-                
-                # Extract personality traits as a string for analysis
-                traits = ""
-                personality_traits = persona_dict.get('personality_traits', '')
-                if isinstance(personality_traits, list):
-                    traits = ' '.join(personality_traits)
-                else:
-                    traits = str(personality_traits)
-                
-                traits = traits.lower()
-                
-                # Simple gender detection based on name and role (this is a simplification)
-                name = persona_dict.get('name', '').lower()
-                role = persona_dict.get('role', '').lower()
-                
-                # Female-associated voices
-                if any(term in role for term in ['woman', 'female', 'lady', 'chairwoman', 'businesswoman']):
-                    gender_hint = 'female'
-                # Male-associated voices
-                elif any(term in role for term in ['man', 'male', 'gentleman', 'chairman', 'businessman']):
-                    gender_hint = 'male'
-                
-                # Voice selection logic based on personality and gender hints
-                if gender_hint == 'female':
-                    if any(term in traits for term in ['authoritative', 'commanding', 'strong']):
-                        selected_voice = 'nova'
-                    elif any(term in traits for term in ['friendly', 'warm', 'approachable']):
-                        selected_voice = 'shimmer'
-                    else:
-                        selected_voice = 'nova'  # Default female voice
-                elif gender_hint == 'male':
-                    if any(term in traits for term in ['authoritative', 'commanding', 'strong']):
-                        selected_voice = 'onyx'
-                    elif any(term in traits for term in ['friendly', 'warm', 'approachable']):
-                        selected_voice = 'echo'
-                    else:
-                        selected_voice = 'echo'  # Default male voice
-                else:
-                    # No clear gender indication, use a neutral voice or default
-                    selected_voice = 'alloy'
-            
-            # Call the OpenAI TTS API
-            response = await client.audio.speech.create(
-                model="tts-1",
-                voice=selected_voice,
-                input=text
-            )
-            
-            # Get the speech data - remove await since response.read() returns bytes directly
-            speech_data = response.read()
-            
-            return speech_data
+            # Use the shared pooled OpenAI client
+            client = get_async_client()
             
+            # Call the OpenAI TTS API and relay the audio as it arrives
+            async with llm_governor.slot(TTS_MODEL) as llm_slot:
+                async with client.audio.speech.with_streaming_response.create(
+                    model=TTS_MODEL,
+                    voice=selected_voice,
+                    input=text,
+                    response_format="mp3"
+                ) as response:
+                    async for chunk in response.iter_bytes(TTS_STREAM_CHUNK_BYTES):
+                        llm_slot.mark_first_token()
+                        chunks.append(chunk)
+                        yield chunk
         except Exception as e:
             logger.error(f"Error generating speech: {e}")
             logger.error(f"Traceback: {traceback.format_exc()}")
-            
-            # Return silent audio in case of error
-            return b'\x00' * 16000  # 16kHz 1-second silence 
+            if not chunks:
+                # Return silent audio in case of error (not cached)
+                yield b'\x00' * 16000  # 16kHz 1-second silence
+            return
+        
+        # Only complete audio is kept for replay; a dropped client leaves nothing behind
+        if cache is not None and chunks:
+            cache.set(cache_key, b"".join(chunks), selected_voice, TTS_MODEL)
 
     @staticmethod
     async def process_realtime_audio(audio_data: bytes) -> Dict:
@@ -1314,8 +1433,8 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
         logger.info(f"Transcribing audio chunk of size {len(audio_data)} bytes using {TRANSCRIBE_MODEL}")
         
         try:
-            # Create a direct call to OpenAI
-            client = openai.AsyncOpenAI(api_key=api_key)
+            # Use the shared pooled OpenAI client
+            client = get_async_client()
             
             # Create an in-memory file-like object from the bytes
             audio_file = io.BytesIO(audio_data)
@@ -1326,14 +1445,15 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             try:
                 # Call the OpenAI Whisper API with specific parameters
                 # Pass the file tuple directly to the 'file' parameter
-                transcript = await client.audio.transcriptions.create(
-                    model=TRANSCRIBE_MODEL, # Use variable
-                    file=file_param, # Pass the file-like object tuple
-                    language="en",
-                    response_format="text",
-                    temperature=0.0,
-                    prompt="This is a conversation about sales, payment processing, and financial solutions. The voice may be discussing business needs or requirements."
-                )
+                async with llm_governor.slot(TRANSCRIBE_MODEL):
+                    transcript = await client.audio.transcriptions.create(
+                        model=TRANSCRIBE_MODEL, # Use variable
+                        file=file_param, # Pass the file-like object tuple
+                        language="en",
+                        response_format="text",
+                        temperature=0.0,
+                        prompt="This is a conversation about sales, payment processing, and financial solutions. The voice may be discussing business needs or requirements."
+                    )
                 
                 # Log the successful transcription
                 logger.info(f"Successfully transcribed audio to text: '{transcript}' (type: {type(transcript)})")
@@ -1367,15 +1487,16 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             return {"audio_content": dummy_audio}
         
         try:
-            # Create a direct call to OpenAI
-            client = openai.AsyncOpenAI(api_key=api_key)
+            # Use the shared pooled OpenAI client
+            client = get_async_client()
             
             # Call the OpenAI TTS API with a neutral voice
-            response = await client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",  # Use a neutral voice
-                input=text
-            )
+            async with llm_governor.slot("tts-1"):
+                response = await client.audio.speech.create(
+                    model="tts-1",
+                    voice="alloy",  # Use a neutral voice
+                    input=text
+                )
             
             # Get the audio data
             audio_data = response.read()
@@ -1407,8 +1528,8 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             return random.choice(responses)
         
         try:
-            # Create a direct call to OpenAI for sales agent responses
-            client = openai.AsyncOpenAI(api_key=api_key)
+            # Use the shared pooled OpenAI client for sales agent responses
+            client = get_async_client()
             
             # Create the messages
             messages = [
@@ -1416,13 +1537,21 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
                 {"role": "user", "content": user_input}
             ]
             
-            # Call the API
-            response = await client.chat.completions.create(
-                model=CHAT_MODEL, # Use variable
-                messages=messages,
-                temperature=0.7,
-                max_tokens=150
-            )
+            # Call the API (model and sampling come from the operation's route)
+            operation = "generate_sales_agent_response"
+            route = model_routing.get_route(operation)
+            agent_model = route["model"] or CHAT_MODEL
+            started = time.monotonic()
+            async with llm_governor.slot(agent_model, operation):
+                response = await client.chat.completions.create(
+                    model=agent_model,
+                    messages=messages,
+                    temperature=route["temperature"],
+                    max_tokens=route["max_tokens"] or 150
+                )
+            model_routing.record_call(operation, agent_model, time.monotonic() - started)
+            usage = response.usage.model_dump() if getattr(response, "usage", None) else None
+            model_routing.record_usage(operation, usage)
             
             # Return the response content
             return response.choices[0].message.content.strip()
@@ -1434,6 +1563,14 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             # Return a default response in case of error
             return "I appreciate your question. Let me find the information you need." 
 
+    @staticmethod
+    def _realtime_audio_append(pcm16_bytes: bytes) -> str:
+        """An input_audio_buffer.append event carrying PCM16 audio."""
+        return json.dumps({
+            "type": "input_audio_buffer.append",
+            "audio": base64.b64encode(pcm16_bytes).decode("ascii")
+        })
+
     @staticmethod
     async def handle_realtime_conversation(client_ws: WebSocket, session_id: int):
         """
@@ -1455,6 +1592,9 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
         receive_from_openai_failed = asyncio.Event()
         has_sent_audio = False
         ephemeral_token = None # Initialize token
+        # Clients that record with MediaRecorder send binary WebM/Opus frames; one pooled
+        # FFmpeg transcoder turns this connection's stream into the session's PCM16
+        audio_stream_id = f"realtime-{session_id}-{id(client_ws)}"
 
         # --- Nested function definition remains the same ---
         async def receive_from_openai():
@@ -1595,6 +1735,10 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
                                 await openai_ws.send(client_json_str)
                             # <<< MODIFY COMMIT FORWARDING HERE >>>
                             elif msg_type == "input_audio_buffer.commit":
+                                # Send what FFmpeg decoded since the last binary frame, so the utterance is complete
+                                pending_pcm = ffmpeg_pool.get_pool().read_available(audio_stream_id)
+                                if pending_pcm:
+                                    await openai_ws.send(AIService._realtime_audio_append(pending_pcm))
                                 logger.info(f"---> Session {log_session_id}: Forwarding client 'input_audio_buffer.commit' to OpenAI.")
                                 await openai_ws.send(client_json_str)
                                 # <<< REMOVE EXPLICIT RESPONSE TRIGGER FROM PROXY >>>
@@ -1619,6 +1763,27 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
                         except Exception as e:
                             logger.error(f"Session {log_session_id}: Error processing client text message: {e}", exc_info=True)
 
+                    elif isinstance(client_message_raw, dict) and client_message_raw.get("bytes"):
+                        try:
+                            pcm16_bytes = await ffmpeg_pool.get_pool().feed(
+                                audio_stream_id, client_message_raw["bytes"], sample_rate=REALTIME_PCM16_SAMPLE_RATE
+                            )
+                        except ffmpeg_pool.MissingHeaderError as e:
+                            # Decoding cannot resume without the recording's first chunk
+                            logger.warning(f"Session {log_session_id}: {e}")
+                            await client_ws.send_text(json.dumps({
+                                "type": "error",
+                                "code": "restart_recording",
+                                "message": "The audio stream cannot be decoded from here. Please restart recording."
+                            }))
+                            continue
+                        except ffmpeg_pool.TranscoderError as e:
+                            logger.error(f"Session {log_session_id}: Could not transcode client audio: {e}")
+                            await client_ws.send_text(json.dumps({"type": "error", "message": "Server could not decode the audio stream."}))
+                            continue
+                        if pcm16_bytes:
+                            await openai_ws.send(AIService._realtime_audio_append(pcm16_bytes))
+
                     else:
                          logger.warning(f"Session {log_session_id}: Received unexpected data type from client: {type(client_message_raw)}")
 
@@ -1650,6 +1815,7 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             # print(f"--- Cleaning up handle_realtime_conversation for session {log_session_id}... ---")
             logger.info(f"--- Cleaning up handle_realtime_conversation for session {log_session_id}... ---")
             connection_active = False # Signal listener task to stop
+            await ffmpeg_pool.get_pool().release(audio_stream_id)
 
             # Cancel and wait for the listener task
             if openai_listener_task and not openai_listener_task.done():
@@ -1710,7 +1876,7 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             logger.info(f"Attempting to connect to OpenAI Realtime API")
 
             # Use the correct URL with model parameter
-            url = f"wss://api.openai.com/v1/realtime?model={REALTIME_MODEL}"
+            url = client_ai_settings.realtime_ws_url(REALTIME_MODEL)
             logger.info(f"OpenAI Realtime WebSocket URL: {url}")
 
             # Include the beta header and authorization header
@@ -1740,48 +1906,26 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             return None
 
     def _run_ffmpeg_sync(self, input_bytes: bytes) -> Optional[bytes]:
-        """Runs FFmpeg synchronously using subprocess.run."""
-        ffmpeg_cmd = [
-            'C:\\Users\\a676982\\ffmpeg\\bin\\ffmpeg.exe', # Use absolute path
-            '-loglevel', 'error', # Only log errors from FFmpeg
-            '-f', 'webm',        # Explicitly state input format
-            '-i', 'pipe:0',      # Input from stdin
-            '-acodec', 'pcm_s16le', # Output codec: PCM signed 16-bit little-endian
-            '-ar', '16000',       # Output sample rate: 16kHz
-            '-ac', '1',           # Output channels: Mono
-            '-f', 's16le',       # Output format: raw PCM
-            'pipe:1'              # Output to stdout
-        ]
-        
+        """Converts a complete WebM payload to PCM16 in a one-off FFmpeg process (blocking)."""
         try:
-            # Use subprocess.run to execute synchronously
-            result = subprocess.run(
-                ffmpeg_cmd,
-                input=input_bytes,
-                capture_output=True, # Capture stdout and stderr
-                check=False # Don't raise exception on non-zero exit code
-            )
-
-            # Check return code
-            if result.returncode != 0:
-                stderr_str = result.stderr.decode(errors='ignore')
-                logger.error(f"FFmpeg sync error (code {result.returncode}): {stderr_str}")
-                return None
-            else:
-                # Log warnings even on success
-                if result.stderr:
-                    logger.warning(f"FFmpeg sync stderr warnings: {result.stderr.decode(errors='ignore')}")
-                logger.debug(f"FFmpeg sync conversion successful, output size: {len(result.stdout)} bytes")
-                return result.stdout
-
-        except FileNotFoundError:
-            logger.error("FFmpeg command not found. Ensure FFmpeg is installed and in the system PATH.")
-            return None
+            return ffmpeg_pool.convert_once(input_bytes)
         except Exception as e:
             logger.error(f"Error during synchronous FFmpeg execution: {e}", exc_info=True)
             return None
 
-    async def convert_audio_chunk_ffmpeg(self, input_bytes: bytes) -> Optional[bytes]:
+    async def convert_audio_chunk_ffmpeg(self, input_bytes: bytes, stream_id=None) -> Optional[bytes]:
+        """
+        Convert WebM/Opus audio to PCM16. Chunks of a live stream pass its `stream_id`
+        and are fed to that stream's long-lived transcoder from the FFmpeg pool, which
+        returns the PCM produced so far; release it with release_audio_stream().
+        Without a stream id the bytes are converted on their own.
+        """
+        if stream_id is not None:
+            try:
+                return await ffmpeg_pool.get_pool().feed(stream_id, input_bytes)
+            except ffmpeg_pool.TranscoderError as e:
+                logger.error(f"FFmpeg conversion failed for stream {stream_id}: {e}")
+                return None
         loop = asyncio.get_running_loop()
         try:
             output_bytes = await loop.run_in_executor(None, self._run_ffmpeg_sync, input_bytes)
@@ -1790,6 +1934,14 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             logger.error(f"FFmpeg conversion failed: {e}")
             return None
 
+    async def release_audio_stream(self, stream_id) -> bytes:
+        """Close a stream's transcoder and return the PCM it flushed at the end of the stream."""
+        try:
+            return await ffmpeg_pool.get_pool().release(stream_id)
+        except Exception as e:
+            logger.error(f"Error closing FFmpeg transcoder for stream {stream_id}: {e}")
+            return b""
+
     async def _handle_realtime_conversation_instance_unused(self, openai_ws: WebSocketClientProtocol, client_ws: WebSocket, ephemeral_token: str):
         """
         Handles the realtime conversation flow between a client and OpenAI via WebSockets.
@@ -1860,6 +2012,8 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
                 openai_listener_task.set_result(None) # Signal that this task failed/exited
 
         # --- Main Function Logic ---
+        # One pooled FFmpeg transcoder decodes this client's whole WebM stream
+        audio_stream_id = f"realtime-{id(client_ws)}"
         try:
             await client_ws.send_text(json.dumps({
                 "type": "connection_established",
@@ -1891,7 +2045,7 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
                         logger.debug(f"Received webm/ogg audio bytes chunk: {len(input_webm_bytes)}")
                         
                         # --- Convert using FFmpeg --- 
-                        pcm16_bytes = await self.convert_audio_chunk_ffmpeg(input_webm_bytes)
+                        pcm16_bytes = await self.convert_audio_chunk_ffmpeg(input_webm_bytes, stream_id=audio_stream_id)
                         # --- End Conversion ---
                         
                         if pcm16_bytes:
@@ -1942,6 +2096,7 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             logger.error(traceback.format_exc())
             raise e
         finally:
+            await self.release_audio_stream(audio_stream_id)
             logger.info("handle_realtime_conversation task finishing.")
 
     @staticmethod
@@ -1953,7 +2108,7 @@ CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other lan
             return None
 
         # Use the correct /sessions endpoint for conversational models
-        url = "https://api.openai.com/v1/realtime/sessions" 
+        url = f"{client_ai_settings.api_base_url()}/realtime/sessions"
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
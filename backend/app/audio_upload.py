@@ -0,0 +1,115 @@
+"""
+audio_upload.py - Limits for audio uploads to speech-to-text in PACER AI Service.
+
+Uploads are no longer written to temp_audio_*.wav in the working directory.
+Starlette already receives multipart file parts into a spooled buffer (kept in
+memory up to 1 MB, then rolled over to an unnamed, private temporary file), and
+that file object is handed to the transcription client as is.
+
+UploadSizeLimitMiddleware enforces STT_MAX_UPLOAD_MB while the body is still
+streaming in: a request whose Content-Length is too large is rejected with 413
+before any of it is read, and one without (chunked) is cut off with 413 as soon
+as it crosses the limit. STT_MAX_DURATION_SECONDS is checked from the audio
+header where the format allows it (WAV).
+"""
+
+import logging
+import os
+import re
+import wave
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# OpenAI's transcription endpoint accepts files up to 25 MB
+STT_MAX_UPLOAD_MB = float(os.environ.get("STT_MAX_UPLOAD_MB", "25"))
+STT_MAX_UPLOAD_BYTES = int(STT_MAX_UPLOAD_MB * 1024 * 1024)
+STT_MAX_DURATION_SECONDS = float(os.environ.get("STT_MAX_DURATION_SECONDS", "300"))
+
+# Routes whose request bodies are audio uploads
+AUDIO_UPLOAD_PATH_RE = re.compile(r"/speech-to-text/?$")
+
+TOO_LARGE_DETAIL = f"Audio upload exceeds the {STT_MAX_UPLOAD_MB:g} MB limit"
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware that rejects audio uploads over `max_bytes` with 413 while they stream in."""
+
+    def __init__(self, app, max_bytes: int = STT_MAX_UPLOAD_BYTES, path_re: re.Pattern = AUDIO_UPLOAD_PATH_RE):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_re = path_re
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.path_re.search(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            logger.warning(f"Rejected {scope['path']} upload of {int(content_length)} bytes before reading it")
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    logger.warning(f"Cut off {scope['path']} upload after {received} bytes")
+                    # Raised inside body parsing, so FastAPI answers it like any HTTPException
+                    raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    @staticmethod
+    async def _reject(scope, receive, send):
+        response = JSONResponse(status_code=413, content={"detail": TOO_LARGE_DETAIL}, headers={"Connection": "close"})
+        await response(scope, receive, send)
+
+
+def audio_duration_seconds(audio: BinaryIO) -> Optional[float]:
+    """Duration of a WAV upload from its header, or None for formats without one (webm, ogg, ...)."""
+    position = audio.tell()
+    try:
+        header = audio.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        audio.seek(position)
+        with wave.open(audio, "rb") as wav:
+            rate = wav.getframerate()
+            return wav.getnframes() / rate if rate else None
+    except (wave.Error, EOFError) as e:
+        logger.info(f"Could not read WAV header of upload: {e}")
+        return None
+    finally:
+        audio.seek(position)
+
+
+def check_duration(audio: BinaryIO):
+    """Raise 413 when an upload is longer than STT_MAX_DURATION_SECONDS."""
+    duration = audio_duration_seconds(audio)
+    if duration is not None and duration > STT_MAX_DURATION_SECONDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio is {duration:.0f} s long; the limit is {STT_MAX_DURATION_SECONDS:g} s"
+        )
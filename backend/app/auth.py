@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 import logging
 import os
 
-from . import schemas, models
+from . import schemas, models, llm_governor
 from .database import get_db
 
 logger = logging.getLogger(__name__)
@@ -128,6 +128,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         logger.warning(f"User not found in database for email: {email}")
         raise credentials_exception
         
+    # Attribute this request's LLM calls to the user for fair queuing
+    llm_governor.set_user(user.id)
     logger.debug(f"Returning user: {user.email}")
     return user
 
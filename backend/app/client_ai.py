@@ -1,13 +1,41 @@
 """
 client_ai.py - Wrappers around OpenAI REST and Realtime APIs for PACER AI Service.
+
+All OpenAI traffic goes through one process-wide client registry so every call
+reuses the same keep-alive connection pool instead of paying a fresh TLS
+handshake per request. Pool limits and timeouts are configured from the
+environment; call close_clients() on shutdown to release the pools.
+
+Chat completions called with an `operation` name take their model, temperature
+and max_tokens from that operation's route in model_routing.py unless the
+caller passes them explicitly. They go through the response cache in
+llm_cache.py when that operation has a cache TTL configured, and identical
+requests that are in flight at the same time are coalesced into a single
+upstream call. Every upstream call holds a slot from the adaptive
+per-model concurrency governor in llm_governor.py, queued by the priority
+class of its operation. Slow calls may be hedged with a duplicate request
+(see hedging.py).
+
+chat_completion_stream() yields the completion as it is generated, for callers
+that act on partial output (e.g. schema-constrained evaluations whose scores
+arrive before the feedback text).
 """
 
 import openai
 import asyncio
 import logging
 import os
+import threading
+import time
+import httpx
 from openai import AsyncOpenAI
 
+from . import llm_cache
+from .single_flight import single_flight
+from . import llm_governor
+from . import model_routing
+from .hedging import hedger
+
 logger = logging.getLogger(__name__)
 
 api_key = os.environ.get("OPENAI_API_KEY", "")
@@ -17,21 +45,115 @@ default_chat_model = "gpt-4o-mini"
 CHAT_MODEL = os.environ.get("OPENAI_CHAT_MODEL", default_chat_model)
 logger.info(f"Client AI using Chat Model: {CHAT_MODEL}")
 
-MOCK_MODE = False
+# Set PACER_MOCK_MODE=true to answer from canned responses without any network calls
+MOCK_MODE = os.environ.get("PACER_MOCK_MODE", "false").lower() in ("1", "true", "yes")
 
-# Sync OpenAI call
+# Alternative API base, e.g. http://localhost:8010/v1 for openai_stub_server.py
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "") or None
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
 
-def chat_completion_sync(messages, model=None, temperature=0.7):
-    effective_model = model or CHAT_MODEL
-    if MOCK_MODE:
-        logger.info("MOCK_MODE enabled - returning mock response for sync call")
-        return {"choices": [{"message": {"content": "[MOCK RESPONSE]"}}]}
-    client = openai.OpenAI(api_key=api_key)
-    response = client.chat.completions.create(
-        model=effective_model,
-        messages=messages,
-        temperature=temperature
+# --- Connection pool settings ---
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+
+# Share one upstream call between concurrent identical requests (see single_flight.py)
+SINGLE_FLIGHT_ENABLED = os.environ.get("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_sync_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
     )
+
+
+def _pool_timeout():
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+def _current_api_key():
+    # Read at client creation time so keys loaded by dotenv after import are picked up
+    return os.environ.get("OPENAI_API_KEY", api_key)
+
+
+def api_base_url():
+    """HTTP base URL of the OpenAI API (or a compatible stub)."""
+    return (OPENAI_BASE_URL or DEFAULT_OPENAI_BASE_URL).rstrip("/")
+
+
+def realtime_ws_url(model):
+    """WebSocket URL of the Realtime API for a model, derived from the base URL."""
+    base = api_base_url()
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    return f"{base}/realtime?model={model}"
+
+
+def get_sync_client():
+    """Return the shared, pooled synchronous OpenAI client."""
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = openai.OpenAI(
+                    api_key=_current_api_key(),
+                    base_url=OPENAI_BASE_URL,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    timeout=_pool_timeout(),
+                    http_client=httpx.Client(limits=_pool_limits(), timeout=_pool_timeout()),
+                )
+                logger.info(f"Created shared sync OpenAI client (max_connections={OPENAI_MAX_CONNECTIONS}, keepalive={OPENAI_MAX_KEEPALIVE_CONNECTIONS})")
+    return _sync_client
+
+
+def get_async_client():
+    """Return the shared, pooled asynchronous OpenAI client."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(
+                    api_key=_current_api_key(),
+                    base_url=OPENAI_BASE_URL,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    timeout=_pool_timeout(),
+                    http_client=httpx.AsyncClient(limits=_pool_limits(), timeout=_pool_timeout()),
+                )
+                logger.info(f"Created shared async OpenAI client (max_connections={OPENAI_MAX_CONNECTIONS}, keepalive={OPENAI_MAX_KEEPALIVE_CONNECTIONS})")
+    return _async_client
+
+
+async def close_clients():
+    """Close the shared clients and their connection pools. Called from the FastAPI lifespan."""
+    global _sync_client, _async_client
+    with _client_lock:
+        sync_client, _sync_client = _sync_client, None
+        async_client, _async_client = _async_client, None
+    if async_client is not None:
+        try:
+            await async_client.close()
+        except Exception as e:
+            logger.error(f"Error closing async OpenAI client: {e}")
+    if sync_client is not None:
+        try:
+            sync_client.close()
+        except Exception as e:
+            logger.error(f"Error closing sync OpenAI client: {e}")
+    logger.info("Shared OpenAI clients closed")
+
+
+def _response_to_dict(response):
     # Ensure we return a dict, not an OpenAI object
     if hasattr(response, "model_dump"):
         return response.model_dump()
@@ -41,29 +163,178 @@ def chat_completion_sync(messages, model=None, temperature=0.7):
         import json
         return json.loads(str(response))
 
+def _cache_lookup(operation, model, messages, temperature, max_tokens=None, response_format=None):
+    """Return (cache, key, cached_response) for a request; cache is None when not cacheable."""
+    key = llm_cache.make_cache_key(model, messages, temperature, max_tokens, response_format)
+    cache = llm_cache.get_cache()
+    if cache is None or not cache.is_cacheable(operation):
+        return None, key, None
+    return cache, key, cache.get(key, operation)
+
+
+def get_metrics():
+    """Return counters for the shared OpenAI client layer."""
+    cache = llm_cache.get_cache()
+    return {
+        "cache": cache.stats() if cache is not None else {"enabled": False},
+        "single_flight": dict(single_flight.stats(), enabled=SINGLE_FLIGHT_ENABLED),
+        "governor": llm_governor.get_stats(),
+        "hedging": hedger.stats(),
+        "routing": model_routing.get_stats(),
+    }
+
+def _route_request(operation, model, temperature, max_tokens):
+    """Fill in model, temperature and max_tokens from the operation's route where the caller left them out."""
+    route = model_routing.get_route(operation)
+    effective_model = model or route["model"] or CHAT_MODEL
+    if temperature is None:
+        temperature = route["temperature"]
+    if max_tokens is None:
+        max_tokens = route["max_tokens"]
+    return effective_model, temperature, max_tokens
+
+
+def _completion_kwargs(model, messages, temperature, max_tokens, response_format=None):
+    kwargs = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    if response_format:
+        kwargs["response_format"] = response_format
+    return kwargs
+
+# Sync OpenAI call
+
+def chat_completion_sync(messages, model=None, temperature=None, operation=None, max_tokens=None,
+                         response_format=None):
+    effective_model, temperature, max_tokens = _route_request(operation, model, temperature, max_tokens)
+    if MOCK_MODE:
+        logger.info("MOCK_MODE enabled - returning mock response for sync call")
+        return {"choices": [{"message": {"content": "[MOCK RESPONSE]"}}]}
+    started = time.monotonic()
+    cache, cache_key, cached = _cache_lookup(
+        operation, effective_model, messages, temperature, max_tokens, response_format
+    )
+    if cached is not None:
+        logger.info(f"LLM cache hit for {operation}")
+        model_routing.record_call(operation, effective_model, time.monotonic() - started, cached=True)
+        return cached
+
+    def attempt():
+        client = get_sync_client()
+        with llm_governor.slot_sync(effective_model, operation):
+            return client.chat.completions.create(
+                **_completion_kwargs(effective_model, messages, temperature, max_tokens, response_format)
+            )
+
+    def call():
+        response = hedger.call_sync(operation, effective_model, attempt)
+        result = _response_to_dict(response)
+        model_routing.record_usage(operation, result.get("usage"))
+        if cache is not None:
+            cache.set(cache_key, operation, result)
+        return result
+
+    try:
+        if SINGLE_FLIGHT_ENABLED:
+            result = single_flight.do_sync(cache_key, operation or "chat_completion", call)
+        else:
+            result = call()
+    except Exception:
+        model_routing.record_call(operation, effective_model, time.monotonic() - started, error=True)
+        raise
+    model_routing.record_call(operation, effective_model, time.monotonic() - started)
+    return result
+
 # Async OpenAI call
-async def chat_completion_async(messages, model=None, temperature=0.7):
-    effective_model = model or CHAT_MODEL
+async def chat_completion_async(messages, model=None, temperature=None, operation=None, max_tokens=None,
+                                response_format=None):
+    effective_model, temperature, max_tokens = _route_request(operation, model, temperature, max_tokens)
     if MOCK_MODE:
         logger.info("MOCK_MODE enabled - returning mock response for async call")
-        class MockResponse:
-            class Choice:
-                class Message:
-                    content = "[MOCK RESPONSE]"
-                message = Message()
-            choices = [Choice()]
         return {"choices": [{"message": {"content": "[MOCK RESPONSE]"}}]}
-    client = AsyncOpenAI(api_key=api_key)
-    response = await client.chat.completions.create(
-        model=effective_model,
-        messages=messages,
-        temperature=temperature
+    started = time.monotonic()
+    cache, cache_key, cached = _cache_lookup(
+        operation, effective_model, messages, temperature, max_tokens, response_format
     )
-    # Ensure we return a dict, not an OpenAI object
-    if hasattr(response, "model_dump"):
-        return response.model_dump()
-    elif hasattr(response, "__dict__"):
-        return response.__dict__
-    else:
-        import json
-        return json.loads(str(response)) 
\ No newline at end of file
+    if cached is not None:
+        logger.info(f"LLM cache hit for {operation}")
+        model_routing.record_call(operation, effective_model, time.monotonic() - started, cached=True)
+        return cached
+
+    async def attempt():
+        client = get_async_client()
+        async with llm_governor.slot(effective_model, operation):
+            return await client.chat.completions.create(
+                **_completion_kwargs(effective_model, messages, temperature, max_tokens, response_format)
+            )
+
+    async def call():
+        response = await hedger.call(operation, effective_model, attempt)
+        result = _response_to_dict(response)
+        model_routing.record_usage(operation, result.get("usage"))
+        if cache is not None:
+            cache.set(cache_key, operation, result)
+        return result
+
+    try:
+        if SINGLE_FLIGHT_ENABLED:
+            result = await single_flight.do(cache_key, operation or "chat_completion", call)
+        else:
+            result = await call()
+    except Exception:
+        model_routing.record_call(operation, effective_model, time.monotonic() - started, error=True)
+        raise
+    model_routing.record_call(operation, effective_model, time.monotonic() - started)
+    return result
+
+# Streaming OpenAI call
+async def chat_completion_stream(messages, model=None, temperature=None, operation=None, max_tokens=None,
+                                 response_format=None):
+    """
+    Yield the completion text as it is generated. A cached response is yielded
+    in one piece; a complete stream is cached like a non-streaming call, a broken
+    one is not. Streams are not coalesced by single-flight.
+    """
+    effective_model, temperature, max_tokens = _route_request(operation, model, temperature, max_tokens)
+    if MOCK_MODE:
+        logger.info("MOCK_MODE enabled - returning mock response for streaming call")
+        yield "[MOCK RESPONSE]"
+        return
+    started = time.monotonic()
+    cache, cache_key, cached = _cache_lookup(
+        operation, effective_model, messages, temperature, max_tokens, response_format
+    )
+    if cached is not None:
+        logger.info(f"LLM cache hit for {operation}")
+        model_routing.record_call(operation, effective_model, time.monotonic() - started, cached=True)
+        yield cached["choices"][0]["message"]["content"] or ""
+        return
+
+    async def open_stream():
+        client = get_async_client()
+        async with llm_governor.slot(effective_model, operation) as llm_slot:
+            stream = await client.chat.completions.create(
+                stream=True, **_completion_kwargs(effective_model, messages, temperature, max_tokens, response_format)
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices:
+                        content = chunk.choices[0].delta.content
+                        if content:
+                            llm_slot.mark_first_token()
+                            yield content
+            finally:
+                await stream.close()
+
+    text = ""
+    try:
+        async for content in hedger.stream(operation, effective_model, open_stream):
+            text += content
+            yield content
+    except Exception:
+        model_routing.record_call(operation, effective_model, time.monotonic() - started, error=True)
+        raise
+    model_routing.record_call(operation, effective_model, time.monotonic() - started)
+    model_routing.record_usage(operation, completion_text=text)
+    if cache is not None and text:
+        cache.set(cache_key, operation, {"choices": [{"message": {"role": "assistant", "content": text}}]})
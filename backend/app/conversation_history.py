@@ -0,0 +1,169 @@
+"""
+conversation_history.py - Token-budgeted conversation history for PACER AI Service.
+
+Instead of sending the full transcript on every turn, the routes keep the last
+HISTORY_RECENT_TURNS turns verbatim and fold everything older into a rolling
+summary stored in GameSession.conversation_context["history_summary"]. The
+summary is updated incrementally: only turns that dropped out of the recent
+window since the last update are sent to the summarizer. Summary plus recent
+turns are kept under a per-model token budget.
+
+A "turn" is one sales rep message together with the replies it received:
+    {"entries": [...history entries for the AI call...], "text": "Sales Rep: ...\nClient: ..."}
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .ai_service import AIService
+from .client_ai import CHAT_MODEL
+from .prompts import HISTORY_SUMMARY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+HISTORY_RECENT_TURNS = int(os.environ.get("HISTORY_RECENT_TURNS", "6"))
+HISTORY_DEFAULT_TOKEN_BUDGET = int(os.environ.get("HISTORY_DEFAULT_TOKEN_BUDGET", "3000"))
+HISTORY_SUMMARY_MAX_WORDS = int(os.environ.get("HISTORY_SUMMARY_MAX_WORDS", "200"))
+
+SUMMARY_CONTEXT_KEY = "history_summary"
+
+
+def _load_token_budgets() -> Dict[str, int]:
+    raw = os.environ.get("HISTORY_TOKEN_BUDGETS", "")
+    if not raw:
+        return {}
+    try:
+        return {model: int(budget) for model, budget in json.loads(raw).items()}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Invalid HISTORY_TOKEN_BUDGETS value, using the default budget: {e}")
+        return {}
+
+
+HISTORY_TOKEN_BUDGETS = _load_token_budgets()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text or "") // 4 + 1
+
+
+def token_budget(model: Optional[str] = None) -> int:
+    return HISTORY_TOKEN_BUDGETS.get(model or CHAT_MODEL, HISTORY_DEFAULT_TOKEN_BUDGET)
+
+
+def _turn_tokens(turn: Dict) -> int:
+    return estimate_tokens(turn.get("text", ""))
+
+
+def _split_recent(turns: List[Dict], budget: int, summary_tokens: int) -> int:
+    """Return the index of the first turn kept verbatim."""
+    remaining = budget - summary_tokens
+    start = len(turns)
+    while start > 0 and len(turns) - start < HISTORY_RECENT_TURNS:
+        cost = _turn_tokens(turns[start - 1])
+        # Always keep the latest turn, even if it alone exceeds the budget
+        if cost > remaining and start < len(turns):
+            break
+        remaining -= cost
+        start -= 1
+    return start
+
+
+async def prepare_history(
+    game_session,
+    turns: List[Dict],
+    model: Optional[str] = None
+) -> Tuple[str, List[Dict]]:
+    """
+    Return (summary, recent_entries) for a session's turns, updating the rolling
+    summary on game_session.conversation_context when older turns need folding in.
+    The caller is responsible for committing the session.
+    """
+    context = game_session.conversation_context or {}
+    state = context.get(SUMMARY_CONTEXT_KEY) or {}
+    summary = state.get("text", "")
+    summarized_turns = state.get("turns", 0)
+
+    if summarized_turns > len(turns):
+        # The transcript was reset underneath us; start over
+        summary, summarized_turns = "", 0
+
+    budget = token_budget(model)
+    start = _split_recent(turns, budget, estimate_tokens(summary))
+    start = max(start, summarized_turns)
+
+    if start > summarized_turns:
+        new_turns = "\n".join(turn.get("text", "") for turn in turns[summarized_turns:start])
+        try:
+            summary = await AIService.summarize_conversation(summary, new_turns, HISTORY_SUMMARY_MAX_WORDS)
+            summarized_turns = start
+            game_session.conversation_context = {
+                **context,
+                SUMMARY_CONTEXT_KEY: {
+                    "text": summary,
+                    "turns": summarized_turns,
+                    "updated_at": datetime.utcnow().isoformat()
+                }
+            }
+            logger.info(f"Folded {start - state.get('turns', 0)} turns into the history summary for session {game_session.id}")
+        except Exception as e:
+            # Keep the old summary; the unsummarized turns are simply left out this time
+            logger.error(f"Failed to update history summary for session {game_session.id}: {e}")
+
+    recent_entries = [entry for turn in turns[start:] for entry in turn.get("entries", [])]
+    return summary, recent_entries
+
+
+def summary_message(summary: str) -> Optional[Dict]:
+    """Chat message carrying the rolling summary, or None when there is no summary yet."""
+    if not summary:
+        return None
+    return {"role": "system", "content": f"{HISTORY_SUMMARY_PREFIX}\n{summary}"}
+
+
+def is_summary_message(message: Dict) -> bool:
+    return message.get("role") == "system" and str(message.get("content", "")).startswith(HISTORY_SUMMARY_PREFIX)
+
+
+def client_turns(interactions, client_name: str = "Client") -> List[Dict]:
+    """Build turns from single-client Interaction rows (player_input + ai_response)."""
+    turns = []
+    for interaction in interactions:
+        entries = []
+        lines = []
+        if interaction.player_input:
+            entries.append({"role": "user", "content": interaction.player_input})
+            lines.append(f"Sales Rep: {interaction.player_input}")
+        if interaction.ai_response:
+            entries.append({"role": "assistant", "content": interaction.ai_response})
+            lines.append(f"{client_name}: {interaction.ai_response}")
+        if entries:
+            turns.append({"entries": entries, "text": "\n".join(lines)})
+    return turns
+
+
+def stakeholder_turns(interactions, stakeholder_responses, stakeholder_names: Dict[int, str]) -> List[Dict]:
+    """Build turns from multi-stakeholder Interaction and StakeholderResponse rows."""
+    # A stakeholder response is stored with the sequence after its player input, which is
+    # also the sequence of the next player input; order the response first on ties
+    items = [(i.sequence or 0, 1, i) for i in interactions if i.player_input]
+    items += [(r.sequence or 0, 0, r) for r in stakeholder_responses]
+    items.sort(key=lambda item: (item[0], item[1]))
+
+    turns = []
+    for _, kind, row in items:
+        if kind == 1 or not turns:
+            turns.append({"entries": [], "text": ""})
+        turn = turns[-1]
+        if kind == 1:
+            turn["entries"].append({"player_input": row.player_input})
+            line = f"Sales Rep: {row.player_input}"
+        else:
+            name = stakeholder_names.get(row.stakeholder_id, "Stakeholder")
+            turn["entries"].append({"stakeholder_id": row.stakeholder_id, "response": row.response_text or ""})
+            line = f"{name}: {row.response_text or ''}"
+        turn["text"] = f"{turn['text']}\n{line}" if turn["text"] else line
+    return turns
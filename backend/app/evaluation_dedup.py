@@ -0,0 +1,272 @@
+"""
+evaluation_dedup.py - Near-duplicate reuse of player response evaluations for PACER AI Service.
+
+Trainees often send nearly the same turn for the same scenario and stage
+("Hi, thanks for meeting me today..."), and the exact-match LLM cache misses
+them because a single word differs. Each evaluated player input gets a MinHash
+signature over character shingles of its normalised text, stored in the
+evaluation_signatures table. An in-memory LSH index (LLM_DEDUP_BANDS bands of
+LLM_DEDUP_NUM_PERM / LLM_DEDUP_BANDS rows) finds candidate inputs in the same
+"<scenario_id>:<pacer_stage>" scope. Candidates whose estimated Jaccard
+similarity reaches LLM_DEDUP_THRESHOLD are reused in place of an OpenAI call;
+when several qualify, their scores are blended, weighted by similarity.
+
+The index is loaded from the table and kept up to date incrementally: rows
+written by other workers are picked up by id every LLM_DEDUP_SYNC_SECONDS.
+Only LLM evaluations are indexed, never reused, blended or fallback ones, and
+the evaluation itself is read from InteractionEvaluation when it is reused, so
+a re-evaluated interaction is reused with its new scores.
+"""
+
+import hashlib
+import logging
+import os
+import random
+import re
+import struct
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+LLM_DEDUP_ENABLED = os.environ.get("LLM_DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_DEDUP_THRESHOLD = float(os.environ.get("LLM_DEDUP_THRESHOLD", "0.85"))
+LLM_DEDUP_NUM_PERM = int(os.environ.get("LLM_DEDUP_NUM_PERM", "128"))
+LLM_DEDUP_BANDS = int(os.environ.get("LLM_DEDUP_BANDS", "16"))
+LLM_DEDUP_SHINGLE_SIZE = int(os.environ.get("LLM_DEDUP_SHINGLE_SIZE", "5"))
+LLM_DEDUP_MIN_WORDS = int(os.environ.get("LLM_DEDUP_MIN_WORDS", "5"))
+LLM_DEDUP_MAX_MATCHES = int(os.environ.get("LLM_DEDUP_MAX_MATCHES", "3"))
+LLM_DEDUP_SYNC_SECONDS = float(os.environ.get("LLM_DEDUP_SYNC_SECONDS", "5"))
+
+if LLM_DEDUP_NUM_PERM % LLM_DEDUP_BANDS:
+    logger.error(f"LLM_DEDUP_NUM_PERM ({LLM_DEDUP_NUM_PERM}) is not a multiple of LLM_DEDUP_BANDS "
+                 f"({LLM_DEDUP_BANDS}); near-duplicate reuse is disabled")
+    LLM_DEDUP_ENABLED = False
+
+SCORE_FIELDS = ("methodology_score", "rapport_score", "progress_score", "outcome_score")
+# Best-match similarity histogram buckets reported for threshold tuning
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: signatures are persisted, so the permutations must never change
+_rng = random.Random(20240501)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(LLM_DEDUP_NUM_PERM)
+]
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+_DIGITS_RE = re.compile(r"\d+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation, fold numbers and collapse whitespace."""
+    text = _DIGITS_RE.sub("0", (text or "").lower())
+    return _SPACES_RE.sub(" ", _NON_WORD_RE.sub(" ", text)).strip()
+
+
+def _shingle_hashes(text: str) -> set:
+    size = LLM_DEDUP_SHINGLE_SIZE
+    shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+    # Stable across processes, unlike hash()
+    return {
+        struct.unpack("<I", hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest())[0]
+        for shingle in shingles
+    }
+
+
+def signature(text: str) -> Optional[List[int]]:
+    """MinHash signature of a player input, or None if it is too short to compare reliably."""
+    normalized = normalize(text)
+    if len(normalized.split(" ")) < LLM_DEDUP_MIN_WORDS:
+        return None
+    hashes = _shingle_hashes(normalized)
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two inputs behind two signatures."""
+    if len(sig_a) != len(sig_b) or not sig_a:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def scope_key(scenario_id, pacer_stage: str) -> str:
+    return f"{scenario_id}:{pacer_stage or 'P'}"
+
+
+class LSHIndex:
+    """Banded MinHash index of evaluated player inputs, per scope, mirrored from evaluation_signatures."""
+
+    def __init__(self, num_perm: int = LLM_DEDUP_NUM_PERM, bands: int = LLM_DEDUP_BANDS):
+        self.rows = num_perm // bands
+        self.bands = bands
+        self._lock = threading.Lock()
+        # scope -> band -> band hash -> interaction ids
+        self._buckets: Dict[str, List[Dict[Tuple[int, ...], List[int]]]] = {}
+        self._signatures: Dict[int, List[int]] = {}
+        self._last_row_id = 0
+        self._synced_at = 0.0
+        self.counters = {"lookups": 0, "hits": 0, "blended": 0, "misses": 0, "skipped": 0, "indexed": 0}
+        self.histogram = defaultdict(int)
+
+    def _band_keys(self, sig: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(sig[band * self.rows:(band + 1) * self.rows])
+
+    def _insert(self, scope: str, interaction_id: int, sig: List[int]):
+        if interaction_id in self._signatures or len(sig) != self.rows * self.bands:
+            return
+        self._signatures[interaction_id] = sig
+        buckets = self._buckets.setdefault(scope, [{} for _ in range(self.bands)])
+        for band, key in self._band_keys(sig):
+            buckets[band].setdefault(key, []).append(interaction_id)
+
+    def sync(self, db, force: bool = False):
+        """Load signature rows added since the last sync (by any worker)."""
+        now = time.monotonic()
+        if not force and now - self._synced_at < LLM_DEDUP_SYNC_SECONDS:
+            return
+        self._synced_at = now
+        while True:
+            rows = db.query(
+                models.EvaluationSignature.id, models.EvaluationSignature.scope,
+                models.EvaluationSignature.interaction_id, models.EvaluationSignature.signature
+            ).filter(
+                models.EvaluationSignature.id > self._last_row_id
+            ).order_by(models.EvaluationSignature.id).limit(5000).all()
+            if not rows:
+                return
+            with self._lock:
+                for row_id, scope, interaction_id, sig in rows:
+                    self._insert(scope, interaction_id, sig or [])
+                    self._last_row_id = max(self._last_row_id, row_id)
+
+    def candidates(self, scope: str, sig: List[int]) -> List[Tuple[float, int]]:
+        """(similarity, interaction_id) of indexed inputs sharing a band with `sig`, best first."""
+        with self._lock:
+            buckets = self._buckets.get(scope)
+            if not buckets:
+                return []
+            found = set()
+            for band, key in self._band_keys(sig):
+                found.update(buckets[band].get(key, ()))
+            scored = [(similarity(sig, self._signatures[i]), i) for i in found]
+        return sorted(scored, reverse=True)
+
+    def add(self, db, scope: str, interaction_id: int, sig: List[int]):
+        """Persist a signature (not committed) and index it in this process right away."""
+        exists = db.query(models.EvaluationSignature.id).filter(
+            models.EvaluationSignature.interaction_id == interaction_id
+        ).first()
+        if exists is None:
+            db.add(models.EvaluationSignature(interaction_id=interaction_id, scope=scope, signature=sig))
+        with self._lock:
+            self._insert(scope, interaction_id, sig)
+            self.counters["indexed"] += 1
+
+    def record(self, outcome: str, best: Optional[float] = None):
+        with self._lock:
+            self.counters[outcome] += 1
+            if outcome != "skipped":
+                self.counters["lookups"] += 1
+            if best is not None:
+                bucket = max((b for b in SIMILARITY_BUCKETS if best >= b), default=0.0)
+                self.histogram[f">={bucket}"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            histogram = dict(self.histogram)
+            entries = len(self._signatures)
+            scopes = len(self._buckets)
+        reused = counters["hits"] + counters["blended"]
+        return {
+            "enabled": LLM_DEDUP_ENABLED,
+            "threshold": LLM_DEDUP_THRESHOLD,
+            "num_perm": self.rows * self.bands,
+            "bands": self.bands,
+            "entries": entries,
+            "scopes": scopes,
+            **counters,
+            "hit_rate": round(reused / counters["lookups"], 4) if counters["lookups"] else 0.0,
+            "best_similarity_histogram": histogram,
+        }
+
+
+_index = LSHIndex()
+
+
+def _blend(matches: List[Tuple[float, models.InteractionEvaluation]]) -> Dict:
+    """Similarity-weighted scores of the matches; texts come from the closest one."""
+    best_similarity, best = matches[0]
+    total_weight = sum(sim for sim, _ in matches)
+    evaluation = {
+        field: round(sum(sim * (getattr(record, field) or 0) for sim, record in matches) / total_weight, 1)
+        for field in SCORE_FIELDS
+    }
+    evaluation["total_score"] = sum(evaluation[field] for field in SCORE_FIELDS) / len(SCORE_FIELDS)
+    evaluation.update({
+        "feedback": best.feedback or "",
+        "skills_demonstrated": best.skills_demonstrated or {},
+        "strength": best.strength or "",
+        "improvement": best.improvement or "",
+        "methodology_feedback": best.methodology_feedback or "",
+        "rapport_feedback": best.rapport_feedback or "",
+        "progress_feedback": best.progress_feedback or "",
+        "outcome_feedback": best.outcome_feedback or "",
+        "reused_from": [record.interaction_id for _, record in matches],
+        "similarity": round(best_similarity, 4),
+    })
+    return evaluation
+
+
+def find_reusable(db, scenario_id, pacer_stage: str, player_input: str, exclude_id: Optional[int] = None) -> Tuple[Optional[Dict], Optional[List[int]]]:
+    """
+    Look up near-duplicates of a player input. Returns (evaluation, signature):
+    the reused/blended evaluation or None, and the input's signature (None if
+    too short) so the caller can index it after an LLM evaluation.
+    """
+    if not LLM_DEDUP_ENABLED:
+        return None, None
+    sig = signature(player_input)
+    if sig is None:
+        _index.record("skipped")
+        return None, None
+    _index.sync(db)
+    candidates = [(sim, i) for sim, i in _index.candidates(scope_key(scenario_id, pacer_stage), sig) if i != exclude_id]
+    best = candidates[0][0] if candidates else None
+    qualifying = [(sim, i) for sim, i in candidates if sim >= LLM_DEDUP_THRESHOLD][:LLM_DEDUP_MAX_MATCHES]
+    records = {}
+    if qualifying:
+        for record in db.query(models.InteractionEvaluation).filter(
+            models.InteractionEvaluation.interaction_id.in_([i for _, i in qualifying])
+        ).order_by(models.InteractionEvaluation.id).all():
+            records.setdefault(record.interaction_id, record)
+    matches = [(sim, records[i]) for sim, i in qualifying if i in records]
+    if not matches:
+        _index.record("misses", best)
+        return None, sig
+    _index.record("hits" if len(matches) == 1 else "blended", best)
+    logger.info(f"Reusing evaluation of interaction(s) {[r.interaction_id for _, r in matches]} "
+                f"(similarity {matches[0][0]:.2f}) for a near-duplicate input")
+    return _blend(matches), sig
+
+
+def index_evaluation(db, scenario_id, pacer_stage: str, interaction_id: int, sig: Optional[List[int]]):
+    """Index an input that was evaluated by the LLM. Not committed."""
+    if LLM_DEDUP_ENABLED and sig is not None:
+        _index.add(db, scope_key(scenario_id, pacer_stage), interaction_id, sig)
+
+
+def get_stats() -> Dict:
+    return _index.stats()
@@ -0,0 +1,253 @@
+"""
+evaluation_jobs.py - Background evaluation of player turns for PACER AI Service.
+
+Routes never evaluate inline. Once a turn (or an event response) is stored they
+queue a durable job through evaluation_queue.py and either return right away
+(the streamed reply) or wait a bounded time for the result. The handlers below
+run in whichever worker claims the job and write their results idempotently:
+an interaction has at most one InteractionEvaluation row, and an event's
+difficulty adjustment is committed atomically with the job's completion.
+Until a turn's job completes, its status carries an instant provisional
+pre-score (prescoring.py) for the UI to show in the meantime; once the LLM has
+streamed its scores, they replace the pre-scores there before the feedback is done.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+from . import models
+from . import evaluation_queue
+from . import evaluation_dedup
+from .prescoring import prescore_turn
+from .scoring import calculate_total_score
+from .ai_service import AIService
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_JOB = "evaluate_player_response"
+EVENT_RESPONSE_JOB = "evaluate_player_event_response"
+
+# How long routes that return the evaluation in their response wait for the job
+EVALUATION_INLINE_WAIT_SECONDS = float(os.environ.get("EVALUATION_INLINE_WAIT_SECONDS", "20"))
+
+
+def evaluation_columns(evaluation: Dict) -> Dict:
+    """InteractionEvaluation column values for an AIService.evaluate_player_response result."""
+    return {
+        "methodology_score": evaluation.get("methodology_score", 0),
+        "rapport_score": evaluation.get("rapport_score", 0),
+        "progress_score": evaluation.get("progress_score", 0),
+        "outcome_score": evaluation.get("outcome_score", 0),
+        "feedback": evaluation.get("feedback", ""),
+        "skills_demonstrated": evaluation.get("skills_demonstrated", {}),
+        "strength": evaluation.get("strength", ""),
+        "improvement": evaluation.get("improvement", ""),
+        "methodology_feedback": evaluation.get("methodology_feedback", ""),
+        "rapport_feedback": evaluation.get("rapport_feedback", ""),
+        "progress_feedback": evaluation.get("progress_feedback", ""),
+        "outcome_feedback": evaluation.get("outcome_feedback", ""),
+    }
+
+
+def save_interaction_evaluation(db, interaction_id: int, evaluation: Dict, commit: bool = True) -> Optional[models.InteractionEvaluation]:
+    """Store (or replace) the evaluation of an interaction and mark feedback as provided."""
+    interaction = db.get(models.Interaction, interaction_id)
+    if not interaction:
+        logger.error(f"Cannot save evaluation: interaction {interaction_id} not found")
+        return None
+    eval_record = db.query(models.InteractionEvaluation).filter(
+        models.InteractionEvaluation.interaction_id == interaction_id
+    ).order_by(models.InteractionEvaluation.id).first()
+    if eval_record is None:
+        eval_record = models.InteractionEvaluation(interaction_id=interaction_id)
+        db.add(eval_record)
+    for column, value in evaluation_columns(evaluation).items():
+        setattr(eval_record, column, value)
+    interaction.feedback_provided = True
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return eval_record
+
+
+def evaluation_to_dict(eval_record: models.InteractionEvaluation) -> Dict:
+    """Convert a stored evaluation into the dict shape returned by AIService.evaluate_player_response."""
+    return {
+        "methodology_score": eval_record.methodology_score,
+        "rapport_score": eval_record.rapport_score,
+        "progress_score": eval_record.progress_score,
+        "outcome_score": eval_record.outcome_score,
+        "feedback": eval_record.feedback,
+        "skills_demonstrated": eval_record.skills_demonstrated or {},
+        "strength": eval_record.strength,
+        "improvement": eval_record.improvement,
+        "methodology_feedback": eval_record.methodology_feedback,
+        "rapport_feedback": eval_record.rapport_feedback,
+        "progress_feedback": eval_record.progress_feedback,
+        "outcome_feedback": eval_record.outcome_feedback,
+    }
+
+
+def apply_event_evaluation(db, occurrence_id: int, evaluation: Dict) -> Dict:
+    """
+    Store an event response evaluation on its occurrence and adjust the session
+    difficulty. Not committed here: the queue commits it together with the job's
+    completion, so a retried job cannot shift the difficulty twice.
+    """
+    occurrence = db.get(models.EventOccurrence, occurrence_id)
+    if not occurrence:
+        raise ValueError(f"Event occurrence {occurrence_id} not found")
+    # The event evaluation prompt scores the handling as impact_score (0-100)
+    score = evaluation.get("impact_score", 50) / 100.0  # Convert to 0.0-1.0 scale
+    occurrence.impact_score = score
+
+    # Events that are handled well can slightly reduce difficulty, poorly handled events increase it
+    impact_adjustment = (0.5 - score) * 0.2
+    game_session = db.get(models.GameSession, occurrence.game_session_id)
+    if game_session:
+        game_session.difficulty_factor = max(0.5, min(2.0, game_session.difficulty_factor + impact_adjustment))
+    db.flush()
+    return {"evaluation": evaluation, "difficulty_adjustment": impact_adjustment}
+
+
+# --- job handlers ---
+
+async def _run_interaction_evaluation(db, job: models.EvaluationJob) -> Dict:
+    payload = job.payload or {}
+    interaction = db.get(models.Interaction, job.target_id)
+    if not interaction:
+        raise ValueError(f"Interaction {job.target_id} not found")
+    scenario_id = db.query(models.GameSession.scenario_id).filter(
+        models.GameSession.id == interaction.game_session_id
+    ).scalar()
+    pacer_stage = payload.get("pacer_stage", "P")
+
+    # A near-duplicate of an already evaluated input for the same scenario and stage is reused
+    evaluation, signature = evaluation_dedup.find_reusable(
+        db, scenario_id, pacer_stage, payload.get("player_input", ""), exclude_id=job.target_id
+    )
+    if evaluation is None:
+        evaluation = await AIService.evaluate_player_response(
+            payload.get("player_input", ""),
+            payload.get("ai_response", ""),
+            pacer_stage,
+            payload.get("client_persona") or {},
+            # Never store the pre-score as the evaluation: during an outage the job fails and
+            # is retried, while the status keeps serving it as the provisional evaluation
+            allow_fallback=False,
+            on_scores=lambda scores: evaluation_queue.report_progress(
+                job.id, job.locked_by, {"partial_scores": scores}
+            )
+        )
+        if not evaluation.get("provisional"):
+            # MOCK_MODE scores with the pre-scorer; those are not worth reusing
+            evaluation_dedup.index_evaluation(db, scenario_id, pacer_stage, job.target_id, signature)
+    save_interaction_evaluation(db, job.target_id, evaluation, commit=False)
+    return evaluation
+
+
+async def _run_event_evaluation(db, job: models.EvaluationJob) -> Dict:
+    payload = job.payload or {}
+    evaluation = await AIService.evaluate_player_event_response(
+        event_type=payload.get("event_type", ""),
+        event_description=payload.get("event_description", ""),
+        player_response=payload.get("player_response", ""),
+        # An upstream failure must fail the job so it is retried, not commit a canned score
+        allow_fallback=False
+    )
+    return apply_event_evaluation(db, job.target_id, evaluation)
+
+
+evaluation_queue.register_handler(INTERACTION_JOB, _run_interaction_evaluation)
+evaluation_queue.register_handler(EVENT_RESPONSE_JOB, _run_event_evaluation)
+
+
+# --- scheduling and status ---
+
+def schedule_interaction_evaluation(
+    db,
+    interaction_id: int,
+    player_input: str,
+    ai_response: str,
+    pacer_stage: str,
+    client_persona: Dict
+) -> models.EvaluationJob:
+    """Queue the evaluation of a completed turn."""
+    return evaluation_queue.enqueue(db, INTERACTION_JOB, interaction_id, {
+        "player_input": player_input,
+        "ai_response": ai_response,
+        "pacer_stage": pacer_stage,
+        "client_persona": client_persona,
+    })
+
+
+def schedule_event_evaluation(
+    db,
+    occurrence_id: int,
+    event_type: str,
+    event_description: str,
+    player_response: str
+) -> models.EvaluationJob:
+    """Queue the evaluation of a player's response to an event; a new response replaces the old result."""
+    return evaluation_queue.enqueue(db, EVENT_RESPONSE_JOB, occurrence_id, {
+        "event_type": event_type,
+        "event_description": event_description,
+        "player_response": player_response,
+    }, force=True)
+
+
+def provisional_evaluation(payload: Optional[Dict], partial_scores: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Instant pre-score of a queued turn, shown until its LLM evaluation lands.
+    Scores the LLM has already streamed (partial_scores) take precedence.
+    """
+    if not payload:
+        return None
+    evaluation = prescore_turn(
+        payload.get("player_input", ""),
+        payload.get("ai_response", ""),
+        payload.get("pacer_stage", "P"),
+        payload.get("client_persona") or {}
+    )
+    if partial_scores:
+        evaluation.update(partial_scores)
+        evaluation["total_score"] = calculate_total_score(evaluation)
+        evaluation["partial"] = True
+    return evaluation
+
+
+def _interaction_status(interaction_id: int, job_status: Optional[Dict]) -> Optional[Dict]:
+    if job_status is None:
+        return None
+    status = job_status["status"]
+    completed = status == "completed"
+    return {
+        "interaction_id": interaction_id,
+        # Running jobs are still "pending" as far as clients are concerned
+        "status": "pending" if status == "running" else status,
+        "evaluation": job_status["result"] if completed else None,
+        "provisional_evaluation": None if completed else provisional_evaluation(
+            job_status["payload"], (job_status["result"] or {}).get("partial_scores")
+        ),
+        "error": job_status["error"],
+        "attempts": job_status["attempts"],
+    }
+
+
+def get_evaluation_status(db, interaction_id: int) -> Optional[Dict]:
+    """Return the job status of an interaction's evaluation, or None if none was queued."""
+    job = evaluation_queue.get_job(db, INTERACTION_JOB, interaction_id)
+    return _interaction_status(interaction_id, evaluation_queue.job_status(job))
+
+
+async def wait_for_evaluation(interaction_id: int, timeout: float) -> Optional[Dict]:
+    """Wait up to `timeout` seconds for an interaction's evaluation job to finish and return its status."""
+    job_status = await evaluation_queue.wait_for_job(INTERACTION_JOB, interaction_id, timeout)
+    return _interaction_status(interaction_id, job_status)
+
+
+async def wait_for_event_evaluation(occurrence_id: int, timeout: float) -> Optional[Dict]:
+    """Wait up to `timeout` seconds for an event response evaluation and return the job status."""
+    return await evaluation_queue.wait_for_job(EVENT_RESPONSE_JOB, occurrence_id, timeout)
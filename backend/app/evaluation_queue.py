@@ -0,0 +1,386 @@
+"""
+evaluation_queue.py - Durable evaluation job queue for PACER AI Service.
+
+Evaluations are stored as rows in the evaluation_jobs table instead of living
+only in a request handler or an in-process task, so a crash, a redeploy or a
+client disconnect no longer loses them. Any number of workers, in the API
+process (EVALUATION_EMBEDDED_WORKER) or standalone via run_evaluation_worker.py,
+claim jobs with a conditional UPDATE, which is atomic on both SQLite and
+PostgreSQL. A failed job is retried with exponential backoff until
+EVALUATION_MAX_ATTEMPTS; a job whose worker died is reclaimed once its lease
+(EVALUATION_LEASE_SECONDS) expires.
+
+There is at most one job per (job_type, target): enqueueing the same target
+again returns the existing job, and handlers write their results as upserts,
+so running a job twice is harmless. Handlers do not commit: their writes are
+committed in the same transaction that marks the job completed. Handlers are
+registered by evaluation_jobs.py.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+EVALUATION_MAX_ATTEMPTS = int(os.environ.get("EVALUATION_MAX_ATTEMPTS", "5"))
+EVALUATION_RETRY_BASE_SECONDS = float(os.environ.get("EVALUATION_RETRY_BASE_SECONDS", "5"))
+EVALUATION_RETRY_MAX_SECONDS = float(os.environ.get("EVALUATION_RETRY_MAX_SECONDS", "300"))
+EVALUATION_LEASE_SECONDS = float(os.environ.get("EVALUATION_LEASE_SECONDS", "300"))
+EVALUATION_WORKER_CONCURRENCY = int(os.environ.get("EVALUATION_WORKER_CONCURRENCY", "4"))
+EVALUATION_POLL_INTERVAL = float(os.environ.get("EVALUATION_POLL_INTERVAL", "1.0"))
+EVALUATION_EMBEDDED_WORKER = os.environ.get("EVALUATION_EMBEDDED_WORKER", "true").lower() in ("1", "true", "yes")
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# job_type -> async handler(db, job) returning the JSON-serialisable job result;
+# handlers leave their writes uncommitted
+JobHandler = Callable[[object, models.EvaluationJob], Awaitable[Dict]]
+_handlers: Dict[str, JobHandler] = {}
+
+# In-process notifications: wake the embedded worker on enqueue, wake waiters on completion
+_wakeup: Optional[asyncio.Event] = None
+_wakeup_loop: Optional[asyncio.AbstractEventLoop] = None
+_done_events: Dict[int, asyncio.Event] = {}
+
+
+def register_handler(job_type: str, handler: JobHandler):
+    _handlers[job_type] = handler
+
+
+def dedupe_key(job_type: str, target_id: int) -> str:
+    return f"{job_type}:{target_id}"
+
+
+def _notify_worker():
+    if _wakeup is not None and _wakeup_loop is not None and not _wakeup_loop.is_closed():
+        _wakeup_loop.call_soon_threadsafe(_wakeup.set)
+
+
+def _notify_done(job_id: int):
+    event = _done_events.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+def get_job(db, job_type: str, target_id: int) -> Optional[models.EvaluationJob]:
+    return db.query(models.EvaluationJob).filter(
+        models.EvaluationJob.dedupe_key == dedupe_key(job_type, target_id)
+    ).first()
+
+
+def enqueue(db, job_type: str, target_id: int, payload: Dict, force: bool = False) -> models.EvaluationJob:
+    """
+    Queue a job for a target and commit. If the target already has a job it is
+    returned as is; a failed job, or any finished job when `force` is set, is
+    reset with the new payload and run again (a pending job just gets the new
+    payload when `force` is set).
+    """
+    job = get_job(db, job_type, target_id)
+    if job is None:
+        job = models.EvaluationJob(
+            job_type=job_type,
+            target_id=target_id,
+            dedupe_key=dedupe_key(job_type, target_id),
+            payload=payload,
+            status="pending",
+            attempts=0,
+            max_attempts=EVALUATION_MAX_ATTEMPTS,
+            run_after=datetime.utcnow(),
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request queued the same target first
+            db.rollback()
+            job = get_job(db, job_type, target_id)
+        else:
+            logger.info(f"Queued {job_type} job {job.id} for target {target_id}")
+            _notify_worker()
+        return job
+
+    if job.status == "failed" or (force and job.status == "completed"):
+        now = datetime.utcnow()
+        job.payload = payload
+        job.status = "pending"
+        job.attempts = 0
+        job.run_after = now
+        job.last_error = None
+        job.result = None
+        job.completed_at = None
+        job.updated_at = now
+        db.commit()
+        logger.info(f"Re-queued {job_type} job {job.id} for target {target_id}")
+        _notify_worker()
+    elif force and job.status == "pending":
+        # Not picked up yet: make sure it runs with the latest input
+        job.payload = payload
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    return job
+
+
+def _claimable(now: datetime):
+    stale = now - timedelta(seconds=EVALUATION_LEASE_SECONDS)
+    return or_(
+        and_(models.EvaluationJob.status == "pending", models.EvaluationJob.run_after <= now),
+        and_(models.EvaluationJob.status == "running", models.EvaluationJob.locked_at < stale),
+    )
+
+
+def claim_jobs(db, worker_id: str, limit: int) -> List[int]:
+    """
+    Claim up to `limit` due jobs for a worker. Each claim is a conditional UPDATE
+    that only succeeds if the job is still claimable, so concurrent workers never
+    run the same job.
+    """
+    if limit <= 0:
+        return []
+    now = datetime.utcnow()
+    candidates = db.query(models.EvaluationJob.id).filter(_claimable(now)).order_by(
+        models.EvaluationJob.run_after, models.EvaluationJob.id
+    ).limit(limit * 2).all()
+
+    claimed = []
+    for (job_id,) in candidates:
+        if len(claimed) >= limit:
+            break
+        updated = db.query(models.EvaluationJob).filter(
+            models.EvaluationJob.id == job_id,
+            _claimable(now)
+        ).update({
+            models.EvaluationJob.status: "running",
+            models.EvaluationJob.locked_by: worker_id,
+            models.EvaluationJob.locked_at: now,
+            models.EvaluationJob.attempts: models.EvaluationJob.attempts + 1,
+            models.EvaluationJob.updated_at: now,
+        }, synchronize_session=False)
+        db.commit()
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the attempt that just failed."""
+    delay = min(EVALUATION_RETRY_MAX_SECONDS, EVALUATION_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(db, job_id: int, worker_id: str, values: Dict) -> bool:
+    """
+    Update a job we hold and commit, together with whatever the handler wrote.
+    If our lease was taken over by another worker, everything is rolled back
+    and False is returned.
+    """
+    values[models.EvaluationJob.updated_at] = datetime.utcnow()
+    updated = db.query(models.EvaluationJob).filter(
+        models.EvaluationJob.id == job_id,
+        models.EvaluationJob.locked_by == worker_id,
+        models.EvaluationJob.status == "running"
+    ).update(values, synchronize_session=False)
+    if not updated:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def report_progress(job_id: int, worker_id: str, result: Dict) -> bool:
+    """
+    Publish an intermediate result of a running job we hold, e.g. the scores of
+    an evaluation whose feedback is still streaming. Written in its own session
+    so the handler's own writes stay uncommitted until the job finishes.
+    """
+    db = SessionLocal()
+    try:
+        updated = db.query(models.EvaluationJob).filter(
+            models.EvaluationJob.id == job_id,
+            models.EvaluationJob.locked_by == worker_id,
+            models.EvaluationJob.status == "running"
+        ).update({
+            models.EvaluationJob.result: result,
+            models.EvaluationJob.updated_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+    except Exception as e:
+        logger.warning(f"Could not report progress of evaluation job {job_id}: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+async def run_job(job_id: int, worker_id: str):
+    """Run one claimed job in its own database session."""
+    db = SessionLocal()
+    try:
+        job = db.get(models.EvaluationJob, job_id)
+        if job is None:
+            return
+        handler = _handlers.get(job.job_type)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job type {job.job_type}")
+            if job.attempts > (job.max_attempts or EVALUATION_MAX_ATTEMPTS):
+                raise RuntimeError("Attempts exhausted (lease expired while running)")
+            result = await handler(db, job)
+        except Exception as e:
+            db.rollback()
+            attempts = job.attempts or 1
+            if attempts >= (job.max_attempts or EVALUATION_MAX_ATTEMPTS):
+                values = {
+                    models.EvaluationJob.status: "failed",
+                    models.EvaluationJob.completed_at: datetime.utcnow(),
+                }
+                logger.error(f"{job.job_type} job {job_id} failed permanently after {attempts} attempts: {e}")
+            else:
+                delay = retry_delay(attempts)
+                values = {
+                    models.EvaluationJob.status: "pending",
+                    models.EvaluationJob.run_after: datetime.utcnow() + timedelta(seconds=delay),
+                }
+                logger.warning(f"{job.job_type} job {job_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+            values[models.EvaluationJob.last_error] = str(e)[:2000]
+            values[models.EvaluationJob.result] = None
+            values[models.EvaluationJob.locked_by] = None
+            _finish(db, job_id, worker_id, values)
+            return
+
+        if _finish(db, job_id, worker_id, {
+            models.EvaluationJob.status: "completed",
+            models.EvaluationJob.result: result,
+            models.EvaluationJob.last_error: None,
+            models.EvaluationJob.locked_by: None,
+            models.EvaluationJob.completed_at: datetime.utcnow(),
+        }):
+            logger.info(f"{job.job_type} job {job_id} completed for target {job.target_id}")
+        else:
+            logger.warning(f"{job.job_type} job {job_id} finished after its lease was taken over")
+    except Exception as e:
+        logger.error(f"Error running evaluation job {job_id}: {e}", exc_info=True)
+        db.rollback()
+    finally:
+        db.close()
+        _notify_done(job_id)
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+async def run_worker(
+    concurrency: int = EVALUATION_WORKER_CONCURRENCY,
+    poll_interval: float = EVALUATION_POLL_INTERVAL,
+    stop: Optional[asyncio.Event] = None,
+    worker_id: Optional[str] = None,
+    once: bool = False
+):
+    """
+    Claim and run jobs with at most `concurrency` in flight until `stop` is set.
+    With `once`, return as soon as the queue has no due jobs left.
+    """
+    global _wakeup, _wakeup_loop
+    worker_id = worker_id or new_worker_id()
+    stop = stop or asyncio.Event()
+    _wakeup, _wakeup_loop = asyncio.Event(), asyncio.get_running_loop()
+    running = set()
+    logger.info(f"Evaluation worker {worker_id} started (concurrency={concurrency})")
+    try:
+        while not stop.is_set():
+            # Cleared before claiming so an enqueue during the claim is not missed
+            _wakeup.clear()
+            db = SessionLocal()
+            try:
+                job_ids = claim_jobs(db, worker_id, concurrency - len(running))
+            except Exception as e:
+                logger.error(f"Evaluation worker {worker_id} could not claim jobs: {e}")
+                db.rollback()
+                job_ids = []
+            finally:
+                db.close()
+
+            for job_id in job_ids:
+                task = asyncio.create_task(run_job(job_id, worker_id))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+            if once and not job_ids and not running:
+                break
+
+            # Sleep until a job finishes, a job is enqueued in this process, or the poll interval passes
+            waiters = [asyncio.ensure_future(_wakeup.wait()), asyncio.ensure_future(stop.wait())]
+            if running:
+                waiters.append(asyncio.ensure_future(asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)))
+            _, pending = await asyncio.wait(waiters, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+    finally:
+        if running:
+            logger.info(f"Evaluation worker {worker_id} waiting for {len(running)} running jobs")
+            await asyncio.gather(*running, return_exceptions=True)
+        _wakeup, _wakeup_loop = None, None
+        logger.info(f"Evaluation worker {worker_id} stopped")
+
+
+def job_status(job: Optional[models.EvaluationJob]) -> Optional[Dict]:
+    if job is None:
+        return None
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.last_error,
+        "payload": job.payload,
+    }
+
+
+async def wait_for_job(job_type: str, target_id: int, timeout: float) -> Optional[Dict]:
+    """
+    Wait up to `timeout` seconds for a target's job to finish and return its status.
+    Jobs run by this process wake the waiter directly; jobs run by other workers
+    are noticed by polling.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0.0, timeout)
+    while True:
+        db = SessionLocal()
+        try:
+            status = job_status(get_job(db, job_type, target_id))
+        finally:
+            db.close()
+        remaining = deadline - loop.time()
+        if status is None or status["status"] in TERMINAL_STATUSES or remaining <= 0:
+            if status is not None:
+                _done_events.pop(status["job_id"], None)
+            return status
+        event = _done_events.setdefault(status["job_id"], asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=min(remaining, EVALUATION_POLL_INTERVAL))
+        except asyncio.TimeoutError:
+            pass
+
+
+def queue_stats(db) -> Dict:
+    """Job counts per type and status, for metrics."""
+    rows = db.query(
+        models.EvaluationJob.job_type, models.EvaluationJob.status, func.count(models.EvaluationJob.id)
+    ).group_by(models.EvaluationJob.job_type, models.EvaluationJob.status).all()
+    stats: Dict[str, Dict[str, int]] = {}
+    for job_type, status, count in rows:
+        stats.setdefault(job_type, {})[status] = count
+    return stats
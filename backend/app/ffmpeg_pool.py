@@ -0,0 +1,397 @@
+"""
+ffmpeg_pool.py - Pool of long-lived FFmpeg transcoders for PACER AI Service.
+
+Clients that record with MediaRecorder send realtime audio as binary WebM/Opus
+frames (see AIService.handle_realtime_conversation), and OpenAI takes raw
+PCM16. Starting a new FFmpeg process per chunk made process startup the
+dominant cost and lost the WebM container state between chunks (only the
+first chunk carries the header). Each audio stream now gets one FFmpeg process
+for its whole lifetime: chunks are written to its stdin and the PCM it has
+produced so far is read back from stdout.
+
+- FFMPEG_PATH selects the binary (default: "ffmpeg" on the PATH).
+- FFMPEG_MAX_TRANSCODERS caps concurrent processes; acquiring one waits up to
+  FFMPEG_ACQUIRE_TIMEOUT_SECONDS for a free slot.
+- A transcoder whose process dies is restarted (up to FFMPEG_MAX_RESTARTS per
+  stream), replaying the WebM header (the bytes before the first Cluster) so
+  decoding can resume with the next chunk.
+- The pool keeps each stream's header until the stream is released by its
+  owner, so a transcoder replacing one that failed or was closed as idle is
+  seeded with it too. A stream whose header is unknown and whose chunk does not
+  start one raises MissingHeaderError: the client has to restart recording.
+- A periodic health check restarts dead processes and closes streams idle for
+  longer than FFMPEG_IDLE_SECONDS.
+
+Call shutdown() when the app stops.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import time
+from collections import deque
+from typing import Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
+FFMPEG_MAX_TRANSCODERS = int(os.environ.get("FFMPEG_MAX_TRANSCODERS", "16"))
+FFMPEG_ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get("FFMPEG_ACQUIRE_TIMEOUT_SECONDS", "5"))
+FFMPEG_MAX_RESTARTS = int(os.environ.get("FFMPEG_MAX_RESTARTS", "3"))
+FFMPEG_IDLE_SECONDS = float(os.environ.get("FFMPEG_IDLE_SECONDS", "60"))
+FFMPEG_HEALTH_INTERVAL_SECONDS = float(os.environ.get("FFMPEG_HEALTH_INTERVAL_SECONDS", "10"))
+# How long a feed waits for the first PCM of its chunk; later output is returned by the next feed
+FFMPEG_READ_WAIT_SECONDS = float(os.environ.get("FFMPEG_READ_WAIT_SECONDS", "0.05"))
+
+# The transcription endpoint takes 16 kHz audio; Realtime conversation sessions take 24 kHz
+DEFAULT_SAMPLE_RATE = 16000
+
+
+def webm_to_pcm16_args(sample_rate: int = DEFAULT_SAMPLE_RATE):
+    """WebM/Opus in on stdin, mono PCM signed 16-bit little-endian out on stdout."""
+    return [
+        "-loglevel", "error",
+        "-f", "webm",
+        "-i", "pipe:0",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "-ac", "1",
+        "-f", "s16le",
+        "pipe:1",
+    ]
+
+
+WEBM_TO_PCM16_ARGS = webm_to_pcm16_args()
+
+READ_CHUNK_BYTES = 64 * 1024
+# EBML ID of a WebM Cluster; everything before the first one is the container header
+WEBM_CLUSTER_ID = b"\x1f\x43\xb6\x75"
+# Magic number every WebM (EBML) stream starts with
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+
+
+class TranscoderError(Exception):
+    """No transcoder could be provided, or one failed beyond its restart budget."""
+
+
+class MissingHeaderError(TranscoderError):
+    """A stream continued mid-way without a known header; it has to be restarted from its first chunk."""
+
+
+def ffmpeg_command(args=WEBM_TO_PCM16_ARGS):
+    return [FFMPEG_PATH, *args]
+
+
+def webm_header(first_chunk: bytes) -> bytes:
+    """The container header at the start of a WebM stream, without its first audio clusters."""
+    cluster_start = first_chunk.find(WEBM_CLUSTER_ID)
+    return first_chunk[:cluster_start] if cluster_start > 0 else first_chunk
+
+
+def starts_stream(chunk: bytes) -> bool:
+    """Whether a chunk is the start of a WebM stream, i.e. carries its header."""
+    return chunk.startswith(EBML_MAGIC)
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_PATH) is not None or os.path.isfile(FFMPEG_PATH)
+
+
+def convert_once(input_bytes: bytes) -> Optional[bytes]:
+    """One-shot conversion of a complete WebM payload in a fresh FFmpeg process (blocking)."""
+    try:
+        result = subprocess.run(ffmpeg_command(), input=input_bytes, capture_output=True, check=False)
+    except FileNotFoundError:
+        logger.error(f"FFmpeg not found at {FFMPEG_PATH!r}. Install it or set FFMPEG_PATH.")
+        return None
+    if result.returncode != 0:
+        logger.error(f"FFmpeg error (code {result.returncode}): {result.stderr.decode(errors='ignore')}")
+        return None
+    return result.stdout
+
+
+class Transcoder:
+    """One FFmpeg process bound to one audio stream."""
+
+    def __init__(self, stream_id: Hashable, sample_rate: int = DEFAULT_SAMPLE_RATE, header: Optional[bytes] = None):
+        self.stream_id = stream_id
+        self.sample_rate = sample_rate
+        self.closed = False
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+        self.last_used = time.monotonic()
+        self._header: Optional[bytes] = header
+        self._output = bytearray()
+        self._output_ready = asyncio.Event()
+        self._stderr_tail = deque(maxlen=5)
+        self._readers = []
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *ffmpeg_command(webm_to_pcm16_args(self.sample_rate)),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except (FileNotFoundError, PermissionError) as e:
+            raise TranscoderError(f"Cannot start FFmpeg at {FFMPEG_PATH!r}: {e}") from e
+        self._readers = [
+            asyncio.create_task(self._read_stdout(self.process)),
+            asyncio.create_task(self._read_stderr(self.process)),
+        ]
+        _stats["started"] += 1
+        logger.debug(f"FFmpeg transcoder started for stream {self.stream_id} (pid {self.process.pid})")
+        if self._header is not None:
+            # A fresh process needs the container header before it can decode later clusters
+            try:
+                self.process.stdin.write(self._header)
+                await self.process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise TranscoderError(f"FFmpeg for stream {self.stream_id} exited right after starting: {e}") from e
+
+    async def _read_stdout(self, process):
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            self._output += chunk
+            self._output_ready.set()
+
+    async def _read_stderr(self, process):
+        # Drained continuously so a chatty FFmpeg can never block on a full pipe
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                break
+            self._stderr_tail.append(line.decode(errors="ignore").strip())
+
+    def _take_output(self) -> bytes:
+        output = bytes(self._output)
+        self._output.clear()
+        self._output_ready.clear()
+        _stats["bytes_out"] += len(output)
+        return output
+
+    async def _restart(self, reason: str):
+        if self.closed:
+            raise TranscoderError(f"FFmpeg transcoder for stream {self.stream_id} is closed")
+        if self.restarts >= FFMPEG_MAX_RESTARTS:
+            raise TranscoderError(f"FFmpeg for stream {self.stream_id} failed {self.restarts + 1} times: {reason}")
+        self.restarts += 1
+        _stats["restarts"] += 1
+        logger.warning(
+            f"Restarting FFmpeg for stream {self.stream_id} ({reason}); stderr: {' | '.join(self._stderr_tail)}"
+        )
+        await self._stop(kill=True)
+        await self.start()
+
+    async def feed(self, data: bytes) -> bytes:
+        """Write a chunk of the stream and return the PCM produced so far."""
+        async with self._lock:
+            if self.closed:
+                raise TranscoderError(f"FFmpeg transcoder for stream {self.stream_id} is closed")
+            self.last_used = time.monotonic()
+            if self._header is None:
+                if not starts_stream(data):
+                    raise MissingHeaderError(f"Stream {self.stream_id} has no WebM header to decode its chunks with")
+                self._header = webm_header(data)
+            _stats["bytes_in"] += len(data)
+            for attempt in range(2):
+                if not self.alive:
+                    await self._restart("process exited")
+                try:
+                    self.process.stdin.write(data)
+                    await self.process.stdin.drain()
+                    break
+                except (BrokenPipeError, ConnectionResetError) as e:
+                    if attempt:
+                        raise TranscoderError(f"FFmpeg for stream {self.stream_id} rejected a chunk twice: {e}") from e
+                    await self._restart(f"write failed: {e}")
+            if not self._output:
+                try:
+                    await asyncio.wait_for(self._output_ready.wait(), FFMPEG_READ_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            return self._take_output()
+
+    async def _stop(self, kill: bool = False, timeout: float = 2.0):
+        process = self.process
+        if process is None:
+            return
+        if process.returncode is None:
+            if kill:
+                process.kill()
+            else:
+                try:
+                    process.stdin.close()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        for reader in self._readers:
+            try:
+                await asyncio.wait_for(reader, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                reader.cancel()
+        self._readers = []
+
+    async def close(self) -> bytes:
+        """End the stream: let FFmpeg flush, stop the process and return the remaining PCM."""
+        async with self._lock:
+            # Feeds and restarts after this point fail instead of spawning an untracked process
+            self.closed = True
+            await self._stop()
+            return self._take_output()
+
+    def read_available(self) -> bytes:
+        """PCM produced since the last feed, e.g. to send the tail of an utterance before committing it."""
+        return self._take_output()
+
+
+class FFmpegPool:
+    """Transcoders keyed by audio stream, capped at `max_transcoders` processes."""
+
+    def __init__(self, max_transcoders: int = FFMPEG_MAX_TRANSCODERS):
+        self.max_transcoders = max_transcoders
+        self._transcoders: Dict[Hashable, Transcoder] = {}
+        # Header of each stream, kept across transcoders until the stream is released by its owner
+        self._headers: Dict[Hashable, bytes] = {}
+        self._slots = asyncio.Semaphore(max_transcoders)
+        # Serializes creating transcoders, so concurrent first chunks of a stream start one process
+        self._create_lock = asyncio.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def acquire(
+        self, stream_id: Hashable, sample_rate: int = DEFAULT_SAMPLE_RATE, header: Optional[bytes] = None
+    ) -> Transcoder:
+        """The stream's transcoder; a new one is seeded with `header` when given."""
+        transcoder = self._transcoders.get(stream_id)
+        if transcoder is not None:
+            return transcoder
+        async with self._create_lock:
+            transcoder = self._transcoders.get(stream_id)
+            if transcoder is not None:
+                return transcoder
+            try:
+                await asyncio.wait_for(self._slots.acquire(), FFMPEG_ACQUIRE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                _stats["rejected"] += 1
+                raise TranscoderError(f"All {self.max_transcoders} FFmpeg transcoders are busy")
+            transcoder = Transcoder(stream_id, sample_rate, header=header)
+            try:
+                await transcoder.start()
+            except BaseException:
+                await transcoder._stop(kill=True)
+                self._slots.release()
+                raise
+            self._transcoders[stream_id] = transcoder
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+        return transcoder
+
+    async def feed(self, stream_id: Hashable, data: bytes, sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+        """Feed a chunk to the stream's transcoder (started on its first chunk) and return the PCM so far."""
+        if starts_stream(data):
+            # The chunk brings its own header, so a transcoder started for it needs no seeding
+            header = None
+            self._headers.setdefault(stream_id, webm_header(data))
+        else:
+            header = self._headers.get(stream_id)
+            if header is None:
+                _stats["failures"] += 1
+                raise MissingHeaderError(f"Stream {stream_id} has no WebM header to decode its chunks with")
+        transcoder = await self.acquire(stream_id, sample_rate, header=header)
+        try:
+            return await transcoder.feed(data)
+        except TranscoderError:
+            _stats["failures"] += 1
+            if self._transcoders.get(stream_id) is transcoder:
+                # The header is kept: the stream's next chunk starts a replacement seeded with it
+                await self.release(stream_id, forget=False)
+            raise
+
+    def read_available(self, stream_id: Hashable) -> bytes:
+        transcoder = self._transcoders.get(stream_id)
+        return transcoder.read_available() if transcoder is not None else b""
+
+    async def release(self, stream_id: Hashable, forget: bool = True) -> bytes:
+        """
+        Close a stream's transcoder; returns the PCM it flushed on exit. With
+        forget=False the stream's header is kept for a replacement transcoder.
+        """
+        if forget:
+            self._headers.pop(stream_id, None)
+        transcoder = self._transcoders.pop(stream_id, None)
+        if transcoder is None:
+            return b""
+        try:
+            return await transcoder.close()
+        finally:
+            self._slots.release()
+
+    async def _health_loop(self):
+        while self._transcoders:
+            await asyncio.sleep(FFMPEG_HEALTH_INTERVAL_SECONDS)
+            now = time.monotonic()
+            for stream_id, transcoder in list(self._transcoders.items()):
+                if now - transcoder.last_used > FFMPEG_IDLE_SECONDS:
+                    logger.info(f"Closing FFmpeg transcoder of idle stream {stream_id}")
+                    _stats["reaped"] += 1
+                    await self.release(stream_id, forget=False)
+                elif not transcoder.alive and not transcoder._lock.locked():
+                    # Restart ahead of the next chunk instead of on its critical path
+                    try:
+                        async with transcoder._lock:
+                            await transcoder._restart("found dead by health check")
+                    except TranscoderError as e:
+                        logger.error(str(e))
+                        _stats["failures"] += 1
+                        await self.release(stream_id, forget=False)
+
+    async def shutdown(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for stream_id in list(self._transcoders):
+            await self.release(stream_id)
+        self._headers.clear()
+
+    def stats(self) -> Dict:
+        return dict(
+            _stats,
+            ffmpeg_path=FFMPEG_PATH,
+            available=ffmpeg_available(),
+            active=len(self._transcoders),
+            max_transcoders=self.max_transcoders,
+        )
+
+
+_stats = {"started": 0, "restarts": 0, "failures": 0, "rejected": 0, "reaped": 0, "bytes_in": 0, "bytes_out": 0}
+_pool: Optional[FFmpegPool] = None
+
+
+def get_pool() -> FFmpegPool:
+    """Return the process-wide pool (created on first use, inside the event loop)."""
+    global _pool
+    if _pool is None:
+        _pool = FFmpegPool()
+    return _pool
+
+
+async def shutdown():
+    if _pool is not None:
+        await _pool.shutdown()
+
+
+def get_stats() -> Dict:
+    return get_pool().stats()
@@ -0,0 +1,278 @@
+"""
+hedging.py - Hedged OpenAI requests to cut tail latency for PACER AI Service.
+
+A small fraction of chat completions take far longer than the rest, and those
+stragglers dominate p99 turn latency. When hedging is enabled for an operation,
+a call that has not produced its response (or, for streams, its first token)
+after the operation's observed LLM_HEDGE_PERCENTILE latency gets a duplicate
+request; whichever attempt answers first wins and the other is cancelled.
+
+Chat completions have no side effects, so duplicates are safe. Cost is bounded
+per operation by a token bucket: every call earns `budget` hedge tokens (e.g.
+0.1 -> at most ~10% extra requests) and every hedge spends one. No hedge is
+sent while the model's governor has no spare capacity, since a duplicate would
+only add load to an upstream that is already struggling.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from . import llm_governor
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGING_ENABLED = os.environ.get("LLM_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.environ.get("LLM_HEDGE_MIN_DELAY_MS", "300"))
+LLM_HEDGE_MAX_DELAY_MS = float(os.environ.get("LLM_HEDGE_MAX_DELAY_MS", "15000"))
+LLM_HEDGE_DEFAULT_BUDGET = float(os.environ.get("LLM_HEDGE_DEFAULT_BUDGET", "0"))
+LLM_HEDGE_BURST = float(os.environ.get("LLM_HEDGE_BURST", "2"))
+LLM_HEDGE_SYNC_WORKERS = int(os.environ.get("LLM_HEDGE_SYNC_WORKERS", "16"))
+
+# Until this many latencies have been seen the delay stays at LLM_HEDGE_MAX_DELAY_MS
+MIN_SAMPLES = 20
+LATENCY_SAMPLES = 200
+
+# Share of calls per operation that may be hedged; operations not listed use LLM_HEDGE_DEFAULT_BUDGET
+DEFAULT_HEDGE_BUDGETS = {
+    "generate_client_response": 0.1,
+    "generate_client_response_stream": 0.1,
+    "generate_multi_stakeholder_response": 0.1,
+    "predict_next_speaker": 0.05,
+    "evaluate_player_response": 0.05,
+}
+
+
+def _load_budgets() -> Dict[str, float]:
+    raw = os.environ.get("LLM_HEDGE_BUDGETS", "")
+    if not raw:
+        return dict(DEFAULT_HEDGE_BUDGETS)
+    try:
+        return {**DEFAULT_HEDGE_BUDGETS, **{op: float(budget) for op, budget in json.loads(raw).items()}}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Invalid LLM_HEDGE_BUDGETS value, using the defaults: {e}")
+        return dict(DEFAULT_HEDGE_BUDGETS)
+
+
+HEDGE_BUDGETS = _load_budgets()
+
+# First item of a stream that ended without producing anything
+_END = object()
+
+
+class _OperationState:
+    __slots__ = ("latencies", "tokens", "counters")
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.tokens = 1.0
+        self.counters = {
+            "calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0,
+            "budget_denied": 0, "capacity_denied": 0, "failed": 0,
+        }
+
+
+class Hedger:
+    """Per-operation latency tracking, hedge budgets and the racing of attempts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, _OperationState] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def enabled_for(self, operation: Optional[str]) -> bool:
+        return LLM_HEDGING_ENABLED and bool(operation) and HEDGE_BUDGETS.get(operation, LLM_HEDGE_DEFAULT_BUDGET) > 0
+
+    def _state(self, operation: str) -> _OperationState:
+        state = self._ops.get(operation)
+        if state is None:
+            state = self._ops.setdefault(operation, _OperationState())
+        return state
+
+    def delay(self, operation: str) -> float:
+        """Seconds to wait for the primary before hedging: the configured percentile of recent latencies."""
+        with self._lock:
+            latencies = sorted(self._state(operation).latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return LLM_HEDGE_MAX_DELAY_MS / 1000
+        index = min(len(latencies) - 1, int(len(latencies) * LLM_HEDGE_PERCENTILE / 100))
+        delay_ms = min(LLM_HEDGE_MAX_DELAY_MS, max(LLM_HEDGE_MIN_DELAY_MS, latencies[index] * 1000))
+        return delay_ms / 1000
+
+    def _start_call(self, operation: str):
+        with self._lock:
+            state = self._state(operation)
+            state.counters["calls"] += 1
+            budget = HEDGE_BUDGETS.get(operation, LLM_HEDGE_DEFAULT_BUDGET)
+            state.tokens = min(LLM_HEDGE_BURST, state.tokens + budget)
+
+    def _allow_hedge(self, operation: str, model: str) -> bool:
+        with self._lock:
+            state = self._state(operation)
+            if state.tokens < 1.0:
+                state.counters["budget_denied"] += 1
+                return False
+            if not llm_governor.has_headroom(model):
+                state.counters["capacity_denied"] += 1
+                return False
+            state.tokens -= 1.0
+            state.counters["hedged"] += 1
+        logger.info(f"Hedging slow {operation} call on {model}")
+        return True
+
+    def _finish(self, operation: str, winner: Optional[int], latency: float):
+        with self._lock:
+            state = self._state(operation)
+            if winner is None:
+                state.counters["failed"] += 1
+                return
+            state.latencies.append(latency)
+            state.counters["hedge_wins" if winner else "primary_wins"] += 1
+
+    async def race(self, operation: str, model: str, start: Callable[[int], Awaitable[Any]]) -> Tuple[int, Any]:
+        """
+        Run attempt 0 and, if it is slower than the hedge delay, attempt 1. Returns
+        (index, result) of the first attempt to succeed; the other is cancelled.
+        An attempt that fails while the other is still running does not fail the call.
+        """
+        self._start_call(operation)
+        delay = self.delay(operation)
+        started = [time.monotonic()]
+        tasks = {asyncio.ensure_future(start(0)): 0}
+        hedge_decided = False
+        error: Optional[BaseException] = None
+        try:
+            while tasks:
+                timeout = None if hedge_decided else max(0.0, delay - (time.monotonic() - started[0]))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_decided = True
+                    if self._allow_hedge(operation, model):
+                        started.append(time.monotonic())
+                        tasks[asyncio.ensure_future(start(1))] = 1
+                    continue
+                for task in done:
+                    index = tasks.pop(task)
+                    if task.exception() is None:
+                        self._finish(operation, index, time.monotonic() - started[index])
+                        return index, task.result()
+                    error = task.exception()
+            self._finish(operation, None, 0.0)
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                # Let the losers unwind (and release their governor slots) before returning
+                await asyncio.wait(tasks)
+
+    async def call(self, operation: Optional[str], model: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `fn()`, hedging it with a second `fn()` when it is slow."""
+        if not self.enabled_for(operation):
+            return await fn()
+        _, result = await self.race(operation, model, lambda index: fn())
+        return result
+
+    async def stream(self, operation: Optional[str], model: str, open_stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Iterate `open_stream()`, hedging on time to first item. The losing stream is
+        closed as soon as the winner has produced its first item.
+        """
+        if not self.enabled_for(operation):
+            async for item in open_stream():
+                yield item
+            return
+
+        streams = []
+
+        async def first_item(index: int):
+            iterator = open_stream()
+            streams.append((index, iterator))
+            try:
+                return await iterator.__anext__()
+            except StopAsyncIteration:
+                return _END
+
+        winner = None
+        try:
+            winner, first = await self.race(operation, model, first_item)
+        finally:
+            for index, iterator in streams:
+                if index != winner:
+                    await iterator.aclose()
+
+        if first is _END:
+            return
+        yield first
+        iterator = next(it for index, it in streams if index == winner)
+        async for item in iterator:
+            yield item
+
+    def call_sync(self, operation: Optional[str], model: str, fn: Callable[[], Any]) -> Any:
+        """
+        Thread-based counterpart of call(). A running thread cannot be cancelled, so
+        the losing attempt finishes in the background and its result is dropped.
+        """
+        if not self.enabled_for(operation):
+            return fn()
+        self._start_call(operation)
+        delay = self.delay(operation)
+        executor = self._get_executor()
+        started = {}
+
+        def submit(index: int) -> concurrent.futures.Future:
+            started[index] = time.monotonic()
+            # Each attempt needs its own copy so the governor sees this caller's user and priority
+            return executor.submit(contextvars.copy_context().run, fn)
+
+        futures = {submit(0): 0}
+        hedge_decided = False
+        error: Optional[BaseException] = None
+        while futures:
+            timeout = None if hedge_decided else max(0.0, delay - (time.monotonic() - started[0]))
+            done, _ = concurrent.futures.wait(futures, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                hedge_decided = True
+                if self._allow_hedge(operation, model):
+                    futures[submit(1)] = 1
+                continue
+            for future in done:
+                index = futures.pop(future)
+                if future.exception() is None:
+                    self._finish(operation, index, time.monotonic() - started[index])
+                    for loser in futures:
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+        self._finish(operation, None, 0.0)
+        raise error
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=LLM_HEDGE_SYNC_WORKERS, thread_name_prefix="llm-hedge"
+                    )
+        return self._executor
+
+    def stats(self) -> Dict:
+        with self._lock:
+            operations = {op: dict(state.counters) for op, state in self._ops.items()}
+        for op, counts in operations.items():
+            counts["budget"] = HEDGE_BUDGETS.get(op, LLM_HEDGE_DEFAULT_BUDGET)
+            counts["delay_ms"] = int(self.delay(op) * 1000)
+            counts["hedge_rate"] = round(counts["hedged"] / counts["calls"], 4) if counts["calls"] else 0.0
+            counts["hedge_win_rate"] = round(counts["hedge_wins"] / counts["hedged"], 4) if counts["hedged"] else 0.0
+        return {"enabled": LLM_HEDGING_ENABLED, "percentile": LLM_HEDGE_PERCENTILE, "operations": operations}
+
+
+hedger = Hedger()
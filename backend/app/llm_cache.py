@@ -0,0 +1,233 @@
+"""
+llm_cache.py - Content-addressed cache for OpenAI chat completions.
+
+Responses are keyed by a SHA-256 hash of the model, messages and temperature.
+There is an in-memory LRU tier and an optional SQLite tier that survives
+restarts. Caching is opt-in per operation (the AIService method name): an
+operation is only cached when it has a TTL greater than zero.
+
+Environment:
+    LLM_CACHE_ENABLED       "true"/"false" (default true)
+    LLM_CACHE_MAX_ENTRIES   size of the in-memory LRU (default 1000)
+    LLM_CACHE_SQLITE_PATH   path of the persistent tier; unset disables it
+    LLM_CACHE_TTLS          JSON object of operation -> TTL seconds, merged
+                            over DEFAULT_TTLS (0 disables an operation)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_SQLITE_PATH = os.environ.get("LLM_CACHE_SQLITE_PATH", "")
+
+# Operations whose output depends only on their prompt are cached by default.
+# Roleplay replies are left out so conversations do not become repetitive;
+# enable them through LLM_CACHE_TTLS for scripted or mock-heavy programs.
+DEFAULT_TTLS = {
+    "analyze_competitor": 24 * 3600,
+    "evaluate_player_response": 3600,
+    "evaluate_player_event_response": 3600,
+    "generate_meeting_summary": 600,
+}
+
+
+def _load_ttls() -> Dict[str, float]:
+    ttls = dict(DEFAULT_TTLS)
+    raw = os.environ.get("LLM_CACHE_TTLS", "")
+    if raw:
+        try:
+            ttls.update({k: float(v) for k, v in json.loads(raw).items()})
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid LLM_CACHE_TTLS value, using defaults: {e}")
+    return ttls
+
+
+def make_cache_key(model: str, messages: List[Dict], temperature: float, max_tokens: Optional[int] = None,
+                   response_format: Optional[Dict] = None) -> str:
+    """Return the content-addressed key for a chat completion request."""
+    request = {"model": model, "messages": messages, "temperature": temperature}
+    # Only keyed when set, so keys of uncapped, free-text requests stay stable
+    if max_tokens:
+        request["max_tokens"] = max_tokens
+    if response_format:
+        request["response_format"] = response_format
+    payload = json.dumps(
+        request,
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + optional SQLite) cache of chat completion responses."""
+
+    def __init__(self, max_entries: int = 1000, sqlite_path: str = "", ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else {}
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._db = None
+        if sqlite_path:
+            self._open_sqlite(sqlite_path)
+
+    def _open_sqlite(self, path: str):
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, operation TEXT, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires ON llm_cache (expires_at)")
+            self._db.commit()
+            logger.info(f"LLM cache persistent tier at {path}")
+        except sqlite3.Error as e:
+            logger.error(f"Could not open LLM cache database {path}, using memory only: {e}")
+            self._db = None
+
+    def ttl_for(self, operation: Optional[str]) -> float:
+        if not operation:
+            return 0
+        return self.ttls.get(operation, 0)
+
+    def is_cacheable(self, operation: Optional[str]) -> bool:
+        return self.ttl_for(operation) > 0
+
+    def _count(self, operation: str, field: str):
+        op_stats = self._stats.setdefault(
+            operation, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        )
+        op_stats[field] += 1
+
+    def get(self, key: str, operation: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._count(operation, "memory_hits")
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"LLM cache read failed: {e}")
+                    row = None
+                if row is not None:
+                    value_json, expires_at = row
+                    if expires_at > now:
+                        value = json.loads(value_json)
+                        self._put_memory(key, value, expires_at)
+                        self._count(operation, "disk_hits")
+                        return value
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._count(operation, "misses")
+            return None
+
+    def _put_memory(self, key: str, value: Dict, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def set(self, key: str, operation: str, value: Dict):
+        ttl = self.ttl_for(operation)
+        if ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+            self._count(operation, "stores")
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, operation, value, created_at, expires_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, operation, json.dumps(value, default=str), now, expires_at),
+                    )
+                    self._db.commit()
+                except (sqlite3.Error, TypeError) as e:
+                    logger.error(f"LLM cache write failed: {e}")
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers. Returns the number of rows removed from SQLite."""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (exp, _) in self._memory.items() if exp <= now]:
+                del self._memory[key]
+            if self._db is None:
+                return 0
+            cursor = self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            operations = {op: dict(counts) for op, counts in self._stats.items()}
+            totals = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+            for counts in operations.values():
+                for field in totals:
+                    totals[field] += counts[field]
+            lookups = totals["memory_hits"] + totals["disk_hits"] + totals["misses"]
+            hits = totals["memory_hits"] + totals["disk_hits"]
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+                "ttls": dict(self.ttls),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "totals": totals,
+                "operations": operations,
+            }
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """Return the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache(
+                    max_entries=LLM_CACHE_MAX_ENTRIES,
+                    sqlite_path=LLM_CACHE_SQLITE_PATH,
+                    ttls=_load_ttls(),
+                )
+    return _cache
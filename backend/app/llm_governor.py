@@ -0,0 +1,607 @@
+"""
+llm_governor.py - Adaptive concurrency limiter and circuit breaker for OpenAI calls.
+
+Every upstream LLM call takes a slot from the governor for its model. The number
+of slots adapts to observed latency AIMD-style: it grows by ~1 per round-trip
+while calls finish under the target latency and is cut multiplicatively when
+they are slow or upstream reports overload (429, 5xx, timeouts). Calls beyond
+the limit wait in a bounded queue instead of piling onto a struggling upstream.
+
+A per-model circuit breaker opens after repeated overload failures; while it is
+open calls fail fast with LLMUnavailableError (AIService degrades to its mock
+templates where it has them). After LLM_BREAKER_RESET_SECONDS a single probe
+call is let through to decide whether to close it again.
+
+Queued calls are scheduled by priority class: live conversation first
+("interactive"), then scoring ("evaluation"), then summaries and analytics
+("background"). Each class may only hold its share of the limit, so a burst of
+background scoring always leaves headroom for live replies. Within a class,
+users are served round-robin so one busy user cannot monopolise it, and a
+waiter's class is promoted by one step per LLM_PRIORITY_AGING_SECONDS waited so
+lower classes are never starved. The class comes from an explicit argument, the
+llm_priority context (see priority()), or the operation name, in that order.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+LLM_GOVERNOR_ENABLED = os.environ.get("LLM_GOVERNOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_GOVERNOR_INITIAL_LIMIT = float(os.environ.get("LLM_GOVERNOR_INITIAL_LIMIT", "16"))
+LLM_GOVERNOR_MIN_LIMIT = float(os.environ.get("LLM_GOVERNOR_MIN_LIMIT", "2"))
+LLM_GOVERNOR_MAX_LIMIT = float(os.environ.get("LLM_GOVERNOR_MAX_LIMIT", "64"))
+LLM_GOVERNOR_TARGET_LATENCY_MS = float(os.environ.get("LLM_GOVERNOR_TARGET_LATENCY_MS", "8000"))
+LLM_GOVERNOR_DECREASE_FACTOR = float(os.environ.get("LLM_GOVERNOR_DECREASE_FACTOR", "0.7"))
+LLM_GOVERNOR_MAX_QUEUE = int(os.environ.get("LLM_GOVERNOR_MAX_QUEUE", "200"))
+LLM_GOVERNOR_QUEUE_TIMEOUT = float(os.environ.get("LLM_GOVERNOR_QUEUE_TIMEOUT", "20"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_PRIORITY_AGING_SECONDS = float(os.environ.get("LLM_PRIORITY_AGING_SECONDS", "10"))
+
+# Don't cut the limit again until the previous cut has had time to take effect
+DECREASE_COOLDOWN_SECONDS = 1.0
+WAIT_SAMPLES = 500
+
+
+def _load_target_latencies() -> Dict[str, float]:
+    raw = os.environ.get("LLM_GOVERNOR_TARGET_LATENCIES", "")
+    if not raw:
+        return {}
+    try:
+        return {model: float(ms) for model, ms in json.loads(raw).items()}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Invalid LLM_GOVERNOR_TARGET_LATENCIES value, using the default: {e}")
+        return {}
+
+
+TARGET_LATENCIES_MS = _load_target_latencies()
+
+# Priority classes, most urgent first
+PRIORITY_CLASSES = ("interactive", "evaluation", "background")
+PRIORITY_RANKS = {name: rank for rank, name in enumerate(PRIORITY_CLASSES)}
+DEFAULT_PRIORITY = "interactive"
+
+DEFAULT_OPERATION_PRIORITIES = {
+    "generate_client_response": "interactive",
+    "generate_client_response_stream": "interactive",
+    "generate_multi_stakeholder_response": "interactive",
+    "predict_next_speaker": "interactive",
+    "summarize_conversation": "interactive",  # runs inline before a live reply
+    "evaluate_player_response": "evaluation",
+    "evaluate_player_event_response": "evaluation",
+    "generate_meeting_summary": "background",
+    "analyze_competitor": "background",
+    "handle_unexpected_event": "background",
+}
+
+# Share of the model's concurrency limit each class may occupy (at least one slot)
+DEFAULT_PRIORITY_SHARES = {"interactive": 1.0, "evaluation": 0.75, "background": 0.5}
+
+# Lower classes are expected to wait longer before giving up
+DEFAULT_PRIORITY_QUEUE_TIMEOUTS = {"evaluation": 60.0, "background": 120.0}
+
+
+def _load_priority_setting(env_name: str, defaults: Dict, cast) -> Dict:
+    raw = os.environ.get(env_name, "")
+    if not raw:
+        return dict(defaults)
+    try:
+        overrides = {key: cast(value) for key, value in json.loads(raw).items()}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Invalid {env_name} value, using the defaults: {e}")
+        return dict(defaults)
+    return {**defaults, **overrides}
+
+
+def _priority_name(value: str) -> str:
+    if value not in PRIORITY_RANKS:
+        raise ValueError(f"unknown priority class {value!r}")
+    return value
+
+
+OPERATION_PRIORITIES = _load_priority_setting("LLM_OPERATION_PRIORITIES", DEFAULT_OPERATION_PRIORITIES, _priority_name)
+PRIORITY_SHARES = _load_priority_setting("LLM_PRIORITY_SHARES", DEFAULT_PRIORITY_SHARES, float)
+PRIORITY_QUEUE_TIMEOUTS = _load_priority_setting("LLM_PRIORITY_QUEUE_TIMEOUTS", DEFAULT_PRIORITY_QUEUE_TIMEOUTS, float)
+
+_priority_var: ContextVar[Optional[str]] = ContextVar("llm_priority", default=None)
+_user_var: ContextVar[Optional[str]] = ContextVar("llm_user", default=None)
+
+
+def set_user(user_id):
+    """Attribute LLM calls made from the current request/task to a user for fair queuing."""
+    _user_var.set(str(user_id) if user_id is not None else None)
+
+
+@contextmanager
+def priority(name: str):
+    """Run the enclosed LLM calls in priority class `name`, whatever their operation."""
+    token = _priority_var.set(_priority_name(name))
+    try:
+        yield
+    finally:
+        _priority_var.reset(token)
+
+
+def resolve_priority(operation: Optional[str] = None, explicit: Optional[str] = None) -> str:
+    return explicit or _priority_var.get() or OPERATION_PRIORITIES.get(operation) or DEFAULT_PRIORITY
+
+
+def queue_timeout(priority_name: str) -> float:
+    return PRIORITY_QUEUE_TIMEOUTS.get(priority_name, LLM_GOVERNOR_QUEUE_TIMEOUT)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the governor refuses a call: circuit open, queue full or queue wait timed out."""
+
+
+# Exceptions that mean "upstream is overloaded or unreachable"; anything else
+# (bad request, auth, parsing) says nothing about upstream health
+OVERLOAD_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+)
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    return isinstance(exc, OVERLOAD_ERRORS)
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "event", "granted", "rejected", "enqueued_at", "priority", "user")
+
+    def __init__(self, priority: str, user: str, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+        self.rejected = False
+        self.enqueued_at = time.monotonic()
+        self.priority = priority
+        self.user = user
+
+    def wake(self, rejected: bool = False):
+        if rejected:
+            self.rejected = True
+        else:
+            self.granted = True
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+def _wait_summary(samples) -> Dict[str, int]:
+    waits = sorted(samples)
+    return {
+        "wait_ms_avg": int(sum(waits) / len(waits) * 1000) if waits else 0,
+        "wait_ms_p95": int(waits[int(len(waits) * 0.95) - 1] * 1000) if waits else 0,
+    }
+
+
+class ModelGovernor:
+    """AIMD concurrency limit, priority wait queues and circuit breaker for one model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.target_latency = TARGET_LATENCIES_MS.get(model, LLM_GOVERNOR_TARGET_LATENCY_MS) / 1000
+        self.limit = LLM_GOVERNOR_INITIAL_LIMIT
+        self.in_flight = 0
+        # priority class -> user -> that user's waiters; user order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {name: OrderedDict() for name in PRIORITY_CLASSES}
+        self._queued = 0
+        self._class_in_flight = {name: 0 for name in PRIORITY_CLASSES}
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+
+        # Circuit breaker
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        # Metrics
+        self._wait_times: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._class_wait_times = {name: deque(maxlen=WAIT_SAMPLES) for name in PRIORITY_CLASSES}
+        self._class_counters = {name: {"admitted": 0, "queued": 0, "aged_ahead": 0} for name in PRIORITY_CLASSES}
+        self._latency_ewma: Optional[float] = None
+        self._counters = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+            "rejected_circuit_open": 0, "succeeded": 0, "cancelled": 0, "overload_failures": 0,
+            "other_failures": 0, "limit_increases": 0, "limit_decreases": 0, "circuit_opened": 0,
+        }
+        self._max_queue_depth = 0
+
+    # --- scheduling ---
+
+    def _slots(self) -> int:
+        return max(1, int(self.limit))
+
+    def _class_cap(self, priority_name: str) -> int:
+        return max(1, int(self._slots() * PRIORITY_SHARES.get(priority_name, 1.0)))
+
+    def _class_has_room(self, priority_name: str) -> bool:
+        return self._class_in_flight[priority_name] < self._class_cap(priority_name)
+
+    def _effective_rank(self, priority_name: str, now: float) -> Optional[float]:
+        """Rank of a class's oldest waiter after aging, or None if the class has no waiters. Lock held."""
+        users = self._queues[priority_name]
+        if not users:
+            return None
+        oldest = min(waiters[0].enqueued_at for waiters in users.values())
+        rank = PRIORITY_RANKS[priority_name]
+        if LLM_PRIORITY_AGING_SECONDS > 0:
+            rank -= (now - oldest) / LLM_PRIORITY_AGING_SECONDS
+        return rank
+
+    def _next_class(self, now: float, ahead_of: Optional[int] = None) -> Optional[str]:
+        """
+        Pick the class whose next waiter should get a slot: lowest effective rank
+        among classes that are under their cap. With `ahead_of`, only classes that
+        would go before a new caller of that rank are considered. Lock held.
+        """
+        best, best_rank = None, None
+        for name in PRIORITY_CLASSES:
+            if not self._class_has_room(name):
+                continue
+            rank = self._effective_rank(name, now)
+            if rank is None or (ahead_of is not None and rank > ahead_of):
+                continue
+            if best_rank is None or rank < best_rank:
+                best, best_rank = name, rank
+        return best
+
+    def _pop_next(self, priority_name: str) -> _Waiter:
+        """Take the next waiter of a class, rotating between its users. Lock held."""
+        users = self._queues[priority_name]
+        user, waiters = next(iter(users.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            users.move_to_end(user)
+        else:
+            del users[user]
+        self._queued -= 1
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        users = self._queues[waiter.priority]
+        waiters = users.get(waiter.user)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del users[waiter.user]
+        self._queued -= 1
+
+    # --- admission ---
+
+    def _check_breaker(self, now: float) -> bool:
+        """Return True if this call is the half-open probe. Raises when the circuit is open. Lock held."""
+        if self.state == "open":
+            if now - self._opened_at < LLM_BREAKER_RESET_SECONDS:
+                self._counters["rejected_circuit_open"] += 1
+                raise LLMUnavailableError(f"Circuit open for {self.model}")
+            self.state = "half_open"
+            logger.info(f"LLM circuit for {self.model} half-open, sending a probe")
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self._counters["rejected_circuit_open"] += 1
+                raise LLMUnavailableError(f"Circuit half-open for {self.model}, probe in flight")
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def _admit_now(self, priority_name: str) -> bool:
+        """Take a slot immediately if one is free for this class and nobody queued should go first. Lock held."""
+        if self.in_flight >= self._slots() or not self._class_has_room(priority_name):
+            return False
+        if self._queued and self._next_class(time.monotonic(), ahead_of=PRIORITY_RANKS[priority_name]) is not None:
+            return False
+        self.in_flight += 1
+        self._class_in_flight[priority_name] += 1
+        self._counters["admitted"] += 1
+        self._class_counters[priority_name]["admitted"] += 1
+        self._wait_times.append(0.0)
+        self._class_wait_times[priority_name].append(0.0)
+        return True
+
+    def _enqueue(self, waiter: _Waiter):
+        if self._queued >= LLM_GOVERNOR_MAX_QUEUE:
+            self._counters["rejected_queue_full"] += 1
+            raise LLMUnavailableError(f"LLM queue for {self.model} is full ({LLM_GOVERNOR_MAX_QUEUE})")
+        self._queues[waiter.priority].setdefault(waiter.user, deque()).append(waiter)
+        self._queued += 1
+        self._counters["queued"] += 1
+        self._class_counters[waiter.priority]["queued"] += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queued)
+
+    def _abandon(self, waiter: _Waiter, probe: bool) -> bool:
+        """Handle a waiter that timed out or was cancelled. Returns True if it got a slot after all. Lock held."""
+        if waiter.granted:
+            return True
+        if waiter.rejected:
+            return False
+        self._remove(waiter)
+        if probe:
+            self._probe_in_flight = False
+        return False
+
+    def _granted(self, waiter: _Waiter, probe: bool):
+        if waiter.rejected:
+            if probe:
+                self._probe_in_flight = False
+            self._counters["rejected_circuit_open"] += 1
+            raise LLMUnavailableError(f"Circuit opened for {self.model} while queued")
+        waited = time.monotonic() - waiter.enqueued_at
+        self._counters["admitted"] += 1
+        self._class_counters[waiter.priority]["admitted"] += 1
+        self._wait_times.append(waited)
+        self._class_wait_times[waiter.priority].append(waited)
+
+    def _timeout_error(self, priority_name: str, timeout: float) -> LLMUnavailableError:
+        self._counters["rejected_timeout"] += 1
+        return LLMUnavailableError(f"Timed out waiting {timeout}s for an {priority_name} LLM slot ({self.model})")
+
+    async def acquire(self, priority_name: str = DEFAULT_PRIORITY, user: Optional[str] = None) -> bool:
+        """Wait for a slot. Returns True if the call is a circuit-breaker probe."""
+        timeout = queue_timeout(priority_name)
+        with self._lock:
+            probe = self._check_breaker(time.time())
+            if self._admit_now(priority_name):
+                return probe
+            waiter = _Waiter(priority_name, user or "", asyncio.get_running_loop())
+            try:
+                self._enqueue(waiter)
+            except LLMUnavailableError:
+                self._abandon(waiter, probe)
+                raise
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not self._abandon(waiter, probe) and not waiter.rejected:
+                    raise self._timeout_error(priority_name, timeout)
+        except asyncio.CancelledError:
+            with self._lock:
+                got_slot = self._abandon(waiter, probe)
+            if got_slot:
+                self.release(0.0, None, probe, priority_name, cancelled=True)
+            raise
+        with self._lock:
+            self._granted(waiter, probe)
+        return probe
+
+    def acquire_sync(self, priority_name: str = DEFAULT_PRIORITY, user: Optional[str] = None) -> bool:
+        """Blocking variant of acquire() for thread-based callers."""
+        timeout = queue_timeout(priority_name)
+        with self._lock:
+            probe = self._check_breaker(time.time())
+            if self._admit_now(priority_name):
+                return probe
+            waiter = _Waiter(priority_name, user or "")
+            try:
+                self._enqueue(waiter)
+            except LLMUnavailableError:
+                self._abandon(waiter, probe)
+                raise
+        waiter.event.wait(timeout)
+        with self._lock:
+            if not self._abandon(waiter, probe) and not waiter.rejected:
+                raise self._timeout_error(priority_name, timeout)
+            self._granted(waiter, probe)
+        return probe
+
+    # --- completion ---
+
+    def release(self, latency: float, error: Optional[BaseException], probe: bool = False,
+                priority_name: str = DEFAULT_PRIORITY, cancelled: bool = False):
+        """
+        Return a slot and feed the outcome into the AIMD limit and circuit breaker.
+        A cancelled call (a lost hedge, a client that went away) says nothing about
+        the upstream: it only frees the slot and leaves the limit and breaker alone.
+        """
+        now = time.time()
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._class_in_flight[priority_name] = max(0, self._class_in_flight[priority_name] - 1)
+            if probe:
+                # A cancelled probe leaves the circuit half-open; the next call probes again
+                self._probe_in_flight = False
+
+            overloaded = error is not None and is_overload_error(error)
+            if cancelled:
+                self._counters["cancelled"] += 1
+            elif error is None:
+                self._counters["succeeded"] += 1
+                self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+                self._consecutive_failures = 0
+                if self.state != "closed":
+                    logger.info(f"LLM circuit for {self.model} closed again")
+                    self.state = "closed"
+                if latency > self.target_latency:
+                    self._decrease(now)
+                elif self.in_flight + 1 >= int(self.limit):
+                    # Only grow when the limit is actually being used
+                    self.limit = min(LLM_GOVERNOR_MAX_LIMIT, self.limit + 1.0 / self.limit)
+                    self._counters["limit_increases"] += 1
+            elif overloaded:
+                self._counters["overload_failures"] += 1
+                self._consecutive_failures += 1
+                self._decrease(now)
+                if self.state == "half_open" or self._consecutive_failures >= LLM_BREAKER_FAILURE_THRESHOLD:
+                    if self.state != "open":
+                        self._counters["circuit_opened"] += 1
+                        logger.warning(f"LLM circuit for {self.model} opened after {self._consecutive_failures} failures: {error}")
+                    self.state = "open"
+                    self._opened_at = now
+            else:
+                self._counters["other_failures"] += 1
+
+            self._wake_waiters()
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease < DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(LLM_GOVERNOR_MIN_LIMIT, self.limit * LLM_GOVERNOR_DECREASE_FACTOR)
+        self._counters["limit_decreases"] += 1
+
+    def _wake_waiters(self):
+        if self.state == "open":
+            # Fail the queue fast rather than letting it drain into a dead upstream
+            for name in PRIORITY_CLASSES:
+                while self._queues[name]:
+                    self._pop_next(name).wake(rejected=True)
+            return
+        now = time.monotonic()
+        while self._queued and self.in_flight < self._slots():
+            name = self._next_class(now)
+            if name is None:
+                # Everything queued belongs to classes that are at their share
+                break
+            if any(self._queues[higher] and self._class_has_room(higher) for higher in PRIORITY_CLASSES[:PRIORITY_RANKS[name]]):
+                # Served ahead of a more urgent class because it has waited long enough
+                self._class_counters[name]["aged_ahead"] += 1
+            self.in_flight += 1
+            self._class_in_flight[name] += 1
+            self._pop_next(name).wake()
+
+    def has_headroom(self) -> bool:
+        """True when the circuit is closed, nothing is queued and a slot is free."""
+        with self._lock:
+            return self.state == "closed" and not self._queued and self.in_flight < self._slots()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            classes = {
+                name: {
+                    "cap": self._class_cap(name),
+                    "in_flight": self._class_in_flight[name],
+                    "queue_depth": sum(len(waiters) for waiters in self._queues[name].values()),
+                    "queued_users": len(self._queues[name]),
+                    **self._class_counters[name],
+                    **_wait_summary(self._class_wait_times[name]),
+                }
+                for name in PRIORITY_CLASSES
+            }
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": self._queued,
+                "max_queue_depth": self._max_queue_depth,
+                "target_latency_ms": int(self.target_latency * 1000),
+                "latency_ewma_ms": int(self._latency_ewma * 1000) if self._latency_ewma is not None else None,
+                **_wait_summary(self._wait_times),
+                "circuit": self.state,
+                "priorities": classes,
+                **self._counters,
+            }
+
+
+_governors: Dict[str, ModelGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(model: str) -> ModelGovernor:
+    governor = _governors.get(model)
+    if governor is None:
+        with _governors_lock:
+            governor = _governors.setdefault(model, ModelGovernor(model))
+    return governor
+
+
+def has_headroom(model: str) -> bool:
+    """Whether `model` can take an extra, optional call (e.g. a hedge) without queueing anyone."""
+    if not LLM_GOVERNOR_ENABLED:
+        return True
+    return get_governor(model).has_headroom()
+
+
+class _Slot:
+    """Handle for a governed call. Streams call mark_first_token() so the limiter
+    adapts to time-to-first-token rather than to the length of the reply."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+
+    def mark_first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    def latency(self) -> float:
+        return (self.first_token_at or time.monotonic()) - self.started
+
+
+@asynccontextmanager
+async def slot(model: str, operation: Optional[str] = None, priority_name: Optional[str] = None):
+    """Async context manager holding a governor slot for one upstream call."""
+    if not LLM_GOVERNOR_ENABLED:
+        yield _Slot()
+        return
+    governor = get_governor(model)
+    priority_name = resolve_priority(operation, priority_name)
+    probe = await governor.acquire(priority_name, _user_var.get())
+    handle = _Slot()
+    try:
+        yield handle
+    except Exception as e:
+        governor.release(handle.latency(), e, probe, priority_name)
+        raise
+    except BaseException:
+        # CancelledError, GeneratorExit: the call was abandoned, not answered
+        governor.release(handle.latency(), None, probe, priority_name, cancelled=True)
+        raise
+    governor.release(handle.latency(), None, probe, priority_name)
+
+
+@contextmanager
+def slot_sync(model: str, operation: Optional[str] = None, priority_name: Optional[str] = None):
+    """Blocking counterpart of slot() for thread-based callers."""
+    if not LLM_GOVERNOR_ENABLED:
+        yield _Slot()
+        return
+    governor = get_governor(model)
+    priority_name = resolve_priority(operation, priority_name)
+    probe = governor.acquire_sync(priority_name, _user_var.get())
+    handle = _Slot()
+    try:
+        yield handle
+    except Exception as e:
+        governor.release(handle.latency(), e, probe, priority_name)
+        raise
+    except BaseException:
+        # CancelledError, GeneratorExit: the call was abandoned, not answered
+        governor.release(handle.latency(), None, probe, priority_name, cancelled=True)
+        raise
+    governor.release(handle.latency(), None, probe, priority_name)
+
+
+def get_stats() -> Dict:
+    with _governors_lock:
+        governors = dict(_governors)
+    return {
+        "enabled": LLM_GOVERNOR_ENABLED,
+        "priority_aging_seconds": LLM_PRIORITY_AGING_SECONDS,
+        "priority_shares": dict(PRIORITY_SHARES),
+        "models": {model: governor.stats() for model, governor in governors.items()},
+    }
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import os
@@ -10,12 +11,18 @@ import logging
 import traceback
 import time
 import json
+import asyncio
+from contextlib import asynccontextmanager
 
 from . import models
 from .database import engine, get_db
-from .routers import auth, game, team, progress, content, recording
+from .routers import auth, game, team, progress, content, recording, admin
 from .ai_service import AIService
 from .auth import SECRET_KEY, ALGORITHM
+from . import client_ai, speaker_selection
+from . import evaluation_jobs, evaluation_queue  # evaluation_jobs registers the job handlers
+from . import reevaluation, evaluation_dedup, opening_prewarm, tts_cache, audio_upload, ffmpeg_pool
+from .llm_governor import LLMUnavailableError, LLM_BREAKER_RESET_SECONDS
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,11 +30,29 @@ logger = logging.getLogger(__name__)
 # Create tables
 models.Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: run the embedded evaluation worker, release shared OpenAI connection pools on shutdown."""
+    worker_stop = asyncio.Event()
+    worker_task = None
+    if evaluation_queue.EVALUATION_EMBEDDED_WORKER:
+        # Set EVALUATION_EMBEDDED_WORKER=false when run_evaluation_worker.py processes run the queue
+        worker_task = asyncio.create_task(evaluation_queue.run_worker(stop=worker_stop))
+    yield
+    # Re-evaluation runs pause at a checkpoint and can be resumed after the restart
+    await reevaluation.shutdown()
+    if worker_task is not None:
+        worker_stop.set()
+        await worker_task
+    await ffmpeg_pool.shutdown()
+    await client_ai.close_clients()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="PACER Sales Methodology Game API",
     description="API for the PACER Sales Methodology Game",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Print environment variables for debugging
@@ -54,6 +79,10 @@ origins = [
 env_mode = os.getenv("APP_ENV", "development")
 print(f"Current environment mode: {env_mode}")
 
+# Reject oversized audio uploads while they stream in, before they are buffered.
+# Added before CORS so that CORS (the outer middleware) also covers its 413 responses
+app.add_middleware(audio_upload.UploadSizeLimitMiddleware, max_bytes=audio_upload.STT_MAX_UPLOAD_BYTES)
+
 # Configure CORS middleware
 # <<< REVERTED TEMPORARY CHANGE: Use environment-specific CORS >>>
 if env_mode == "development":
@@ -79,6 +108,16 @@ else:
     )
     print(f"CORS configured for production mode - allowing specified origins: {origins}")
 
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailableError):
+    """The LLM governor refused the call (circuit open or queue full): tell clients to retry later."""
+    logger.warning(f"LLM unavailable for {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "AI service is temporarily overloaded, please retry shortly."},
+        headers={"Retry-After": str(int(LLM_BREAKER_RESET_SECONDS))}
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api", tags=["auth"])
 app.include_router(game.router, prefix="/api/game", tags=["game"])
@@ -86,6 +125,7 @@ app.include_router(team.router, prefix="/api/team", tags=["team"])
 app.include_router(progress.router, prefix="/api/progress", tags=["progress"])
 app.include_router(content.router, prefix="/api", tags=["content"])
 app.include_router(recording.router, prefix="/api", tags=["recordings"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 # Add root-level login endpoint for easier production access
 @app.post("/login")
@@ -390,6 +430,18 @@ def health_check():
     """Health check endpoint for monitoring"""
     return {"status": "ok", "service": "pacer-backend"}
 
+@app.get("/api/ai-metrics")
+def ai_metrics(db: Session = Depends(get_db)):
+    """Counters for the OpenAI client layer (cache hit rates etc.)"""
+    metrics = client_ai.get_metrics()
+    metrics["speaker_selection"] = speaker_selection.get_stats()
+    metrics["evaluation_queue"] = evaluation_queue.queue_stats(db)
+    metrics["near_duplicate_evaluations"] = evaluation_dedup.get_stats()
+    metrics["opening_prewarm"] = opening_prewarm.get_stats()
+    metrics["tts_cache"] = tts_cache.get_stats()
+    metrics["ffmpeg"] = ffmpeg_pool.get_stats()
+    return metrics
+
 # Debug endpoint to verify database connection
 @app.get("/api/db-check")
 def db_check(db: Session = Depends(get_db)):
@@ -0,0 +1,212 @@
+"""
+model_routing.py - Per-operation model routing and latency accounting for PACER AI Service.
+
+Each AIService operation has a route: the model it runs on, its temperature,
+an optional max_tokens cap and a latency SLO. The defaults keep every route on
+OPENAI_CHAT_MODEL; a cheaper or faster model can be given to next-speaker
+picking or evaluations while role-play keeps the richer one.
+
+Routes are overridden with JSON, from LLM_ROUTES_FILE and then LLM_ROUTES:
+    {"predict_next_speaker": {"model": "gpt-4o-mini", "max_tokens": 20},
+     "evaluate_player_response": {"model": "gpt-4o-mini", "latency_slo_ms": 6000}}
+
+Every routed call is accounted per route (latency percentiles, SLO misses,
+cache hits, prompt/completion tokens) and reported under /api/ai-metrics.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_DEFAULT_LATENCY_SLO_MS = float(os.environ.get("LLM_DEFAULT_LATENCY_SLO_MS", "10000"))
+
+DEFAULT_ROUTE_NAME = "default"
+ROUTE_FIELDS = ("model", "temperature", "max_tokens", "latency_slo_ms")
+LATENCY_SAMPLES = 500
+
+# model None means OPENAI_CHAT_MODEL. The stream's SLO is on time to first token.
+DEFAULT_ROUTES = {
+    DEFAULT_ROUTE_NAME: {"model": None, "temperature": 0.7, "max_tokens": None, "latency_slo_ms": LLM_DEFAULT_LATENCY_SLO_MS},
+    "generate_client_response": {"temperature": 0.7, "latency_slo_ms": 4000},
+    "generate_client_response_stream": {"temperature": 0.7, "max_tokens": 300, "latency_slo_ms": 1500},
+    "generate_multi_stakeholder_response": {"temperature": 0.7, "latency_slo_ms": 4000},
+    "generate_sales_agent_response": {"temperature": 0.7, "max_tokens": 150, "latency_slo_ms": 3000},
+    "predict_next_speaker": {"temperature": 0.2, "latency_slo_ms": 1500},
+    "summarize_conversation": {"temperature": 0.2, "latency_slo_ms": 4000},
+    "evaluate_player_response": {"temperature": 0.3, "latency_slo_ms": 8000},
+    "evaluate_player_event_response": {"temperature": 0.3, "latency_slo_ms": 8000},
+    "analyze_competitor": {"temperature": 0.3, "latency_slo_ms": 15000},
+    "generate_meeting_summary": {"temperature": 0.3, "latency_slo_ms": 15000},
+    "handle_unexpected_event": {"temperature": 0.7, "latency_slo_ms": 8000},
+}
+
+
+def _clean_route(name: str, route) -> Dict:
+    if not isinstance(route, dict):
+        raise ValueError(f"route {name!r} must be an object")
+    unknown = set(route) - set(ROUTE_FIELDS)
+    if unknown:
+        raise ValueError(f"route {name!r} has unknown fields {sorted(unknown)}")
+    cleaned = {}
+    if route.get("model") is not None:
+        cleaned["model"] = str(route["model"])
+    if route.get("temperature") is not None:
+        cleaned["temperature"] = float(route["temperature"])
+    if route.get("max_tokens") is not None:
+        cleaned["max_tokens"] = int(route["max_tokens"])
+    if route.get("latency_slo_ms") is not None:
+        cleaned["latency_slo_ms"] = float(route["latency_slo_ms"])
+    return cleaned
+
+
+def _parse_overrides(raw: str, source: str) -> Dict[str, Dict]:
+    try:
+        overrides = json.loads(raw)
+        if not isinstance(overrides, dict):
+            raise ValueError("expected an object of routes")
+    except ValueError as e:
+        logger.error(f"Invalid model routes in {source}, ignoring them: {e}")
+        return {}
+    routes = {}
+    for name, route in overrides.items():
+        try:
+            routes[name] = _clean_route(name, route)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Invalid model route in {source}, ignoring it: {e}")
+    return routes
+
+
+def load_routes() -> Dict[str, Dict]:
+    """Build the routing table: defaults, then LLM_ROUTES_FILE, then LLM_ROUTES."""
+    overrides = []
+    routes_file = os.environ.get("LLM_ROUTES_FILE", "")
+    if routes_file:
+        try:
+            with open(routes_file, encoding="utf-8") as f:
+                overrides.append(_parse_overrides(f.read(), routes_file))
+        except OSError as e:
+            logger.error(f"Could not read LLM_ROUTES_FILE {routes_file}: {e}")
+    raw = os.environ.get("LLM_ROUTES", "")
+    if raw:
+        overrides.append(_parse_overrides(raw, "LLM_ROUTES"))
+
+    base = DEFAULT_ROUTES[DEFAULT_ROUTE_NAME]
+    routes = {name: {**base, **route} for name, route in DEFAULT_ROUTES.items()}
+    for override in overrides:
+        for name, route in override.items():
+            routes[name] = {**routes.get(name, base), **route}
+    # A changed default applies to every route that did not set the field itself
+    default = routes[DEFAULT_ROUTE_NAME]
+    for name, route in routes.items():
+        for field in ROUTE_FIELDS:
+            if route.get(field) is None:
+                route[field] = default[field]
+    return routes
+
+
+ROUTES = load_routes()
+for _name, _route in ROUTES.items():
+    if _route["model"]:
+        logger.info(f"LLM route {_name} -> {_route['model']}")
+
+
+def get_route(operation: Optional[str]) -> Dict:
+    """Route for an operation (a copy); unknown or missing operations use the default route."""
+    return dict(ROUTES.get(operation or DEFAULT_ROUTE_NAME, ROUTES[DEFAULT_ROUTE_NAME]))
+
+
+class _RouteStats:
+    __slots__ = ("latencies", "counters", "models")
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {
+            "calls": 0, "errors": 0, "cache_hits": 0, "slo_misses": 0,
+            "upstream_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        }
+        self.models: Dict[str, int] = {}
+
+
+_stats: Dict[str, _RouteStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _route_stats(name: str) -> _RouteStats:
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats.setdefault(name, _RouteStats())
+    return stats
+
+
+def record_call(operation: Optional[str], model: str, latency: float, error: bool = False, cached: bool = False):
+    """Account one routed call as seen by its caller: latency against the route's SLO."""
+    name = operation or DEFAULT_ROUTE_NAME
+    slo = get_route(operation)["latency_slo_ms"] / 1000
+    with _stats_lock:
+        stats = _route_stats(name)
+        stats.counters["calls"] += 1
+        stats.models[model] = stats.models.get(model, 0) + 1
+        if error:
+            stats.counters["errors"] += 1
+            return
+        if cached:
+            stats.counters["cache_hits"] += 1
+        stats.latencies.append(latency)
+        if latency > slo:
+            stats.counters["slo_misses"] += 1
+    if not error and latency > slo:
+        logger.debug(f"LLM route {name} missed its {int(slo * 1000)}ms SLO: {int(latency * 1000)}ms on {model}")
+
+
+def record_usage(operation: Optional[str], usage: Optional[Dict] = None, completion_text: Optional[str] = None):
+    """
+    Account the tokens of one upstream response. Streams do not report usage, so
+    their completion tokens are estimated from the text (~4 characters per token).
+    """
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens")
+    if completion_tokens is None and completion_text is not None:
+        completion_tokens = len(completion_text) // 4 + 1
+    with _stats_lock:
+        stats = _route_stats(operation or DEFAULT_ROUTE_NAME)
+        stats.counters["upstream_calls"] += 1
+        stats.counters["prompt_tokens"] += prompt_tokens
+        stats.counters["completion_tokens"] += completion_tokens or 0
+
+
+def _percentile(sorted_values, fraction: float) -> int:
+    if not sorted_values:
+        return 0
+    return int(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))] * 1000)
+
+
+def get_stats() -> Dict:
+    with _stats_lock:
+        snapshot = {
+            name: (sorted(stats.latencies), dict(stats.counters), dict(stats.models))
+            for name, stats in _stats.items()
+        }
+    routes = {}
+    for name in list(ROUTES) + [name for name in snapshot if name not in ROUTES]:
+        latencies, counters, models = snapshot.get(name, ([], None, {}))
+        entry = {"route": get_route(name)}
+        if counters is not None:
+            measured = len(latencies)
+            upstream = counters["upstream_calls"]
+            entry.update(counters)
+            entry.update({
+                "models": models,
+                "latency_ms_avg": int(sum(latencies) / measured * 1000) if measured else 0,
+                "latency_ms_p50": _percentile(latencies, 0.5),
+                "latency_ms_p95": _percentile(latencies, 0.95),
+                "slo_miss_rate": round(counters["slo_misses"] / measured, 4) if measured else 0.0,
+                "tokens_per_upstream_call": round((counters["prompt_tokens"] + counters["completion_tokens"]) / upstream, 1) if upstream else 0.0,
+            })
+        routes[name] = entry
+    return {"routes": routes}
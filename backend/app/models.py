@@ -202,6 +202,63 @@ class InteractionEvaluation(Base):
     interaction = relationship("Interaction", back_populates="evaluation")
 
 
+class EvaluationJob(Base):
+    """Durable queue entry for an LLM evaluation (see evaluation_queue.py)."""
+    __tablename__ = "evaluation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, index=True)  # evaluate_player_response, evaluate_player_event_response
+    target_id = Column(Integer, index=True)  # Interaction.id or EventOccurrence.id
+    dedupe_key = Column(String, unique=True, index=True)  # "<job_type>:<target_id>", one job per target
+    payload = Column(JSON)
+    status = Column(String, default="pending", index=True)  # pending, running, completed, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_after = Column(DateTime, default=datetime.utcnow, index=True)  # Not claimed before this (retry backoff)
+    locked_by = Column(String, nullable=True)  # Worker currently holding the job
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+
+class EvaluationSignature(Base):
+    """MinHash signature of an evaluated player input, for near-duplicate reuse (see evaluation_dedup.py)."""
+    __tablename__ = "evaluation_signatures"
+
+    id = Column(Integer, primary_key=True, index=True)
+    interaction_id = Column(Integer, ForeignKey("interactions.id"), unique=True, index=True)
+    scope = Column(String, index=True)  # "<scenario_id>:<pacer_stage>"; only compared within a scope
+    signature = Column(JSON)  # List of LLM_DEDUP_NUM_PERM min-hashes
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ReevaluationRun(Base):
+    """Progress checkpoint of a bulk re-evaluation of stored interactions (see reevaluation.py)."""
+    __tablename__ = "reevaluation_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, default="pending", index=True)  # pending, running, paused, completed, failed
+    since = Column(DateTime, nullable=True)  # Only interactions from this time on
+    batch_size = Column(Integer, default=50)
+    concurrency = Column(Integer, default=2)
+    rate_per_minute = Column(Float, default=60)
+    cursor = Column(Integer, default=0)  # Highest Interaction.id already handled (keyset checkpoint)
+    processed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    failed_interaction_ids = Column(JSON, nullable=True)
+    sessions_rescored = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    locked_by = Column(String, nullable=True)  # Process currently running the batch
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+
 class Score(Base):
     __tablename__ = "scores"
 
@@ -0,0 +1,226 @@
+"""
+opening_prewarm.py - Pre-generated opening replies for PACER AI Service.
+
+The first client turn of a session used to start cold: the persona prompt was
+rendered and OpenAI called only once the player's first message arrived. When
+a session is created, its client system prefix is now rendered right away and
+the client's reply to a generic opening (OPENING_LINE) is generated in the
+background and stored in GameSession.conversation_context.
+
+Most players open with a greeting or an introduction. If the first message is
+one (see fits_opening), the first turn is served from the pre-generated reply,
+waiting for it if it is still being generated in this process. Anything more
+specific, such as a question about the client's business, is answered live.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from typing import Dict, Optional
+
+from . import models
+from . import prompt_assembly
+from .ai_service import AIService
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+OPENING_PREWARM_ENABLED = os.environ.get("OPENING_PREWARM_ENABLED", "true").lower() in ("1", "true", "yes")
+# How long a first turn waits for a pre-generation still in flight before answering live
+OPENING_PREWARM_WAIT_SECONDS = float(os.environ.get("OPENING_PREWARM_WAIT_SECONDS", "8"))
+# Longer first messages carry content of their own and are answered live
+OPENING_PREWARM_MAX_WORDS = int(os.environ.get("OPENING_PREWARM_MAX_WORDS", "25"))
+# How long a finished pre-generation is kept in memory (it also stays in the database)
+OPENING_PREWARM_KEEP_SECONDS = float(os.environ.get("OPENING_PREWARM_KEEP_SECONDS", "600"))
+
+OPENING_LINE = "Hello, thanks for taking the time to meet with me today."
+OPENING_CONTEXT_KEY = "opening_reply"
+
+DEFAULT_CLIENT_PERSONA = {
+    "name": "Alex Johnson",
+    "role": "Procurement Manager",
+    "company": "TechCorp",
+    "personality_traits": "Professional, analytical, detail-oriented",
+    "pain_points": "Legacy payment systems, high transaction costs, security concerns",
+    "decision_criteria": "Security, cost-effectiveness, integration capabilities",
+}
+
+_GREETING_RE = re.compile(
+    r"\b(hi|hello|hey|greetings|good (morning|afternoon|evening)|nice to meet|pleasure to meet|"
+    r"thanks? (you )?for (taking|making|having|meeting|your time|the time)|my name is|i'm \w+ (from|with|at))\b"
+)
+_SMALL_TALK_RE = re.compile(r"\bhow (are|is|have) (you|things|your (day|week))\b|\bhow's (it going|your (day|week))\b")
+# Business content deserves a reply that addresses it
+_BUSINESS_RE = re.compile(
+    r"\b(pric\w*|cost\w*|fees?|budget|payments?|integrat\w*|security|solutions?|products?|proposal|demo|"
+    r"contract|problems?|challenges?|pain|competitor\w*|roi|implement\w*|platform)\b"
+)
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Pre-generations started in this process: session id -> task returning the reply
+_tasks: Dict[int, asyncio.Task] = {}
+_stats = {"started": 0, "generated": 0, "failed": 0, "served": 0, "waited": 0, "not_fitting": 0, "unavailable": 0}
+
+
+def client_persona_for(db, scenario_id: int) -> Dict:
+    """The client persona dict of a scenario, as the interaction routes build it."""
+    persona = db.query(models.ClientPersona).filter(models.ClientPersona.scenario_id == scenario_id).first()
+    if persona is None:
+        return dict(DEFAULT_CLIENT_PERSONA)
+    return {
+        "name": persona.name,
+        "role": persona.role,
+        "company": persona.company,
+        "personality_traits": persona.personality_traits,
+        "pain_points": persona.pain_points,
+        "decision_criteria": persona.decision_criteria,
+    }
+
+
+def fits_opening(player_input: str) -> bool:
+    """Whether a first message is a plain greeting or introduction that the generic reply answers."""
+    text = (player_input or "").strip().lower()
+    words = text.split()
+    if not words or len(words) > OPENING_PREWARM_MAX_WORDS:
+        return False
+    if not _GREETING_RE.search(text) or _BUSINESS_RE.search(text):
+        return False
+    # Any question other than small talk needs a live answer
+    questions = [sentence for sentence in _SENTENCE_SPLIT_RE.split(text) if sentence.rstrip().endswith("?")]
+    return all(_SMALL_TALK_RE.search(question) for question in questions)
+
+
+def prepare_session(db, game_session: models.GameSession, scenario: models.Scenario) -> Optional[Dict]:
+    """
+    Render and store the session's client system prefix, so the first turn does
+    not build it, and return the arguments for prewarm_opening (None when disabled).
+    Commits the session.
+    """
+    client_persona = client_persona_for(db, scenario.id)
+    scenario_info = {
+        "title": scenario.title,
+        "description": scenario.description,
+        "pacer_stage": scenario.pacer_stage,
+        "difficulty": scenario.difficulty,
+    }
+    system_prefix = prompt_assembly.get_session_prefix(
+        game_session,
+        "client",
+        lambda: AIService.client_session_prefix(client_persona, scenario_info)
+    )
+    db.commit()
+    if not OPENING_PREWARM_ENABLED:
+        return None
+    return {
+        "session_id": game_session.id,
+        "client_persona": client_persona,
+        "scenario_info": scenario_info,
+        "pacer_stage": game_session.current_stage or "P",
+        "system_prefix": system_prefix,
+    }
+
+
+async def prewarm_opening(session_id: int, client_persona: Dict, scenario_info: Dict, pacer_stage: str, system_prefix: str):
+    """Start generating the session's opening reply in the background (run as a BackgroundTask)."""
+    task = asyncio.create_task(_generate(session_id, client_persona, scenario_info, pacer_stage, system_prefix))
+    _tasks[session_id] = task
+    _stats["started"] += 1
+    task.add_done_callback(
+        lambda _: asyncio.get_running_loop().call_later(OPENING_PREWARM_KEEP_SECONDS, _forget, session_id, task)
+    )
+
+
+def _forget(session_id: int, task: asyncio.Task):
+    if _tasks.get(session_id) is task:
+        del _tasks[session_id]
+
+
+async def _generate(session_id: int, client_persona: Dict, scenario_info: Dict, pacer_stage: str, system_prefix: str) -> Optional[str]:
+    context = {
+        "session_id": session_id,
+        "scenario": scenario_info,
+        "current_stage": pacer_stage,
+        "modality": "text",
+    }
+    try:
+        reply = await AIService.generate_client_response(
+            client_persona=client_persona,
+            pacer_stage=pacer_stage,
+            conversation_history=[],
+            player_input=OPENING_LINE,
+            context=context,
+            system_prefix=system_prefix
+        )
+    except Exception as e:
+        _stats["failed"] += 1
+        logger.warning(f"Could not pre-generate the opening reply for session {session_id}: {e}")
+        return None
+    reply = (reply or "").strip()
+    if not reply:
+        _stats["failed"] += 1
+        return None
+    _stats["generated"] += 1
+    _store(session_id, reply, pacer_stage)
+    return reply
+
+
+def _store(session_id: int, reply: str, pacer_stage: str):
+    """Keep the reply with the session so any worker process can serve it."""
+    db = SessionLocal()
+    try:
+        game_session = db.get(models.GameSession, session_id)
+        if game_session is None:
+            return
+        # Reassign rather than mutate so SQLAlchemy detects the JSON change
+        game_session.conversation_context = {
+            **(game_session.conversation_context or {}),
+            OPENING_CONTEXT_KEY: {"reply": reply, "pacer_stage": pacer_stage},
+        }
+        db.commit()
+    except Exception as e:
+        logger.warning(f"Could not store the opening reply for session {session_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+async def take_opening(game_session: models.GameSession, player_input: str) -> Optional[str]:
+    """
+    The pre-generated reply to serve as the session's first client turn, or None
+    to generate the reply live. Call only for the first player message.
+    """
+    if not OPENING_PREWARM_ENABLED:
+        return None
+    task = _tasks.pop(game_session.id, None)
+    if not fits_opening(player_input):
+        _stats["not_fitting"] += 1
+        return None
+    pacer_stage = game_session.current_stage or "P"
+    reply = None
+    if task is not None:
+        if not task.done():
+            _stats["waited"] += 1
+        try:
+            reply = await asyncio.wait_for(asyncio.shield(task), OPENING_PREWARM_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.info(f"Opening reply for session {game_session.id} not ready in time; answering live")
+    if reply is None:
+        stored = (game_session.conversation_context or {}).get(OPENING_CONTEXT_KEY) or {}
+        if stored.get("pacer_stage") == pacer_stage:
+            reply = stored.get("reply")
+    if not reply:
+        _stats["unavailable"] += 1
+        return None
+    _stats["served"] += 1
+    logger.info(f"Serving the pre-generated opening reply for session {game_session.id}")
+    return reply
+
+
+def is_first_turn(previous_interactions) -> bool:
+    """True when none of the earlier interactions carries a player message (e.g. only a welcome line)."""
+    return not any(interaction.player_input for interaction in previous_interactions)
+
+
+def get_stats() -> Dict:
+    return dict(_stats, enabled=OPENING_PREWARM_ENABLED, in_flight=sum(1 for task in _tasks.values() if not task.done()))
@@ -0,0 +1,205 @@
+"""
+prescoring.py - Instant deterministic pre-score of a player's turn for PACER AI Service.
+
+The LLM evaluation of a turn takes seconds. prescore_turn() returns provisional
+methodology/rapport/progress/outcome scores in microseconds from surface
+features of the turn, so players get feedback right away:
+
+- stage keywords: terms distinctive of the current stage's key concepts and
+  best practices in data/pacer_content.py;
+- the share of questions, against what the stage calls for (discovery stages
+  want more questions than closing ones);
+- mentions of the client persona's pain points and decision criteria;
+- client-focused and courteous wording, concrete next steps, and how the
+  client responded.
+
+The LLM evaluation replaces the provisional scores once it lands, and
+AIService falls back to the pre-score when the LLM is unavailable.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Tuple
+
+from .data.pacer_content import PACER_METHODOLOGY
+from .scoring import calculate_total_score
+
+STAGES = ("P", "A", "C", "E", "R")
+
+# Share of the turn's sentences that should be questions, per stage
+STAGE_QUESTION_TARGETS = {"P": 0.4, "A": 0.6, "C": 0.3, "E": 0.25, "R": 0.4}
+
+# Lowest category score that is reported as a strength
+STRENGTH_THRESHOLD = 60
+
+_WORD_RE = re.compile(r"[a-z][a-z'-]*")
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "ness", "ment", "ed", "es", "s", "ly", "y")
+_STOPWORDS = frozenset("""
+    a about above after again against all also an and any are as at be because been before being
+    both but by can could did do does doing during each few for from further had has have having
+    how if in into is it its just more most my no nor not of off on once only or other our out
+    over own same should so some such than that the their them then there these they this those
+    through to too under until up very was we were what when where which while who whom why will
+    with would you your company
+""".split())
+
+_CLIENT_FOCUS = frozenset(("you", "your", "you're", "yours"))
+_SELF_FOCUS = frozenset(("i", "we", "our", "my", "me", "us", "i'm", "we're", "ours"))
+_COURTESY = frozenset(("thank", "thanks", "appreciate", "understand", "glad", "sorry", "great", "happy", "hear"))
+_NEXT_STEP_RE = re.compile(
+    r"\b(next steps?|schedule|follow[- ]up|meeting|demo|proposal|pilot|timeline|workshop|"
+    r"trial|agree|sign|contract|action plan|introduce|walk you through)\b"
+)
+_POSITIVE_RE = re.compile(
+    r"\b(sounds good|interested|makes sense|great|helpful|good point|let's|yes|agree|excellent|"
+    r"that would|i like|appreciate|exactly)\b"
+)
+_NEGATIVE_RE = re.compile(
+    r"\b(not interested|not sure|concern|concerned|expensive|too much|no time|skeptical|doubt|"
+    r"frustrat|unclear|risky|don't see|waste)\w*"
+)
+
+
+def _stem(word: str) -> str:
+    word = word.strip("'-")
+    if word.endswith("'s"):
+        word = word[:-2]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def _terms(text: str) -> FrozenSet[str]:
+    """Stemmed content words of a text."""
+    return frozenset(
+        _stem(word) for word in _WORD_RE.findall(text.lower())
+        if len(word) > 3 and word not in _STOPWORDS
+    )
+
+
+def _stage_keywords() -> Dict[str, FrozenSet[str]]:
+    stage_terms = {}
+    for stage in STAGES:
+        content = PACER_METHODOLOGY[stage]
+        texts = [content["title"], content["description"], *content["best_practices"]]
+        for concept in content["key_concepts"]:
+            texts += [concept["title"], concept["description"]]
+        stage_terms[stage] = frozenset(term for text in texts for term in _terms(text))
+    # Terms used by most stages (payment, solution, ...) say nothing about the stage itself
+    counts = Counter(term for terms in stage_terms.values() for term in terms)
+    return {stage: frozenset(term for term in terms if counts[term] <= 2) for stage, terms in stage_terms.items()}
+
+
+STAGE_KEYWORDS = _stage_keywords()
+
+
+@lru_cache(maxsize=256)
+def _persona_terms(text: str) -> FrozenSet[str]:
+    return _terms(text)
+
+
+def _clamp(score: float) -> int:
+    return int(round(max(0.0, min(100.0, score))))
+
+
+def prescore_turn(player_input: str, ai_response: str, pacer_stage: str, client_persona: Dict) -> Dict:
+    """
+    Provisional evaluation of a turn, in the shape of AIService.evaluate_player_response
+    plus "provisional": True.
+    """
+    stage = pacer_stage if pacer_stage in STAGE_KEYWORDS else "P"
+    client_persona = client_persona or {}
+    text = (player_input or "").strip()
+    lowered = text.lower()
+    words = _WORD_RE.findall(lowered)
+    terms = _terms(text)
+
+    sentences = [s for s in _SENTENCE_RE.findall(text) if s.strip()]
+    questions = sum(1 for s in sentences if s.rstrip().endswith("?"))
+    question_ratio = questions / len(sentences) if sentences else 0.0
+    target = STAGE_QUESTION_TARGETS[stage]
+    question_fit = 1.0 - min(1.0, abs(question_ratio - target) / max(target, 1.0 - target))
+
+    stage_hits = len(terms & STAGE_KEYWORDS[stage])
+    pain_hits = len(terms & _persona_terms(str(client_persona.get("pain_points") or "")))
+    criteria_hits = len(terms & _persona_terms(str(client_persona.get("decision_criteria") or "")))
+    client_words = sum(1 for word in words if word in _CLIENT_FOCUS)
+    self_words = sum(1 for word in words if word in _SELF_FOCUS)
+    courteous = any(word in _COURTESY for word in words)
+    first_name = str(client_persona.get("name") or "").split(" ")[0].lower()
+    names_client = bool(first_name) and first_name in words
+    next_step = bool(_NEXT_STEP_RE.search(lowered))
+
+    methodology = 35 + min(35, stage_hits * 9) + 30 * question_fit
+    rapport = (
+        40 + min(20, client_words * 5) - min(15, max(0, self_words - client_words) * 3)
+        + (15 if courteous else 0) + (10 if names_client else 0) + (10 if pain_hits else 0)
+    )
+    progress = 35 + min(30, pain_hits * 10) + min(15, criteria_hits * 5) + (20 if next_step else 0)
+    if len(words) < 6:
+        # One-liners rarely build rapport or move the deal
+        rapport -= 15
+        progress -= 15
+    elif len(words) > 180:
+        rapport -= 10
+
+    reaction = (ai_response or "").lower()
+    client_reaction = 50 + 10 * len(_POSITIVE_RE.findall(reaction)) - 10 * len(_NEGATIVE_RE.findall(reaction))
+    outcome = 0.5 * (0.4 * progress + 0.3 * rapport + 0.3 * methodology) + 0.5 * max(0, min(100, client_reaction))
+
+    if not words:
+        methodology = rapport = progress = outcome = 0
+    scores = {
+        "methodology_score": _clamp(methodology),
+        "rapport_score": _clamp(rapport),
+        "progress_score": _clamp(progress),
+        "outcome_score": _clamp(outcome),
+    }
+    strength, improvement = _feedback(scores, stage, client_persona, stage_hits, question_ratio, target, pain_hits, next_step)
+    return {
+        **scores,
+        "total_score": calculate_total_score(scores),
+        "feedback": f"Provisional score. {improvement}",
+        "strength": strength,
+        "improvement": improvement,
+        "provisional": True,
+    }
+
+
+def _feedback(scores: Dict, stage: str, client_persona: Dict, stage_hits: int, question_ratio: float,
+              target: float, pain_hits: int, next_step: bool) -> Tuple[str, str]:
+    """A strength (if any category scores well) and an improvement tip for the weakest category."""
+    content = PACER_METHODOLOGY[stage]
+    ranked = sorted(scores, key=scores.get)
+    weakest, best = ranked[0], ranked[-1]
+
+    strengths = {
+        "methodology_score": f"Your message fits the {content['title']} stage.",
+        "rapport_score": "Your wording keeps the focus on the client.",
+        "progress_score": "You tie the conversation to the client's priorities.",
+        "outcome_score": "The client is responding well.",
+    }
+    if weakest == "methodology_score":
+        if stage_hits == 0:
+            improvement = f"Anchor your message in the {content['title']} stage: {content['best_practices'][0].lower()}."
+        elif question_ratio < target:
+            improvement = "Ask more open-ended questions to draw out the client's needs."
+        else:
+            improvement = "Balance your questions with insight the client can act on."
+    elif weakest == "rapport_score":
+        improvement = "Speak to the client's situation directly and acknowledge their point of view."
+    elif weakest == "progress_score":
+        pain_points = str(client_persona.get("pain_points") or "").split(",")[0].strip()
+        if not pain_hits and pain_points:
+            improvement = f"Connect your message to the client's pain points, such as {pain_points.lower()}."
+        elif not next_step:
+            improvement = "Propose a concrete next step to move the deal forward."
+        else:
+            improvement = "Link your proposal to the client's decision criteria."
+    else:
+        improvement = "Address the client's concerns before moving on."
+    strength = strengths[best] if scores[best] >= STRENGTH_THRESHOLD else ""
+    return strength, improvement
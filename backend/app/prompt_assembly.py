@@ -0,0 +1,69 @@
+"""
+prompt_assembly.py - Builds chat messages with a session-stable system prefix.
+
+Scenario and persona material never changes within a session, so it is rendered
+once into a system-prompt prefix, stored in GameSession.conversation_context and
+reused verbatim on every turn. Keeping that prefix byte-identical lets the
+provider's prompt caching apply. Only per-turn deltas (current stage, who was
+addressed) are appended to the player's message.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional
+
+from .prompts import build_turn_context
+
+logger = logging.getLogger(__name__)
+
+PREFIX_CONTEXT_KEY = "prompt_prefixes"
+
+# Context keys that may change from turn to turn and are worth telling the model about
+TURN_CONTEXT_KEYS = {
+    "current_stage": "Current sales stage",
+    "addressed_to": "Addressed to",
+}
+
+
+def get_session_prefix(game_session, key: str, build: Callable[[], str]) -> str:
+    """
+    Return the stored system prefix `key` for a session, building and storing it on
+    first use. The caller is responsible for committing the session.
+    """
+    context = game_session.conversation_context or {}
+    prefixes = context.get(PREFIX_CONTEXT_KEY) or {}
+    prefix = prefixes.get(key)
+    if prefix is None:
+        prefix = build()
+        # Reassign rather than mutate so SQLAlchemy detects the JSON change
+        game_session.conversation_context = {
+            **context,
+            PREFIX_CONTEXT_KEY: {**prefixes, key: prefix}
+        }
+        logger.info(f"Stored '{key}' prompt prefix for session {game_session.id} ({len(prefix)} chars)")
+    return prefix
+
+
+def turn_details(context: Optional[Dict], pacer_stage: Optional[str] = None) -> Dict[str, str]:
+    """Pick the per-turn deltas out of a route's context dict."""
+    details = {}
+    stage = (context or {}).get("current_stage") or pacer_stage
+    if stage:
+        details[TURN_CONTEXT_KEYS["current_stage"]] = stage
+    addressed_to = (context or {}).get("addressed_to")
+    if addressed_to:
+        details[TURN_CONTEXT_KEYS["addressed_to"]] = addressed_to
+    return details
+
+
+def build_turn_message(player_input: str, context: Optional[Dict] = None, pacer_stage: Optional[str] = None, speaker_label: str = "") -> Dict:
+    """User message for the current turn: the player's words plus the per-turn deltas."""
+    content = f"{speaker_label}{player_input}"
+    details = turn_details(context, pacer_stage)
+    if details:
+        content = f"{content}\n\n{build_turn_context(details)}"
+    return {"role": "user", "content": content}
+
+
+def assemble_messages(system_prefix: str, history: List[Dict], turn_message: Dict) -> List[Dict]:
+    """Stable prefix first, then history (which may open with a summary message), then the current turn."""
+    return [{"role": "system", "content": system_prefix}] + list(history) + [turn_message]
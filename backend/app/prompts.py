@@ -69,11 +69,11 @@ def build_stakeholder_system_prompt(active_stakeholder, stakeholder_list, pacer_
     )
 
 NEXT_SPEAKER_SYSTEM_PROMPT = "You are an AI that determines conversation flow in meetings."
-NEXT_SPEAKER_USER_PROMPT = """
-Based on this response from {current_speaker_name}: 
-"{response}"
+NEXT_SPEAKER_SPECULATIVE_PROMPT = """
+The sales rep just said to {current_speaker_name}:
+"{player_input}"
 
-Which of these stakeholders would most naturally speak next?
+{current_speaker_name} will answer first. After that answer, which of these stakeholders would most naturally speak next?
 {stakeholder_list}
 
 Or should the sales rep speak next? If so, respond with "none".
@@ -81,9 +81,113 @@ Or should the sales rep speak next? If so, respond with "none".
 Respond with ONLY the ID number of the next speaker, or "none" for the sales rep.
 """
 
-def build_next_speaker_user_prompt(current_speaker_name, response, stakeholder_list):
-    return NEXT_SPEAKER_USER_PROMPT.format(
+def build_next_speaker_speculative_prompt(current_speaker_name, player_input, stakeholder_list):
+    return NEXT_SPEAKER_SPECULATIVE_PROMPT.format(
         current_speaker_name=current_speaker_name,
-        response=response,
+        player_input=player_input,
         stakeholder_list=stakeholder_list
-    ) 
\ No newline at end of file
+    )
+
+HISTORY_SUMMARY_PREFIX = "Summary of the earlier conversation:"
+CONVERSATION_SUMMARY_SYSTEM_PROMPT = "You maintain running summaries of sales roleplay conversations."
+CONVERSATION_SUMMARY_USER_PROMPT = """
+Update the running summary of a sales conversation with the new turns below.
+
+Current summary:
+{previous_summary}
+
+New turns:
+{new_turns}
+
+Keep every fact that matters for the rest of the conversation: needs and pain points raised,
+objections, commitments, numbers, names and the current mood of the client. Drop small talk.
+Write at most {max_words} words of plain prose. Respond with ONLY the updated summary.
+"""
+
+def build_conversation_summary_prompt(previous_summary, new_turns, max_words):
+    return CONVERSATION_SUMMARY_USER_PROMPT.format(
+        previous_summary=previous_summary or "(none yet)",
+        new_turns=new_turns,
+        max_words=max_words
+    )
+
+# --- Session-stable prompt prefixes ---
+# These contain only material that never changes within a session, so the
+# system message is byte-identical on every turn and provider-side prompt
+# caching applies. Per-turn details (stage, addressee) go in TURN_CONTEXT_TEMPLATE.
+
+SCENARIO_CONTEXT_PROMPT = """
+Scenario: {title}
+{description}
+Difficulty: {difficulty}
+"""
+
+CLIENT_SESSION_PREFIX = """
+You are roleplaying as {name}, a {role} at {company}.
+Your personality traits: {personality_traits}
+Your primary pain points: {pain_points}
+Your decision criteria: {decision_criteria}
+{scenario_context}
+You MUST maintain consistent persona and memory of the entire conversation history.
+Respond naturally as {name} would, keeping consistent with your persona traits and the current sales stage given with each message.
+Your response should be conversational and direct, with no additional formatting or metadata.
+
+CRITICAL INSTRUCTION: You MUST respond in English ONLY. Do not use any other language, regardless of the user's language.
+"""
+
+STAKEHOLDER_SESSION_PREFIX = """
+You are roleplaying as {name}, a {role}.
+Your personality traits: {personality_traits}
+Your interests: {interests}
+Your concerns: {concerns}
+Your communication style: {communication_style}
+Influence level (1-5): {influence_level}
+Decision maker: {decision_maker}
+
+Other stakeholders in the meeting:
+{stakeholder_list}
+{scenario_context}
+The current sales stage is given with each message.
+First, respond as {name} would to the sales representative.
+Then, on a new line after \"THOUGHTS:\", add your private thoughts about the conversation (not spoken).
+"""
+
+TURN_CONTEXT_TEMPLATE = "[Turn context] {details}"
+
+def build_scenario_context(scenario):
+    if not scenario:
+        return ""
+    return SCENARIO_CONTEXT_PROMPT.format(
+        title=scenario.get('title', 'Unknown'),
+        description=scenario.get('description', ''),
+        difficulty=scenario.get('difficulty', 'Unknown')
+    )
+
+def build_client_session_prefix(client_persona, scenario=None):
+    client_persona = client_persona or {}
+    return CLIENT_SESSION_PREFIX.format(
+        name=client_persona.get('name', 'Unknown'),
+        role=client_persona.get('role', 'Unknown'),
+        company=client_persona.get('company', 'Unknown'),
+        personality_traits=client_persona.get('personality_traits', 'Unknown'),
+        pain_points=client_persona.get('pain_points', 'Unknown'),
+        decision_criteria=client_persona.get('decision_criteria', 'Unknown'),
+        scenario_context=build_scenario_context(scenario)
+    )
+
+def build_stakeholder_session_prefix(active_stakeholder, stakeholder_list, scenario=None):
+    return STAKEHOLDER_SESSION_PREFIX.format(
+        name=active_stakeholder.get('name', 'Unknown'),
+        role=active_stakeholder.get('role', 'Unknown'),
+        personality_traits=active_stakeholder.get('personality_traits', 'Unknown'),
+        interests=active_stakeholder.get('interests', 'Unknown'),
+        concerns=active_stakeholder.get('concerns', 'Unknown'),
+        communication_style=active_stakeholder.get('communication_style', 'Unknown'),
+        influence_level=active_stakeholder.get('influence_level', 3),
+        decision_maker="Yes" if active_stakeholder.get('is_decision_maker', False) else "No",
+        stakeholder_list=stakeholder_list,
+        scenario_context=build_scenario_context(scenario)
+    )
+
+def build_turn_context(details):
+    return TURN_CONTEXT_TEMPLATE.format(details="; ".join(f"{k}: {v}" for k, v in details.items()))
@@ -0,0 +1,531 @@
+"""
+reevaluation.py - Bulk re-evaluation of stored interactions for PACER AI Service.
+
+When the evaluation rubric in AIService.evaluate_player_response changes, the
+stored InteractionEvaluation rows, and the session Scores built from them, go
+stale. A re-evaluation run re-scores every evaluated interaction:
+
+- interactions are read in keyset-paginated chunks (Interaction.id > cursor),
+  so a run never loads the whole table and never skips or repeats a row;
+- each chunk is evaluated with at most `concurrency` LLM calls in flight and at
+  most `rate_per_minute` calls started, in the governor's "background" priority
+  class so live play is always served first;
+- the chunk's evaluations (bulk upserts), the recomputed Scores of its
+  completed sessions and the advanced cursor are committed in one transaction,
+  so a run that is paused or crashes resumes from its last checkpoint.
+
+Runs are started with run_reevaluation.py or the /api/admin/reevaluations
+endpoints. One process holds a run at a time; another can take it over once
+its heartbeat is older than REEVALUATION_STALE_SECONDS.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from . import ai_service, evaluation_jobs, evaluation_queue, llm_governor, models
+from .ai_service import AIService
+from .database import SessionLocal
+from .scoring import SESSION_SCORE_WEIGHTS, session_quality, session_goal_bonus, final_session_score
+
+logger = logging.getLogger(__name__)
+
+REEVALUATION_BATCH_SIZE = int(os.environ.get("REEVALUATION_BATCH_SIZE", "50"))
+REEVALUATION_CONCURRENCY = int(os.environ.get("REEVALUATION_CONCURRENCY", "2"))
+REEVALUATION_RATE_PER_MINUTE = float(os.environ.get("REEVALUATION_RATE_PER_MINUTE", "60"))
+REEVALUATION_MAX_ATTEMPTS = int(os.environ.get("REEVALUATION_MAX_ATTEMPTS", "3"))
+REEVALUATION_STALE_SECONDS = float(os.environ.get("REEVALUATION_STALE_SECONDS", "300"))
+# A running run renews its heartbeat this often, also in the middle of a long chunk
+REEVALUATION_HEARTBEAT_SECONDS = float(
+    os.environ.get("REEVALUATION_HEARTBEAT_SECONDS", str(REEVALUATION_STALE_SECONDS / 3))
+)
+
+RESUMABLE_STATUSES = ("pending", "paused", "failed")
+# Failed interaction ids kept on a run for inspection
+MAX_RECORDED_FAILURES = 1000
+
+# Same fallbacks the game routes use for scenarios without a client persona
+DEFAULT_CLIENT_PERSONA = {
+    "name": "Alex Johnson",
+    "role": "Procurement Manager",
+    "company": "TechCorp",
+    "personality_traits": "Professional, analytical, detail-oriented",
+    "pain_points": "Legacy payment systems, high transaction costs, security concerns",
+    "decision_criteria": "Security, cost-effectiveness, integration capabilities",
+}
+
+# Runs executing in this process: run id -> (task, stop event)
+_local_runs: Dict[int, Tuple[asyncio.Task, asyncio.Event]] = {}
+
+
+class RateLimiter:
+    """Spaces out call starts so that at most `rate_per_minute` begin per minute."""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next_at = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        delay = self._next_at - now
+        self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def create_run(
+    db,
+    since: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    rate_per_minute: Optional[float] = None,
+    created_by: Optional[int] = None
+) -> models.ReevaluationRun:
+    run = models.ReevaluationRun(
+        status="pending",
+        since=since,
+        batch_size=batch_size or REEVALUATION_BATCH_SIZE,
+        concurrency=concurrency or REEVALUATION_CONCURRENCY,
+        rate_per_minute=rate_per_minute or REEVALUATION_RATE_PER_MINUTE,
+        cursor=0,
+        processed=0,
+        failed=0,
+        sessions_rescored=0,
+        created_by=created_by,
+    )
+    db.add(run)
+    db.commit()
+    logger.info(f"Created re-evaluation run {run.id} (since={since}, batch_size={run.batch_size}, "
+                f"concurrency={run.concurrency}, rate={run.rate_per_minute}/min)")
+    return run
+
+
+def claim_run(db, run_id: int, worker_id: str) -> bool:
+    """Take a run for this process: a conditional UPDATE, so two processes never run it at once."""
+    if ai_service.MOCK_MODE:
+        # Mock scores would overwrite every real evaluation
+        raise RuntimeError("Re-evaluation needs the OpenAI API; it cannot run in MOCK_MODE")
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=REEVALUATION_STALE_SECONDS)
+    updated = db.query(models.ReevaluationRun).filter(
+        models.ReevaluationRun.id == run_id,
+        or_(
+            models.ReevaluationRun.status.in_(RESUMABLE_STATUSES),
+            and_(models.ReevaluationRun.status == "running", models.ReevaluationRun.heartbeat_at < stale),
+        )
+    ).update({
+        models.ReevaluationRun.status: "running",
+        models.ReevaluationRun.locked_by: worker_id,
+        models.ReevaluationRun.heartbeat_at: now,
+        models.ReevaluationRun.updated_at: now,
+        models.ReevaluationRun.last_error: None,
+    }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def pause_run(db, run_id: int) -> Optional[models.ReevaluationRun]:
+    """Ask a run to stop after its current chunk; it can be resumed from its checkpoint."""
+    run = db.get(models.ReevaluationRun, run_id)
+    if run is None:
+        return None
+    if run.status in ("pending", "running"):
+        run.status = "paused"
+        run.updated_at = datetime.utcnow()
+        db.commit()
+    local = _local_runs.get(run_id)
+    if local is not None:
+        local[1].set()
+    return run
+
+
+def _client_personas(db, session_ids, cache: Dict[int, Dict]) -> Dict[int, Dict]:
+    """Client persona dict per game session, with personas cached per scenario for the whole run."""
+    sessions = db.query(models.GameSession.id, models.GameSession.scenario_id).filter(
+        models.GameSession.id.in_(session_ids)
+    ).all()
+    missing = {scenario_id for _, scenario_id in sessions if scenario_id not in cache}
+    if missing:
+        for persona in db.query(models.ClientPersona).filter(
+            models.ClientPersona.scenario_id.in_(missing)
+        ).order_by(models.ClientPersona.id).all():
+            if persona.scenario_id in cache:
+                continue
+            cache[persona.scenario_id] = {
+                "name": persona.name,
+                "role": persona.role,
+                "company": persona.company,
+                "personality_traits": persona.personality_traits,
+                "pain_points": persona.pain_points,
+                "decision_criteria": persona.decision_criteria,
+            }
+        for scenario_id in missing:
+            cache.setdefault(scenario_id, DEFAULT_CLIENT_PERSONA)
+    return {session_id: cache[scenario_id] for session_id, scenario_id in sessions}
+
+
+def _load_chunk(run: Dict, persona_cache: Dict[int, Dict]) -> List[Dict]:
+    """Next `batch_size` evaluated interactions after the run's cursor, as plain dicts."""
+    db = SessionLocal()
+    try:
+        query = db.query(models.Interaction).filter(
+            models.Interaction.id > run["cursor"],
+            models.Interaction.evaluation.has()
+        )
+        if run["since"] is not None:
+            query = query.filter(models.Interaction.timestamp >= run["since"])
+        interactions = query.order_by(models.Interaction.id).limit(run["batch_size"]).all()
+        if not interactions:
+            return []
+        personas = _client_personas(db, {i.game_session_id for i in interactions}, persona_cache)
+        # Read everything now; no transaction stays open during the LLM calls
+        return [{
+            "id": interaction.id,
+            "game_session_id": interaction.game_session_id,
+            "player_input": interaction.player_input or "",
+            "ai_response": interaction.ai_response or "",
+            "pacer_stage": interaction.pacer_stage or "P",
+            "client_persona": personas.get(interaction.game_session_id, DEFAULT_CLIENT_PERSONA),
+        } for interaction in interactions]
+    finally:
+        db.close()
+
+
+async def _evaluate_interaction(item: Dict, limiter: RateLimiter) -> Dict:
+    for attempt in range(1, REEVALUATION_MAX_ATTEMPTS + 1):
+        await limiter.wait()
+        try:
+            # Never store fallback pre-scores over real evaluations when the LLM is unavailable
+            return await AIService.evaluate_player_response(
+                item["player_input"], item["ai_response"], item["pacer_stage"], item["client_persona"],
+                allow_fallback=False
+            )
+        except Exception as e:
+            if attempt >= REEVALUATION_MAX_ATTEMPTS:
+                raise
+            delay = evaluation_queue.retry_delay(attempt)
+            logger.warning(f"Re-evaluation of interaction {item['id']} failed (attempt {attempt}), retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+
+
+async def _evaluate_chunk(
+    items: List[Dict],
+    concurrency: int,
+    limiter: RateLimiter,
+    stop: asyncio.Event
+) -> Tuple[Dict[int, Dict], Dict[int, str]]:
+    """Evaluate a chunk with bounded parallelism. Items not started before `stop` is set are left out."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: Dict[int, Dict] = {}
+    errors: Dict[int, str] = {}
+
+    async def evaluate(item: Dict):
+        async with semaphore:
+            if stop.is_set():
+                return
+            try:
+                results[item["id"]] = await _evaluate_interaction(item, limiter)
+            except Exception as e:
+                logger.error(f"Re-evaluation of interaction {item['id']} failed: {e}")
+                errors[item["id"]] = str(e)
+
+    with llm_governor.priority("background"):
+        await asyncio.gather(*(evaluate(item) for item in items))
+    return results, errors
+
+
+def save_evaluations(db, evaluations: Dict[int, Dict]):
+    """Bulk upsert of InteractionEvaluation rows (interaction id -> evaluation); not committed."""
+    if not evaluations:
+        return
+    existing: Dict[int, int] = {}
+    for record_id, interaction_id in db.query(
+        models.InteractionEvaluation.id, models.InteractionEvaluation.interaction_id
+    ).filter(
+        models.InteractionEvaluation.interaction_id.in_(list(evaluations))
+    ).order_by(models.InteractionEvaluation.id).all():
+        existing.setdefault(interaction_id, record_id)
+
+    updates, inserts = [], []
+    for interaction_id, evaluation in evaluations.items():
+        columns = evaluation_jobs.evaluation_columns(evaluation)
+        if interaction_id in existing:
+            updates.append({"id": existing[interaction_id], **columns})
+        else:
+            inserts.append({"interaction_id": interaction_id, **columns})
+    db.bulk_update_mappings(models.InteractionEvaluation, updates)
+    db.bulk_insert_mappings(models.InteractionEvaluation, inserts)
+    db.query(models.Interaction).filter(
+        models.Interaction.id.in_(list(evaluations))
+    ).update({models.Interaction.feedback_provided: True}, synchronize_session=False)
+
+
+def rescore_sessions(db, session_ids) -> int:
+    """
+    Recompute the Score of completed sessions from their current evaluations, the
+    way complete_session does. The time bonus and difficulty factor recorded at
+    completion are kept. Not committed; returns the number of Scores updated.
+    """
+    scores = db.query(models.Score).filter(models.Score.game_session_id.in_(list(session_ids))).all()
+    if not scores:
+        return 0
+    scored_ids = [score.game_session_id for score in scores]
+    sessions = {
+        session.id: session
+        for session in db.query(models.GameSession).filter(models.GameSession.id.in_(scored_ids)).all()
+    }
+    # First evaluation of each interaction, in turn order, per session
+    evaluations: Dict[int, Dict[int, Optional[models.InteractionEvaluation]]] = {}
+    for interaction_id, session_id, evaluation in db.query(
+        models.Interaction.id, models.Interaction.game_session_id, models.InteractionEvaluation
+    ).outerjoin(
+        models.InteractionEvaluation, models.InteractionEvaluation.interaction_id == models.Interaction.id
+    ).filter(
+        models.Interaction.game_session_id.in_(scored_ids)
+    ).order_by(models.Interaction.id, models.InteractionEvaluation.id).all():
+        session_evaluations = evaluations.setdefault(session_id, {})
+        if session_evaluations.get(interaction_id) is None:
+            session_evaluations[interaction_id] = evaluation
+
+    weights = SESSION_SCORE_WEIGHTS
+    for score in scores:
+        session = sessions.get(score.game_session_id)
+        session_evaluations = list(evaluations.get(score.game_session_id, {}).values())
+        breakdown = dict(score.detailed_breakdown or {})
+        time_bonus = breakdown.get("time_bonus", 1.0)
+        difficulty_factor = breakdown.get("difficulty_factor") or (session.difficulty_factor if session else None) or 1.0
+        quality = session_quality(session_evaluations)
+        goal_bonus = session_goal_bonus(session_evaluations)
+        final_score = final_session_score(quality, time_bonus, difficulty_factor, goal_bonus)
+
+        score.total_score = final_score
+        score.methodology_score = weights["methodology"] * quality
+        score.rapport_score = weights["rapport"] * quality
+        score.progress_score = weights["progress"] * quality
+        score.outcome_score = weights["outcome"] * quality
+        breakdown.update({
+            "quality": quality,
+            "goal_bonus": goal_bonus,
+            "time_bonus": time_bonus,
+            "difficulty_factor": difficulty_factor,
+            "final_score": final_score,
+        })
+        score.detailed_breakdown = breakdown
+        if session:
+            session.total_score = final_score
+    return len(scores)
+
+
+def _checkpoint(run_id: int, worker_id: str, items: List[Dict], results: Dict[int, Dict], errors: Dict[int, str]) -> Optional[str]:
+    """
+    Commit a chunk's evaluations and rescored sessions together with the advanced
+    cursor. Returns the run's status afterwards, or None (and writes nothing) if
+    another process has taken the run over.
+    """
+    db = SessionLocal()
+    try:
+        save_evaluations(db, results)
+        sessions_rescored = rescore_sessions(db, {item["game_session_id"] for item in items if item["id"] in results})
+        now = datetime.utcnow()
+        values = {
+            models.ReevaluationRun.cursor: items[-1]["id"],
+            models.ReevaluationRun.processed: models.ReevaluationRun.processed + len(results),
+            models.ReevaluationRun.failed: models.ReevaluationRun.failed + len(errors),
+            models.ReevaluationRun.sessions_rescored: models.ReevaluationRun.sessions_rescored + sessions_rescored,
+            models.ReevaluationRun.heartbeat_at: now,
+            models.ReevaluationRun.updated_at: now,
+        }
+        if errors:
+            failed_ids = db.query(models.ReevaluationRun.failed_interaction_ids).filter(
+                models.ReevaluationRun.id == run_id
+            ).scalar() or []
+            values[models.ReevaluationRun.failed_interaction_ids] = (failed_ids + sorted(errors))[:MAX_RECORDED_FAILURES]
+            values[models.ReevaluationRun.last_error] = next(iter(errors.values()))[:2000]
+        updated = db.query(models.ReevaluationRun).filter(
+            models.ReevaluationRun.id == run_id,
+            models.ReevaluationRun.locked_by == worker_id
+        ).update(values, synchronize_session=False)
+        if not updated:
+            db.rollback()
+            return None
+        db.commit()
+        return db.query(models.ReevaluationRun.status).filter(models.ReevaluationRun.id == run_id).scalar()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _heartbeat(run_id: int, worker_id: str) -> bool:
+    """Renew the run's heartbeat; False if another process has taken the run over."""
+    db = SessionLocal()
+    try:
+        updated = db.query(models.ReevaluationRun).filter(
+            models.ReevaluationRun.id == run_id,
+            models.ReevaluationRun.locked_by == worker_id
+        ).update({models.ReevaluationRun.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+    finally:
+        db.close()
+
+
+async def _keep_alive(run_id: int, worker_id: str, stop: asyncio.Event, lost: asyncio.Event):
+    """
+    Renew the heartbeat while the run's chunks are evaluated, so a chunk that runs
+    longer than REEVALUATION_STALE_SECONDS is not taken over. Sets `lost` and
+    `stop` when the run has been taken over anyway.
+    """
+    while True:
+        await asyncio.sleep(REEVALUATION_HEARTBEAT_SECONDS)
+        try:
+            alive = _heartbeat(run_id, worker_id)
+        except Exception as e:
+            # The next renewal (or the checkpoint) tries again
+            logger.warning(f"Could not renew the heartbeat of re-evaluation run {run_id}: {e}")
+            continue
+        if not alive:
+            lost.set()
+            stop.set()
+            return
+
+
+def _release(run_id: int, worker_id: str, status: str, error: Optional[str] = None):
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        values = {
+            models.ReevaluationRun.status: status,
+            models.ReevaluationRun.locked_by: None,
+            models.ReevaluationRun.updated_at: now,
+        }
+        if status == "completed":
+            values[models.ReevaluationRun.completed_at] = now
+        if error:
+            values[models.ReevaluationRun.last_error] = error[:2000]
+        db.query(models.ReevaluationRun).filter(
+            models.ReevaluationRun.id == run_id,
+            models.ReevaluationRun.locked_by == worker_id
+        ).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_reevaluation(run_id: int, worker_id: str, stop: Optional[asyncio.Event] = None) -> str:
+    """
+    Process a run claimed with claim_run() chunk by chunk until it is done, paused
+    (via pause_run or `stop`) or taken over. Returns the run's final status.
+    """
+    stop = stop or asyncio.Event()
+    db = SessionLocal()
+    try:
+        row = db.get(models.ReevaluationRun, run_id)
+        run = {
+            "cursor": row.cursor or 0,
+            "since": row.since,
+            "batch_size": row.batch_size or REEVALUATION_BATCH_SIZE,
+            "concurrency": row.concurrency or REEVALUATION_CONCURRENCY,
+        }
+        limiter = RateLimiter(row.rate_per_minute or REEVALUATION_RATE_PER_MINUTE)
+    finally:
+        db.close()
+
+    # All of the run's calls share one fair-queuing slot in the governor
+    llm_governor.set_user(f"reevaluation:{run_id}")
+    persona_cache: Dict[int, Dict] = {}
+    logger.info(f"Re-evaluation run {run_id} started by {worker_id} from interaction {run['cursor']}")
+    status, error = "paused", None
+    lost = asyncio.Event()
+    keep_alive = asyncio.create_task(_keep_alive(run_id, worker_id, stop, lost))
+    try:
+        while not stop.is_set():
+            items = _load_chunk(run, persona_cache)
+            if not items:
+                status = "completed"
+                break
+            results, errors = await _evaluate_chunk(items, run["concurrency"], limiter, stop)
+            # The cursor only moves past items that were attempted, in id order
+            attempted = []
+            for item in items:
+                if item["id"] not in results and item["id"] not in errors:
+                    break
+                attempted.append(item)
+            if not attempted:
+                break
+            run_status = _checkpoint(run_id, worker_id, attempted, results, errors)
+            if run_status is None:
+                lost.set()
+                break
+            run["cursor"] = attempted[-1]["id"]
+            logger.info(f"Re-evaluation run {run_id}: {len(results)} re-scored, {len(errors)} failed, cursor at {run['cursor']}")
+            if run_status != "running":
+                status = run_status
+                break
+    except Exception as e:
+        logger.error(f"Re-evaluation run {run_id} failed: {e}", exc_info=True)
+        status, error = "failed", str(e)
+    finally:
+        keep_alive.cancel()
+    if lost.is_set():
+        logger.warning(f"Re-evaluation run {run_id} was taken over by another process; stopping")
+        return "running"
+    _release(run_id, worker_id, status, error)
+    logger.info(f"Re-evaluation run {run_id} {status}")
+    return status
+
+
+def start_in_background(db, run_id: int) -> bool:
+    """Claim a run and process it in a task of this process; False if it cannot be claimed."""
+    worker_id = evaluation_queue.new_worker_id()
+    if not claim_run(db, run_id, worker_id):
+        return False
+    stop = asyncio.Event()
+    task = asyncio.create_task(run_reevaluation(run_id, worker_id, stop))
+    _local_runs[run_id] = (task, stop)
+    task.add_done_callback(lambda _: _local_runs.pop(run_id, None))
+    return True
+
+
+async def shutdown():
+    """Pause the runs of this process at their next item and wait for their checkpoints."""
+    runs = list(_local_runs.values())
+    for _, stop in runs:
+        stop.set()
+    if runs:
+        await asyncio.gather(*(task for task, _ in runs), return_exceptions=True)
+
+
+def run_status(db, run: models.ReevaluationRun) -> Dict:
+    query = db.query(models.Interaction.id).filter(
+        models.Interaction.id > (run.cursor or 0),
+        models.Interaction.evaluation.has()
+    )
+    if run.since is not None:
+        query = query.filter(models.Interaction.timestamp >= run.since)
+    return {
+        "id": run.id,
+        "status": run.status,
+        "since": run.since,
+        "batch_size": run.batch_size,
+        "concurrency": run.concurrency,
+        "rate_per_minute": run.rate_per_minute,
+        "cursor": run.cursor,
+        "processed": run.processed,
+        "failed": run.failed,
+        "remaining": query.count() if run.status != "completed" else 0,
+        "sessions_rescored": run.sessions_rescored,
+        "failed_interaction_ids": run.failed_interaction_ids or [],
+        "last_error": run.last_error,
+        "locked_by": run.locked_by,
+        "heartbeat_at": run.heartbeat_at,
+        "created_at": run.created_at,
+        "completed_at": run.completed_at,
+    }
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+
+from .. import models, schemas, auth, reevaluation, ai_service
+from ..database import get_db
+
+router = APIRouter(tags=["admin"])
+
+# Bulk re-evaluation of stored interactions (see reevaluation.py).
+# Runs started here execute as tasks of this API process, hence the async endpoints.
+@router.post("/reevaluations", response_model=schemas.ReevaluationRunStatus)
+async def create_reevaluation(
+    params: schemas.ReevaluationRunCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_manager_user)  # Only managers can re-score history
+):
+    """Start re-evaluating every evaluated interaction and recompute the affected session scores (manager only)."""
+    if ai_service.MOCK_MODE:
+        raise HTTPException(status_code=503, detail="Re-evaluation is not available in mock mode")
+    run = reevaluation.create_run(
+        db,
+        since=params.since,
+        batch_size=params.batch_size,
+        concurrency=params.concurrency,
+        rate_per_minute=params.rate_per_minute,
+        created_by=current_user.id
+    )
+    reevaluation.start_in_background(db, run.id)
+    db.refresh(run)
+    return reevaluation.run_status(db, run)
+
+@router.get("/reevaluations", response_model=List[schemas.ReevaluationRunStatus])
+def list_reevaluations(
+    limit: int = Query(20, gt=0, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_manager_user)
+):
+    """List the most recent re-evaluation runs (manager only)."""
+    runs = db.query(models.ReevaluationRun).order_by(models.ReevaluationRun.id.desc()).limit(limit).all()
+    return [reevaluation.run_status(db, run) for run in runs]
+
+@router.get("/reevaluations/{run_id}", response_model=schemas.ReevaluationRunStatus)
+def get_reevaluation(
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_manager_user)
+):
+    """Get the progress of a re-evaluation run (manager only)."""
+    run = db.get(models.ReevaluationRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Re-evaluation run not found")
+    return reevaluation.run_status(db, run)
+
+@router.post("/reevaluations/{run_id}/pause", response_model=schemas.ReevaluationRunStatus)
+async def pause_reevaluation(
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_manager_user)
+):
+    """Pause a re-evaluation run after its current chunk (manager only)."""
+    run = reevaluation.pause_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Re-evaluation run not found")
+    return reevaluation.run_status(db, run)
+
+@router.post("/reevaluations/{run_id}/resume", response_model=schemas.ReevaluationRunStatus)
+async def resume_reevaluation(
+    run_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_manager_user)
+):
+    """Resume a paused, failed or abandoned re-evaluation run from its checkpoint (manager only)."""
+    run = db.get(models.ReevaluationRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Re-evaluation run not found")
+    if ai_service.MOCK_MODE:
+        raise HTTPException(status_code=503, detail="Re-evaluation is not available in mock mode")
+    if not reevaluation.start_in_background(db, run_id):
+        raise HTTPException(status_code=409, detail=f"Re-evaluation run is {run.status} and cannot be resumed")
+    db.refresh(run)
+    return reevaluation.run_status(db, run)
@@ -38,6 +38,14 @@ from sqlalchemy.orm import Session, joinedload, selectinload
 from .. import models, schemas, auth
 from ..database import get_db, SessionLocal  # Assuming SessionLocal is your session factory
 from ..ai_service import AIService, WebSocketConnectionClosedException # Ensure AIService is imported
+from .. import evaluation_jobs
+from ..scoring import SESSION_SCORE_WEIGHTS, session_quality, session_goal_bonus, final_session_score
+from .. import conversation_history as conversation_history_manager
+from .. import prompt_assembly
+from .. import opening_prewarm
+from .. import voice_pipeline
+from .. import audio_upload
+from ..llm_governor import LLMUnavailableError
 
 # Import necessary modules for WebSocket authentication
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -269,6 +277,7 @@ def add_competitor_info(
 @router.post("/sessions", response_model=schemas.GameSessionResponse)
 def create_game_session(
     session: schemas.GameSessionCreate, 
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
@@ -318,6 +327,11 @@ def create_game_session(
     db.commit()
     db.refresh(db_session)
     
+    # Render the client prompt now and pre-generate the opening reply after responding
+    opening = opening_prewarm.prepare_session(db, db_session, scenario)
+    if opening is not None:
+        background_tasks.add_task(opening_prewarm.prewarm_opening, **opening)
+    
     # Now ensure session is enhanced with additional data
     enhanced_session = enhance_session_with_metadata(db_session)
     
@@ -435,6 +449,7 @@ def delete_session(
 @router.post("/sessions/{session_id}/restart", response_model=schemas.GameSessionResponse)
 def restart_session(
     session_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
@@ -484,6 +499,10 @@ def restart_session(
     db.add(system_interaction)
     db.commit()
     
+    opening = opening_prewarm.prepare_session(db, new_session, original_session.scenario)
+    if opening is not None:
+        background_tasks.add_task(opening_prewarm.prewarm_opening, **opening)
+    
     # Load the enhanced session with scenario data
     enhanced_session = db.query(models.GameSession).options(
         joinedload(models.GameSession.scenario)
@@ -492,7 +511,7 @@ def restart_session(
     return enhance_session_with_metadata(enhanced_session)
 
 @router.post("/sessions/{session_id}/interact", response_model=schemas.AIResponse)
-def player_interaction(
+async def player_interaction(
     session_id: int,
     input_data: schemas.PlayerInput, # Ensure this schema can receive role, modality, generate
     db: Session = Depends(get_db),
@@ -608,29 +627,25 @@ def player_interaction(
         models.Interaction.id != new_interaction.id
     ).order_by(models.Interaction.sequence).all()
     
+    scenario_info = {"title": scenario.title, "description": scenario.description, "pacer_stage": scenario.pacer_stage, "difficulty": scenario.difficulty}
+    
+    # Persona and scenario are rendered once per session so the system prompt stays byte-identical
+    system_prefix = prompt_assembly.get_session_prefix(
+        game_session,
+        "client",
+        lambda: AIService.client_session_prefix(client_persona, scenario_info)
+    )
+    
     conversation_history = []
-    system_persona_message = {
-        "role": "system", 
-        "content": f"""
-You are roleplaying as {client_persona.get('name', 'Unknown')}, a {client_persona.get('role', 'Unknown')} at {client_persona.get('company', 'Unknown')}.
-Your personality traits: {client_persona.get('personality_traits', 'Unknown')}
-Your primary pain points: {client_persona.get('pain_points', 'Unknown')}
-Your decision criteria: {client_persona.get('decision_criteria', 'Unknown')}
-Current sales stage: {game_session.current_stage or "P"}
-You MUST maintain consistent persona and memory of the entire conversation history.
-Respond naturally as {client_persona.get('name', 'the client')} would, keeping consistent with your persona traits.
-"""
-    }
-    conversation_history.append(system_persona_message)
     
-    for interaction_item in previous_interactions:
-        if interaction_item.player_input: # User's turn
-            conversation_history.append({"role": "user", "content": interaction_item.player_input})
-        if interaction_item.ai_response: # Assistant's turn
-            conversation_history.append({"role": "assistant", "content": interaction_item.ai_response})
-            
-    # Add current user input to history for AI context
-    conversation_history.append({"role": "user", "content": input_data.message})
+    # Recent turns verbatim, older turns folded into the rolling summary
+    history_summary, recent_messages = await conversation_history_manager.prepare_history(
+        game_session,
+        conversation_history_manager.client_turns(previous_interactions, client_persona["name"])
+    )
+    if history_summary:
+        conversation_history.append(conversation_history_manager.summary_message(history_summary))
+    conversation_history.extend(recent_messages)
 
     logger.info(f"Building TEXT conversation for AI with {len(conversation_history)} messages.")
 
@@ -639,21 +654,28 @@ Respond naturally as {client_persona.get('name', 'the client')} would, keeping c
         context_for_ai = { # Renamed to avoid conflict with 'context' module
             "session_id": session_id,
             "interaction_id": new_interaction.id, # ID of the current user interaction
-            "scenario": {"title": scenario.title, "description": scenario.description, "pacer_stage": scenario.pacer_stage, "difficulty": scenario.difficulty},
+            "scenario": scenario_info,
             "current_stage": game_session.current_stage or "P",
             "modality": "text" # Explicitly text for this path
         }
         
-        # This call is for generating a NEW text-based response
-        response_obj_from_ai = ai_service.generate_client_response(
-            client_persona=client_persona,
-            pacer_stage=game_session.current_stage or "P",
-            conversation_history=conversation_history, # Includes current user message
-            player_input=input_data.message, # Current user message
-            context=context_for_ai
-        )
+        # A greeting as the first message is answered with the reply pre-generated at session creation
+        ai_text_response = None
+        if opening_prewarm.is_first_turn(previous_interactions):
+            ai_text_response = await opening_prewarm.take_opening(game_session, input_data.message)
         
-        ai_text_response = response_obj_from_ai["response"] if isinstance(response_obj_from_ai, dict) and "response" in response_obj_from_ai else str(response_obj_from_ai)
+        if ai_text_response is None:
+            # This call is for generating a NEW text-based response
+            response_obj_from_ai = await ai_service.generate_client_response(
+                client_persona=client_persona,
+                pacer_stage=game_session.current_stage or "P",
+                conversation_history=conversation_history, # Prior turns only
+                player_input=input_data.message, # Current user message
+                context=context_for_ai,
+                system_prefix=system_prefix
+            )
+            
+            ai_text_response = response_obj_from_ai["response"] if isinstance(response_obj_from_ai, dict) and "response" in response_obj_from_ai else str(response_obj_from_ai)
         
         new_interaction.ai_response = ai_text_response
         # new_interaction.timestamp_ai_response = datetime.utcnow() # Optional
@@ -662,29 +684,40 @@ Respond naturally as {client_persona.get('name', 'the client')} would, keeping c
         logger.info(f"Generated and saved TEXT AI response for interaction {new_interaction.id}: '{ai_text_response[:100]}...'")
 
         evaluation = None
+        evaluation_pending = False
+        provisional_evaluation = None
         if interaction_sequence % 2 == 0 or interaction_sequence > 3: # Evaluate more frequently for text
-            evaluation = ai_service.evaluate_player_response(
+            # Queued durably so the evaluation survives a crash or a dropped request;
+            # wait a bounded time so quick evaluations still come back with the reply
+            evaluation_jobs.schedule_interaction_evaluation(
+                db,
+                interaction_id=new_interaction.id,
                 player_input=input_data.message,
                 ai_response=ai_text_response,
                 pacer_stage=game_session.current_stage or "P",
                 client_persona=client_persona
             )
-            if evaluation:
-                eval_record = models.InteractionEvaluation(
-                    interaction_id=new_interaction.id,
-                    methodology_score=evaluation.get("methodology_score", 0),
-                    rapport_score=evaluation.get("rapport_score", 0),
-                    progress_score=evaluation.get("progress_score", 0),
-                    outcome_score=evaluation.get("outcome_score", 0),
-                    feedback=evaluation.get("feedback", ""),
-                    # ... (other evaluation fields)
-                )
-                db.add(eval_record)
-                new_interaction.feedback_provided = True
-                db.commit()
+            job_status = await evaluation_jobs.wait_for_evaluation(
+                new_interaction.id, evaluation_jobs.EVALUATION_INLINE_WAIT_SECONDS
+            )
+            if job_status and job_status["status"] == "completed":
+                evaluation = job_status["evaluation"]
+            else:
+                evaluation_pending = True
+                provisional_evaluation = job_status["provisional_evaluation"] if job_status else None
         
-        return {"message": ai_text_response, "evaluation": evaluation}
+        return {
+            "message": ai_text_response,
+            "evaluation": evaluation,
+            "interaction_id": new_interaction.id,
+            "evaluation_pending": evaluation_pending,
+            "provisional_evaluation": provisional_evaluation
+        }
 
+    except LLMUnavailableError:
+        # Answered with 503 and Retry-After by the app-level handler
+        db.rollback()
+        raise
     except Exception as e:
         logger.error(f"Error in AI response generation for text: {e}", exc_info=True)
         # Safely try to update the interaction with an error message
@@ -702,11 +735,16 @@ Respond naturally as {client_persona.get('name', 'the client')} would, keeping c
 async def stream_player_interaction(
     session_id: int,
     input_data: schemas.PlayerInput,
+    speak: bool = Query(False, description="Interleave ordered audio segments of the reply, one per sentence"),
+    voice: str = Query("alloy"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """
-    Process player interaction and generate streaming AI response
+    Process player interaction and generate streaming AI response.
+    With speak=true each sentence is synthesized as soon as it is complete and sent
+    as an {"audio_segment": {"index", "text", "format", "audio" (base64)}} line,
+    in order, before the final chunk (see voice_pipeline.py).
     """
     from fastapi.responses import StreamingResponse
     logger.info(f"Streaming player interaction for session {session_id}")
@@ -800,17 +838,41 @@ async def stream_player_interaction(
         models.Interaction.id != new_interaction.id
     ).order_by(models.Interaction.sequence).all()
     
-    conversation_history = []
-    for interaction in previous_interactions:
-        conversation_history.append({
-            "role": "user",
-            "content": interaction.player_input
-        })
-        if interaction.ai_response:
-            conversation_history.append({
-                "role": "assistant",
-                "content": interaction.ai_response
-            })
+    # Recent turns verbatim, older turns folded into the rolling summary
+    history_summary, conversation_history = await conversation_history_manager.prepare_history(
+        game_session,
+        conversation_history_manager.client_turns(previous_interactions, client_persona["name"])
+    )
+    if history_summary:
+        conversation_history.insert(0, conversation_history_manager.summary_message(history_summary))
+    
+    # Persona and scenario are rendered once per session so the system prompt stays byte-identical
+    system_prefix = prompt_assembly.get_session_prefix(
+        game_session,
+        "client",
+        lambda: AIService.client_session_prefix(client_persona, context["scenario"])
+    )
+    db.commit()
+    
+    # A greeting as the first message is answered with the reply pre-generated at session creation
+    opening_reply = None
+    if opening_prewarm.is_first_turn(previous_interactions):
+        opening_reply = await opening_prewarm.take_opening(game_session, input_data.message)
+    
+    async def reply_chunks():
+        if opening_reply is not None:
+            yield opening_reply
+            yield json.dumps({"text": opening_reply, "is_final": True, "prewarmed": True})
+            return
+        async for chunk in ai_service.generate_client_response_stream(
+            client_persona=client_persona,
+            pacer_stage=game_session.current_stage or "P",
+            conversation_history=conversation_history,
+            player_input=input_data.message,
+            context=context,
+            system_prefix=system_prefix
+        ):
+            yield chunk
     
     # Simple response for non-streaming needs
     async def simple_response():
@@ -826,93 +888,77 @@ async def stream_player_interaction(
         
         # Start the stream
         full_response = ""
+        persisted = False
         
-        try:
-            # Stream the response
-            async for response_chunk in ai_service.generate_client_response_stream(
-                client_persona=client_persona,
-                pacer_stage=game_session.current_stage or "P",
-                conversation_history=conversation_history,
-                player_input=input_data.message,
-                context=context
-            ):
-                # 1️⃣ Handle control messages first
-                if isinstance(response_chunk, dict) or (
-                        isinstance(response_chunk, str) and response_chunk.lstrip().startswith('{')
-                ):
-                    # Try to parse as JSON if it's a string
-                    chunk_data = response_chunk if isinstance(response_chunk, dict) else json.loads(response_chunk)
-                    
-                    # If this is the final chunk with evaluation data
-                    if chunk_data.get('is_final') and chunk_data.get('evaluation'):
-                        # Store the evaluation
-                        evaluation = chunk_data['evaluation']
-                        
-                        # CRITICAL FIX: Get a fresh instance of the interaction bound to the new session
-                        # This avoids trying to work with a detached object from another session
-                        interaction_db = db_live.get(models.Interaction, new_interaction.id)
-                        if interaction_db:
-                            # Update the fresh instance with the response text
-                            interaction_db.ai_response = full_response
-                            interaction_db.feedback_provided = True
-                            
-                            # Create evaluation record
-                            try:
-                                eval_record = models.InteractionEvaluation(
-                                    interaction_id=interaction_db.id,
-                                    methodology_score=evaluation.get("methodology_score", 0),
-                                    rapport_score=evaluation.get("rapport_score", 0),
-                                    progress_score=evaluation.get("progress_score", 0),
-                                    outcome_score=evaluation.get("outcome_score", 0),
-                                    feedback=evaluation.get("feedback", ""),
-                                    skills_demonstrated=evaluation.get("skills_demonstrated", {}),
-                                    strength=evaluation.get("strength", ""),
-                                    improvement=evaluation.get("improvement", ""),
-                                    methodology_feedback=evaluation.get("methodology_feedback", ""),
-                                    rapport_feedback=evaluation.get("rapport_feedback", ""),
-                                    progress_feedback=evaluation.get("progress_feedback", ""),
-                                    outcome_feedback=evaluation.get("outcome_feedback", "")
-                                )
-                                
-                                # Add only the evaluation record to the session
-                                db_live.add(eval_record)
-                                
-                                # Improved error handling for commit
-                                try:
-                                    db_live.commit()
-                                    logger.info(f"Saved final AI response to database (length: {len(full_response)}) with evaluation data")
-                                except Exception as commit_err:
-                                    db_live.rollback()
-                                    logger.exception(f"Failed to commit AI response and evaluation: {commit_err}")
-                                    raise
-                            except Exception as eval_err:
-                                logger.error(f"Error creating evaluation record: {str(eval_err)}")
-                        else:
-                            logger.error(f"Failed to retrieve interaction with ID {new_interaction.id} from database")
+        async def persisted_chunks(chunks):
+            """
+            Persist the reply and queue its evaluation as soon as the final chunk is
+            produced. With speak=true that chunk only reaches the client after the
+            last audio segment; storing it here means a client that disconnects
+            during the speech tail still gets its turn saved and evaluated.
+            """
+            nonlocal persisted
+            async for response_chunk in chunks:
+                if isinstance(response_chunk, str) and response_chunk.lstrip().startswith('{'):
+                    chunk_data = json.loads(response_chunk)
+                elif isinstance(response_chunk, dict):
+                    chunk_data = response_chunk
+                else:
+                    yield response_chunk
+                    continue
+                
+                # Final chunk: persist the reply and hand evaluation off to a background job
+                if chunk_data.get('is_final') and 'text' in chunk_data:
+                    final_text = chunk_data.get('text', full_response)
                     
-                    # ADDED: Handle final chunk without evaluation data
-                    elif chunk_data.get('is_final') and 'text' in chunk_data:
-                        # If there's a final chunk with text but no evaluation, still save to database
-                        final_text = chunk_data.get('text', full_response)
+                    # Get a fresh instance of the interaction
+                    interaction_db = db_live.get(models.Interaction, new_interaction.id)
+                    if interaction_db:
+                        interaction_db.ai_response = final_text
                         
-                        # Get a fresh instance of the interaction
-                        interaction_db = db_live.get(models.Interaction, new_interaction.id)
-                        if interaction_db:
-                            interaction_db.ai_response = final_text
-                            
-                            # Improved error handling for commit
-                            try:
-                                db_live.commit()
-                                logger.info(f"Saved final AI response to database (length: {len(final_text)}) from text field")
-                            except Exception as commit_err:
-                                db_live.rollback()
-                                logger.exception(f"Failed to commit AI response: {commit_err}")
-                                raise
-                        else:
-                            logger.error(f"Failed to retrieve interaction with ID {new_interaction.id} from database")
-                    
-                    # Send the chunk as JSON
-                    yield f"{json.dumps(chunk_data)}\n"
+                        # Improved error handling for commit
+                        try:
+                            db_live.commit()
+                            persisted = True
+                            logger.info(f"Saved final AI response to database (length: {len(final_text)}) from text field")
+                        except Exception as commit_err:
+                            db_live.rollback()
+                            logger.exception(f"Failed to commit AI response: {commit_err}")
+                            raise
+
+                        # The stream closes right after this chunk; the evaluation is
+                        # fetched via GET /sessions/{id}/interactions/{id}/evaluation
+                        job = evaluation_jobs.schedule_interaction_evaluation(
+                            db_live,
+                            interaction_id=new_interaction.id,
+                            player_input=input_data.message,
+                            ai_response=final_text,
+                            pacer_stage=game_session.current_stage or "P",
+                            client_persona=client_persona
+                        )
+                        chunk_data['interaction_id'] = new_interaction.id
+                        chunk_data['evaluation_pending'] = True
+                        # Instant local pre-score, replaced by the LLM evaluation when it lands
+                        chunk_data['provisional_evaluation'] = evaluation_jobs.provisional_evaluation(job.payload)
+                    else:
+                        logger.error(f"Failed to retrieve interaction with ID {new_interaction.id} from database")
+                yield chunk_data
+        
+        try:
+            chunks = persisted_chunks(reply_chunks())
+            if speak:
+                # The persona starts speaking after the first sentence, not after the whole reply;
+                # control messages (the final chunk) are re-emitted after the last audio segment
+                chunks = voice_pipeline.speak_stream(
+                    chunks,
+                    lambda sentence: AIService.generate_speech(sentence, voice, client_persona)
+                )
+            
+            # Stream the response
+            async for response_chunk in chunks:
+                # 1️⃣ Control messages (already persisted above) are sent as JSON
+                if isinstance(response_chunk, dict):
+                    yield f"{json.dumps(response_chunk)}\n"
                 
                 # 2️⃣ Handle plain text chunks
                 else:
@@ -921,7 +967,7 @@ async def stream_player_interaction(
             
             # Redundant storage as fallback - will only execute if no final chunk was received
             # This might happen in certain error conditions or if the API changes
-            if not new_interaction.ai_response:
+            if not persisted:
                 logger.info(f"No ai_response set yet - storing via fallback mechanism (length: {len(full_response)})")
                 
                 # Get a fresh instance of the interaction
@@ -972,8 +1018,55 @@ async def stream_player_interaction(
         media_type="text/plain"
     )
 
+@router.get("/sessions/{session_id}/interactions/{interaction_id}/evaluation", response_model=schemas.InteractionEvaluationStatus)
+async def get_interaction_evaluation(
+    session_id: int,
+    interaction_id: int,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for a pending evaluation (long-poll)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Get the evaluation of an interaction. Evaluations run as queued background jobs,
+    so this returns "pending" until the job finishes (including while it waits to retry).
+    """
+    interaction = db.query(models.Interaction).join(models.GameSession).filter(
+        models.Interaction.id == interaction_id,
+        models.Interaction.game_session_id == session_id,
+        models.GameSession.user_id == current_user.id
+    ).first()
+
+    if not interaction:
+        raise HTTPException(status_code=404, detail="Interaction not found")
+
+    def stored_evaluation():
+        eval_record = db.query(models.InteractionEvaluation).filter(
+            models.InteractionEvaluation.interaction_id == interaction_id
+        ).order_by(models.InteractionEvaluation.id.desc()).first()
+        return eval_record
+
+    eval_record = stored_evaluation()
+    if not eval_record:
+        job_status = evaluation_jobs.get_evaluation_status(db, interaction_id)
+        if job_status and job_status["status"] == "pending" and wait > 0:
+            job_status = await evaluation_jobs.wait_for_evaluation(interaction_id, wait)
+        if job_status and job_status["status"] != "completed":
+            return job_status
+        # Read the row the worker committed, not a snapshot from before the wait
+        db.expire_all()
+        eval_record = stored_evaluation()
+
+    if eval_record:
+        return {
+            "interaction_id": interaction_id,
+            "status": "completed",
+            "evaluation": evaluation_jobs.evaluation_to_dict(eval_record)
+        }
+
+    return {"interaction_id": interaction_id, "status": "not_found"}
+
 @router.post("/sessions/{session_id}/multi-interact", response_model=schemas.MultiStakeholderResponse)
-def multi_stakeholder_interaction(
+async def multi_stakeholder_interaction(
     session_id: int,
     input_data: schemas.PlayerInput,
     stakeholder_id: int,
@@ -1035,9 +1128,6 @@ def multi_stakeholder_interaction(
     if not target_stakeholder:
         raise HTTPException(status_code=404, detail="Target stakeholder not found")
     
-    # Get conversation history
-    conversation_history = []
-    
     # Get regular interactions
     interactions = db.query(models.Interaction).filter(
         models.Interaction.game_session_id == session_id
@@ -1048,47 +1138,49 @@ def multi_stakeholder_interaction(
         models.StakeholderResponse.game_session_id == session_id
     ).order_by(models.StakeholderResponse.sequence).all()
     
-    # Combine and sort by sequence
-    for interaction in interactions:
-        conversation_history.append({
-            "speaker_type": "sales_rep",
-            "text": interaction.player_input,
-            "addressed_to": interaction.addressed_to,
-            "sequence": interaction.sequence
-        })
-    
-    for response in stakeholder_responses:
-        # Get stakeholder info
-        stakeholder = next((s for s in stakeholder_list if s["id"] == response.stakeholder_id), None)
-        if stakeholder:
-            conversation_history.append({
-                "speaker_type": "stakeholder",
-                "speaker_id": stakeholder["id"],
-                "speaker_name": stakeholder["name"],
-                "text": response.response_text,
-                "sequence": response.sequence
-            })
-    
-    # Sort by sequence
-    conversation_history.sort(key=lambda x: x["sequence"])
+    # Recent turns verbatim, older turns folded into the rolling summary
+    history_summary, conversation_history = await conversation_history_manager.prepare_history(
+        session,
+        conversation_history_manager.stakeholder_turns(
+            interactions,
+            stakeholder_responses,
+            {s["id"]: s["name"] for s in stakeholder_list}
+        )
+    )
+    if history_summary:
+        conversation_history.insert(0, {"summary": history_summary})
     
     # Determine the current sequence number
     sequence = max([i.sequence for i in interactions] + [0]) + 1
     
-    # Get current conversation context (for AI memory)
-    context = session.conversation_context or {}
+    # Persona and scenario are rendered once per session and stakeholder so the
+    # system prompt stays byte-identical across turns
+    scenario_info = {"title": scenario.title, "description": scenario.description, "pacer_stage": scenario.pacer_stage, "difficulty": scenario.difficulty}
+    system_prefix = prompt_assembly.get_session_prefix(
+        session,
+        f"stakeholder:{stakeholder_id}",
+        lambda: AIService.stakeholder_session_prefix(stakeholder_list, stakeholder_id, scenario_info)
+    )
+    
+    # Per-turn context for the AI; the summary and prefixes are sent separately
+    context = {
+        "current_stage": session.current_stage or scenario.pacer_stage,
+        "addressed_to": target_stakeholder["name"]
+    }
     
     # Generate AI response from the stakeholder
-    response_data = AIService.generate_multi_stakeholder_response(
+    response_data = await AIService.generate_multi_stakeholder_response(
         stakeholders=stakeholder_list,
         active_stakeholder_id=stakeholder_id,
         pacer_stage=session.current_stage or scenario.pacer_stage,
         conversation_history=conversation_history,
         player_input=input_data.message,
-        context=context
+        context=context,
+        system_prefix=system_prefix
     )
     
-    # Store the player's interaction
+    # Store the player's interaction, the stakeholder's response and the updated
+    # context in a single transaction
     interaction = models.Interaction(
         game_session_id=session_id,
         sequence=sequence,
@@ -1098,9 +1190,7 @@ def multi_stakeholder_interaction(
         addressed_to=str(stakeholder_id)
     )
     db.add(interaction)
-    db.commit()
     
-    # Store the stakeholder's response
     stakeholder_response = models.StakeholderResponse(
         game_session_id=session_id,
         stakeholder_id=stakeholder_id,
@@ -1108,13 +1198,7 @@ def multi_stakeholder_interaction(
         response_text=response_data.get("response", "")
     )
     db.add(stakeholder_response)
-    db.commit()
-    
-    # Update conversation context with new information
-    if not session.conversation_context:
-        session.conversation_context = {}
     
-    # Update context
     context_update = {
         "latest_stakeholder_interaction": {
             "stakeholder_id": stakeholder_id,
@@ -1124,9 +1208,15 @@ def multi_stakeholder_interaction(
         }
     }
     
-    # Update the session context
-    session.conversation_context.update(context_update)
-    db.commit()
+    # Reassign rather than mutate so SQLAlchemy detects the JSON change
+    session.conversation_context = {**(session.conversation_context or {}), **context_update}
+    
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store multi-stakeholder turn for session {session_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save interaction")
     
     # Return the stakeholder's response
     return {
@@ -1137,7 +1227,7 @@ def multi_stakeholder_interaction(
     }
 
 @router.post("/sessions/{session_id}/analyze-competitor", response_model=schemas.CompetitorAnalysisResponse)
-def analyze_competitor(
+async def analyze_competitor(
     session_id: int,
     client_needs: List[str],
     db: Session = Depends(get_db),
@@ -1175,7 +1265,7 @@ def analyze_competitor(
     }
     
     # Analyze competitor
-    analysis = AIService.analyze_competitor(
+    analysis = await AIService.analyze_competitor(
         competitor_info=competitor_dict,
         product_type=scenario.product_type,
         client_needs=client_needs
@@ -1184,7 +1274,7 @@ def analyze_competitor(
     return analysis
 
 @router.post("/sessions/{session_id}/meeting-summary", response_model=schemas.MeetingSummaryResponse)
-def generate_meeting_summary(
+async def generate_meeting_summary(
     session_id: int,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
@@ -1261,7 +1351,7 @@ def generate_meeting_summary(
     conversation_history.sort(key=lambda x: x["sequence"])
     
     # Generate meeting summary
-    summary = AIService.generate_meeting_summary(
+    summary = await AIService.generate_meeting_summary(
         conversation_history=conversation_history,
         stakeholders=stakeholder_list,
         scenario_context={
@@ -1301,58 +1391,23 @@ def complete_session(
         models.Interaction.game_session_id == session_id
     ).all()
     
-    # Define score weights
-    weights = {
-        "methodology": 0.40,  # 40%
-        "rapport": 0.25,      # 25%
-        "progress": 0.20,     # 20%
-        "outcome": 0.15       # 15%
-    }
-    
-    # Get all interaction scores
-    interaction_scores = []
+    # Score weights
+    weights = SESSION_SCORE_WEIGHTS
     
-    for interaction in interactions:
-        evaluation = db.query(models.InteractionEvaluation).filter(
+    # Evaluation of each interaction (None for turns that were not evaluated)
+    evaluations = [
+        db.query(models.InteractionEvaluation).filter(
             models.InteractionEvaluation.interaction_id == interaction.id
         ).first()
-        
-        if evaluation:
-            # Calculate weighted score for this interaction
-            score = (
-                weights["methodology"] * evaluation.methodology_score +
-                weights["rapport"] * evaluation.rapport_score +
-                weights["progress"] * evaluation.progress_score +
-                weights["outcome"] * evaluation.outcome_score
-            )
-            interaction_scores.append(score)
+        for interaction in interactions
+    ]
     
-    # Calculate aggregate quality (average of all scores)
-    quality = sum(interaction_scores) / len(interaction_scores) if interaction_scores else 0
+    # Calculate aggregate quality (average of all weighted scores)
+    quality = session_quality(evaluations)
     
     # 2. Goal completion bonus
     # Check the outcome scores of the last few interactions to determine if goal was achieved
-    goal_bonus = 0
-    GOAL_INTERACTIONS_TO_CHECK = 3  # Check last 3 interactions
-    
-    recent_interactions = interactions[-GOAL_INTERACTIONS_TO_CHECK:] if len(interactions) >= GOAL_INTERACTIONS_TO_CHECK else interactions
-    
-    # Average outcome score from recent interactions
-    recent_outcome_scores = []
-    for interaction in recent_interactions:
-        evaluation = db.query(models.InteractionEvaluation).filter(
-            models.InteractionEvaluation.interaction_id == interaction.id
-        ).first()
-        if evaluation:
-            recent_outcome_scores.append(evaluation.outcome_score)
-    
-    avg_outcome_score = sum(recent_outcome_scores) / len(recent_outcome_scores) if recent_outcome_scores else 0
-    
-    # Determine goal bonus based on outcome score
-    if avg_outcome_score >= 80:
-        goal_bonus = 15  # Goal fully achieved
-    elif avg_outcome_score >= 50:
-        goal_bonus = 8   # Goal partially achieved
+    goal_bonus = session_goal_bonus(evaluations)
     
     # 3. Time management bonus - MODIFIED to account for paused time
     # Calculate actual active time excluding pauses
@@ -1391,13 +1446,8 @@ def complete_session(
     # 4. Difficulty multiplier
     difficulty_factor = session.difficulty_factor or 1.0
     
-    # 5. Calculate final score
-    final_score = round(
-        quality * time_bonus * difficulty_factor
-    ) + goal_bonus
-    
-    # Clamp final score between 0 and 100
-    final_score = min(max(final_score, 0), 100)
+    # 5. Calculate final score (clamped between 0 and 100)
+    final_score = final_session_score(quality, time_bonus, difficulty_factor, goal_bonus)
     
     # Update session with final score
     session.total_score = final_score
@@ -1600,7 +1650,7 @@ def get_scenario_events(
     return events
 
 @router.post("/sessions/{session_id}/trigger-event", response_model=schemas.EventOccurrenceResponse)
-def trigger_event(
+async def trigger_event(
     session_id: int,
     event_data: schemas.TriggerEventRequest,
     db: Session = Depends(get_db),
@@ -1692,7 +1742,7 @@ def trigger_event(
     
     # Generate event details using AI
     ai_service = AIService()
-    event_response = ai_service.handle_unexpected_event(
+    event_response = await ai_service.handle_unexpected_event(
         event_type=event.event_type,
         event_data=event.event_data,
         conversation_history=conversation_history,
@@ -1707,7 +1757,7 @@ def trigger_event(
     return event_occurrence
 
 @router.post("/sessions/{session_id}/event-response", response_model=Dict)
-def handle_event_response(
+async def handle_event_response(
     session_id: int,
     event_data: Dict,
     db: Session = Depends(get_db),
@@ -1750,35 +1800,72 @@ def handle_event_response(
         "pacer_stage": game_session.current_stage
     }
     
-    # Evaluate the player's response
-    ai_service = AIService()
-    event_resolution = json.loads(event_occurrence.resolution) if event_occurrence.resolution else {}
-    
-    evaluation = ai_service.evaluate_player_event_response(
+    # Evaluate the player's response as a queued job; the score and the difficulty
+    # adjustment are written by the worker (see evaluation_jobs.apply_event_evaluation)
+    evaluation_jobs.schedule_event_evaluation(
+        db,
+        occurrence_id=event_occurrence.id,
         event_type=event.event_type,
         event_description=event.description,
         player_response=event_occurrence.player_response
     )
+    job_status = await evaluation_jobs.wait_for_event_evaluation(
+        event_occurrence.id, evaluation_jobs.EVALUATION_INLINE_WAIT_SECONDS
+    )
     
-    # Store the evaluation
-    event_occurrence.impact_score = evaluation.get("overall_score", 50) / 100.0  # Convert to 0.0-1.0 scale
-    db.commit()
+    if not job_status or job_status["status"] != "completed":
+        return {
+            "client_response": None,
+            "evaluation": None,
+            "difficulty_adjustment": 0.0,
+            "event_occurrence_id": event_occurrence.id,
+            "evaluation_pending": not job_status or job_status["status"] != "failed"
+        }
     
-    # Update game session difficulty based on event response
-    # Events that are handled well can slightly reduce difficulty, poorly handled events increase it
-    impact_adjustment = (0.5 - evaluation.get("overall_score", 50) / 100.0) * 0.2
-    game_session.difficulty_factor = max(0.5, min(2.0, game_session.difficulty_factor + impact_adjustment))
-    db.commit()
+    result = job_status["result"] or {}
+    evaluation = result.get("evaluation") or {}
     
     # Generate AI response based on event handling
     ai_response = {
         "client_response": f"In response to your handling of the {event.event_type}, the client says: '{evaluation.get('feedback')}'",
         "evaluation": evaluation,
-        "difficulty_adjustment": impact_adjustment
+        "difficulty_adjustment": result.get("difficulty_adjustment", 0.0)
     }
     
     return ai_response
 
+@router.get("/sessions/{session_id}/event-occurrences/{occurrence_id}/evaluation", response_model=Dict)
+async def get_event_response_evaluation(
+    session_id: int,
+    occurrence_id: int,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for a pending evaluation (long-poll)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Get the status of the evaluation of a player's response to an event."""
+    event_occurrence = db.query(models.EventOccurrence).join(models.GameSession).filter(
+        models.EventOccurrence.id == occurrence_id,
+        models.EventOccurrence.game_session_id == session_id,
+        models.GameSession.user_id == current_user.id
+    ).first()
+    
+    if not event_occurrence:
+        raise HTTPException(status_code=404, detail="Event occurrence not found")
+    
+    job_status = await evaluation_jobs.wait_for_event_evaluation(occurrence_id, wait)
+    if not job_status:
+        return {"event_occurrence_id": occurrence_id, "status": "not_found"}
+    
+    result = job_status["result"] or {}
+    return {
+        "event_occurrence_id": occurrence_id,
+        "status": "pending" if job_status["status"] == "running" else job_status["status"],
+        "evaluation": result.get("evaluation"),
+        "difficulty_adjustment": result.get("difficulty_adjustment"),
+        "error": job_status["error"],
+        "attempts": job_status["attempts"]
+    }
+
 # Timed Challenges API Endpoints
 @router.post("/timed-challenges", response_model=schemas.TimedChallengeResponse)
 def create_timed_challenge(
@@ -2127,20 +2214,16 @@ async def speech_to_text(
     if session.is_completed:
         raise HTTPException(status_code=400, detail="Game session is already completed")
     
-    # Save the audio file temporarily
-    temp_audio_path = f"temp_audio_{current_user.id}_{session_id}_{int(time.time())}.wav"
-    with open(temp_audio_path, "wb") as buffer:
-        buffer.write(await audio_file.read())
-    
+    # The upload's size was capped while it streamed in (see audio_upload.py);
+    # its spooled buffer goes to the transcription client without touching the working directory
+    audio_upload.check_duration(audio_file.file)
     try:
         # Process with OpenAI Whisper
-        transcript = await AIService.transcribe_audio(temp_audio_path)
+        transcript = await AIService.transcribe_audio(audio_file.file, filename=audio_file.filename)
         
         return {"text": transcript}
     finally:
-        # Clean up the temporary file
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
+        await audio_file.close()
 
 @router.post("/sessions/{session_id}/text-to-speech")
 async def text_to_speech(
@@ -2150,8 +2233,7 @@ async def text_to_speech(
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Convert AI response text to speech."""
-    from fastapi.responses import StreamingResponse
-    import io
+    from fastapi.responses import StreamingResponse, Response
     
     # Get the game session
     session = db.query(models.GameSession).filter(
@@ -2173,20 +2255,18 @@ async def text_to_speech(
             models.ClientPersona.scenario_id == session.scenario_id
         ).first()
     
-    # Generate speech from text
-    audio_stream = await AIService.generate_speech(
-        text=text, 
-        voice=voice,
-        client_persona=client_persona
-    )
+    headers = {"Content-Disposition": f"attachment; filename=response_{int(time.time())}.mp3"}
     
-    # Return the audio as a streaming response
+    # Replayed lines are served straight from the disk cache (see tts_cache.py)
+    cached_audio = AIService.cached_speech(text, voice, client_persona)
+    if cached_audio is not None:
+        return Response(content=cached_audio, media_type="audio/mp3", headers=headers)
+    
+    # Relay the audio while it is synthesized instead of waiting for the whole MP3
     return StreamingResponse(
-        io.BytesIO(audio_stream), 
+        AIService.stream_speech(text=text, voice=voice, client_persona=client_persona, check_cache=False),
         media_type="audio/mp3",
-        headers={
-            "Content-Disposition": f"attachment; filename=response_{int(time.time())}.mp3"
-        }
+        headers=headers
     )
 
 @router.websocket("/sessions/{session_id}/audio-stream")
@@ -418,6 +418,42 @@ class TextToSpeechInput(BaseModel):
 class AIResponse(BaseModel):
     message: str
     evaluation: Optional[Dict] = None
+    interaction_id: Optional[int] = None  # Poll /interactions/{id}/evaluation with it while evaluation_pending
+    evaluation_pending: bool = False
+    provisional_evaluation: Optional[Dict] = None  # Instant pre-score until the evaluation completes
+
+class InteractionEvaluationStatus(BaseModel):
+    interaction_id: int
+    status: str  # "pending", "completed", "failed" or "not_found"
+    evaluation: Optional[Dict] = None
+    provisional_evaluation: Optional[Dict] = None  # Instant pre-score until the evaluation completes
+    error: Optional[str] = None
+    attempts: Optional[int] = None
+
+class ReevaluationRunCreate(BaseModel):
+    since: Optional[datetime] = None  # Only re-score interactions from this time on
+    batch_size: Optional[int] = Field(None, gt=0, le=1000)
+    concurrency: Optional[int] = Field(None, gt=0, le=32)
+    rate_per_minute: Optional[float] = Field(None, gt=0)
+
+class ReevaluationRunStatus(BaseModel):
+    id: int
+    status: str  # "pending", "running", "paused", "completed" or "failed"
+    since: Optional[datetime] = None
+    batch_size: int
+    concurrency: int
+    rate_per_minute: float
+    cursor: int
+    processed: int
+    failed: int
+    remaining: int
+    sessions_rescored: int
+    failed_interaction_ids: List[int] = []
+    last_error: Optional[str] = None
+    locked_by: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
 
 class MultiStakeholderResponse(BaseModel):
     stakeholder_id: int
@@ -4,22 +4,149 @@ scoring.py - Contains JSON schema, evaluation parsing, and scoring helper functi
 
 import json
 import logging
+import re
 logger = logging.getLogger(__name__)
 
+EVALUATION_SCORE_FIELDS = ("methodology_score", "rapport_score", "progress_score", "outcome_score")
+
+# Strict structured-output schema for evaluate_player_response. The scores come
+# first so they can be read from the stream before the free-text feedback ends.
+EVALUATION_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "methodology_score": {"type": "integer", "description": "0-100"},
+        "rapport_score": {"type": "integer", "description": "0-100"},
+        "progress_score": {"type": "integer", "description": "0-100"},
+        "outcome_score": {"type": "integer", "description": "0-100"},
+        "feedback": {"type": "string"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "weaknesses": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": list(EVALUATION_SCORE_FIELDS) + ["feedback", "strengths", "weaknesses"],
+    "additionalProperties": False,
+}
+
+EVALUATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "pacer_evaluation", "strict": True, "schema": EVALUATION_JSON_SCHEMA},
+}
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+class StreamingJSONParser:
+    """
+    Incremental parser for a top-level JSON object that arrives in chunks. Each
+    top-level field is decoded as soon as its value is complete, so the leading
+    fields (the scores) are available while later ones are still streaming, and
+    whatever was complete survives a truncated or broken response.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def feed(self, chunk: str):
+        """Consume a chunk; returns the names of the fields it completed."""
+        self._text += chunk
+        text = self._text
+        completed = []
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key is None and self._key_start is not None:
+                        self._key = self._decode(text[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+            at_field_level = self._depth == 1
+            if ch == '"':
+                self._in_string = True
+                if at_field_level and self._key is None:
+                    self._key_start = i
+                elif at_field_level and self._value_start is None:
+                    self._value_start = i
+            elif ch in "{[":
+                if at_field_level and self._key is not None and self._value_start is None:
+                    self._value_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed += self._complete_value(i)
+                    self.done = True
+            elif ch == "," and at_field_level:
+                completed += self._complete_value(i)
+            elif at_field_level and self._key is not None and self._value_start is None and ch not in ": \t\r\n":
+                self._value_start = i
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _decode(raw: str):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _complete_value(self, end: int):
+        key, start = self._key, self._value_start
+        self._key = self._value_start = None
+        if key is None or start is None:
+            return []
+        value = self._decode(self._text[start:end].strip())
+        if value is None:
+            return []
+        self.fields[key] = value
+        return [key]
+
+    def recover(self):
+        """The complete fields, plus the text so far of a string field that was cut off."""
+        recovered = dict(self.fields)
+        if not self.done and self._key is not None and self._value_start is not None and self._in_string:
+            raw = self._text[self._value_start + 1:]
+            if self._escape:
+                raw = raw[:-1]
+            partial = self._decode(f'"{raw}"')
+            if isinstance(partial, str) and partial.strip():
+                recovered[self._key] = partial.rstrip()
+        return recovered
+
+
 def parse_evaluation_json(response_text):
-    """Parse the JSON evaluation response from the AI."""
+    """
+    Parse the JSON evaluation response from the AI. A malformed or truncated
+    response yields the fields that were complete; ValueError if there are none.
+    """
+    response_text = _FENCE_RE.sub("", response_text)
     try:
-        # Clean up any potential markdown formatting
-        if response_text.startswith("```json"):
-            response_text = response_text.split("```json", 1)[1]
-        if response_text.endswith("```"):
-            response_text = response_text.rsplit("```", 1)[0]
-        evaluation = json.loads(response_text.strip())
-        return evaluation
+        return json.loads(response_text)
     except json.JSONDecodeError as e:
+        parser = StreamingJSONParser()
+        parser.feed(response_text)
+        recovered = parser.recover()
+        if recovered:
+            logger.warning(f"Recovered fields {sorted(recovered)} from malformed JSON response: {e}")
+            return recovered
         logger.error(f"Failed to parse JSON response: {e}. Original response: {response_text}")
         raise ValueError("Response not in valid JSON format")
 
+
 def calculate_total_score(evaluation):
     """Calculate the total score from the evaluation object."""
     return sum([
@@ -27,4 +154,49 @@ def calculate_total_score(evaluation):
         evaluation.get("rapport_score", 50),
         evaluation.get("progress_score", 50),
         evaluation.get("outcome_score", 50)
-    ]) / 4 
\ No newline at end of file
+    ]) / 4
+
+
+# Weights of the four evaluation categories in a session's quality score
+SESSION_SCORE_WEIGHTS = {
+    "methodology": 0.40,  # 40%
+    "rapport": 0.25,      # 25%
+    "progress": 0.20,     # 20%
+    "outcome": 0.15       # 15%
+}
+
+# Number of final interactions whose outcome scores decide the goal bonus
+GOAL_INTERACTIONS_TO_CHECK = 3
+
+
+def session_quality(evaluations):
+    """Average weighted score of a session's evaluations (InteractionEvaluation rows or None, in turn order)."""
+    weights = SESSION_SCORE_WEIGHTS
+    interaction_scores = [
+        weights["methodology"] * evaluation.methodology_score +
+        weights["rapport"] * evaluation.rapport_score +
+        weights["progress"] * evaluation.progress_score +
+        weights["outcome"] * evaluation.outcome_score
+        for evaluation in evaluations if evaluation
+    ]
+    return sum(interaction_scores) / len(interaction_scores) if interaction_scores else 0
+
+
+def session_goal_bonus(evaluations):
+    """Goal completion bonus from the outcome scores of the session's last few interactions."""
+    recent_outcome_scores = [
+        evaluation.outcome_score
+        for evaluation in evaluations[-GOAL_INTERACTIONS_TO_CHECK:] if evaluation
+    ]
+    avg_outcome_score = sum(recent_outcome_scores) / len(recent_outcome_scores) if recent_outcome_scores else 0
+    if avg_outcome_score >= 80:
+        return 15  # Goal fully achieved
+    if avg_outcome_score >= 50:
+        return 8   # Goal partially achieved
+    return 0
+
+
+def final_session_score(quality, time_bonus, difficulty_factor, goal_bonus):
+    """Final 0-100 session score from its quality, time bonus, difficulty and goal bonus."""
+    final_score = round(quality * time_bonus * difficulty_factor) + goal_bonus
+    return min(max(final_score, 0), 100)
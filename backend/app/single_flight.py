@@ -0,0 +1,105 @@
+"""
+single_flight.py - Request coalescing for identical concurrent OpenAI calls.
+
+When many users start the same scenario at once they send byte-identical
+prompts. Instead of each caller making its own upstream request, the first
+caller for a key becomes the leader and everyone else arriving while that call
+is in flight waits for and shares its result. Both asyncio and thread-based
+(sync) callers are supported; the two paths keep separate in-flight tables.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _SyncCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one upstream call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._async_calls: Dict[str, asyncio.Task] = {}
+        self._sync_calls: Dict[str, _SyncCall] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, operation: str, field: str):
+        op_stats = self._stats.setdefault(operation, {"calls": 0, "upstream": 0, "collapsed": 0})
+        op_stats[field] += 1
+
+    async def do(self, key: str, operation: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` once for all concurrent async callers with the same key."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._count(operation, "calls")
+            task = self._async_calls.get(key)
+            if task is not None and task.get_loop() is loop:
+                self._count(operation, "collapsed")
+            else:
+                self._count(operation, "upstream")
+                # Run the upstream call as its own task so a cancelled leader
+                # (e.g. a client that disconnected) does not cancel the followers
+                task = loop.create_task(fn())
+                self._async_calls[key] = task
+                task.add_done_callback(lambda t, k=key: self._forget_async(k, t))
+        return await asyncio.shield(task)
+
+    def _forget_async(self, key: str, task: asyncio.Task):
+        with self._lock:
+            if self._async_calls.get(key) is task:
+                del self._async_calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieve the exception so asyncio does not warn when every waiter was cancelled
+            logger.debug(f"Single-flight call failed: {task.exception()}")
+
+    def do_sync(self, key: str, operation: str, fn: Callable[[], Any]) -> Any:
+        """Run `fn()` once for all concurrent threads with the same key."""
+        with self._lock:
+            self._count(operation, "calls")
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                self._count(operation, "upstream")
+                call = _SyncCall()
+                self._sync_calls[key] = call
+            else:
+                self._count(operation, "collapsed")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._sync_calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            operations = {op: dict(counts) for op, counts in self._stats.items()}
+            in_flight = len(self._async_calls) + len(self._sync_calls)
+        totals = {"calls": 0, "upstream": 0, "collapsed": 0}
+        for counts in operations.values():
+            for field in totals:
+                totals[field] += counts[field]
+        return {"in_flight": in_flight, "totals": totals, "operations": operations}
+
+
+single_flight = SingleFlight()
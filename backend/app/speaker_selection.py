@@ -0,0 +1,131 @@
+"""
+speaker_selection.py - Rule-based next-speaker selection for multi-stakeholder meetings.
+
+The next speaker is predicted from the sales rep's message while the current
+stakeholder is still answering it. Many turns do not need an LLM round-trip for
+that: the rep asks another stakeholder a question by name, raises budget or
+sign-off with a decision maker in the room, or there is only one other person
+in the room. select_next_speaker() returns a decision with a
+confidence; AIService only asks the LLM when the confidence is below
+NEXT_SPEAKER_MIN_CONFIDENCE.
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NEXT_SPEAKER_MIN_CONFIDENCE = float(os.environ.get("NEXT_SPEAKER_MIN_CONFIDENCE", "0.75"))
+
+DECISION_KEYWORDS = (
+    "budget", "approve", "approval", "sign off", "sign-off", "decision",
+    "contract", "pricing", "price", "cost", "roi", "investment",
+)
+
+_stats = {"fast_path": 0, "llm_fallback": 0, "reasons": {}}
+_stats_lock = threading.Lock()
+
+
+def _name_patterns(stakeholder: Dict) -> List[str]:
+    name = (stakeholder.get("name") or "").strip()
+    if not name:
+        return []
+    parts = name.split()
+    patterns = [re.escape(name)]
+    if len(parts) > 1 and len(parts[0]) > 2:
+        patterns.append(re.escape(parts[0]))
+    return patterns
+
+
+def _last_mention(text: str, stakeholder: Dict) -> int:
+    """Return the position of the last mention of a stakeholder by name or role, or -1."""
+    position = -1
+    for pattern in _name_patterns(stakeholder):
+        for match in re.finditer(rf"\b{pattern}\b", text, re.IGNORECASE):
+            position = max(position, match.start())
+    role = (stakeholder.get("role") or "").strip()
+    if role and len(role) > 2:
+        for match in re.finditer(rf"\b{re.escape(role)}\b", text, re.IGNORECASE):
+            position = max(position, match.start())
+    return position
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s.strip()]
+
+
+def select_next_speaker(
+    stakeholders: List[Dict],
+    current_speaker_id: int,
+    player_input: str
+) -> Tuple[Optional[int], float, str]:
+    """
+    Predict who speaks after the current speaker has answered `player_input`,
+    the sales rep's message. Returns (stakeholder_id or None for the sales rep,
+    confidence between 0 and 1, reason).
+    """
+    others = [s for s in stakeholders if s.get("id") != current_speaker_id]
+    if not others:
+        return None, 1.0, "no_other_stakeholders"
+
+    text = player_input or ""
+    sentences = _sentences(text)
+
+    # 1. The rep asks someone else a question by name (or role); the latest mention wins.
+    # A passing mention ("as Sarah said") is weak evidence.
+    mentions = [(pos, s) for s in others for pos in [_last_mention(text, s)] if pos >= 0]
+    if mentions:
+        _, mentioned = max(mentions, key=lambda m: m[0])
+        in_question = any(
+            sentence.endswith("?") and _last_mention(sentence, mentioned) >= 0
+            for sentence in sentences
+        )
+        if in_question:
+            return mentioned["id"], 0.9, "addressed_by_name"
+
+    # 2. Budget or sign-off talk pulls in the decision maker, unless the current speaker is one
+    lowered = text.lower()
+    current = next((s for s in stakeholders if s.get("id") == current_speaker_id), {})
+    decision_makers = [s for s in others if s.get("is_decision_maker")]
+    if decision_makers and not current.get("is_decision_maker") and any(k in lowered for k in DECISION_KEYWORDS):
+        chosen = max(decision_makers, key=lambda s: s.get("influence_level") or 0)
+        return chosen["id"], 0.8, "decision_topic"
+
+    # 3. Only one other stakeholder
+    if len(others) == 1:
+        other = others[0]
+        influential = other.get("is_decision_maker") or (other.get("influence_level") or 0) >= 4
+        if any(sentence.endswith("?") for sentence in sentences):
+            # A question nobody else was named in is the current speaker's to answer; the rep follows up
+            return None, 0.8, "question_to_current_speaker"
+        if not influential:
+            # A minor stakeholder rarely takes the floor unprompted: the rep continues
+            return None, 0.8, "single_minor_stakeholder"
+        # An influential one may well chime in; not certain enough to skip the LLM
+        return other["id"], 0.6, "single_influential_stakeholder"
+
+    # 4. Otherwise the most influential stakeholder is the best guess, but not a confident one
+    chosen = max(others, key=lambda s: ((s.get("influence_level") or 0), bool(s.get("is_decision_maker"))))
+    return chosen["id"], 0.4, "highest_influence"
+
+
+def record_decision(fast_path: bool, reason: str):
+    with _stats_lock:
+        _stats["fast_path" if fast_path else "llm_fallback"] += 1
+        reasons = _stats["reasons"]
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+
+def get_stats() -> Dict:
+    with _stats_lock:
+        total = _stats["fast_path"] + _stats["llm_fallback"]
+        return {
+            "min_confidence": NEXT_SPEAKER_MIN_CONFIDENCE,
+            "fast_path": _stats["fast_path"],
+            "llm_fallback": _stats["llm_fallback"],
+            "fast_path_rate": round(_stats["fast_path"] / total, 4) if total else 0.0,
+            "reasons": dict(_stats["reasons"]),
+        }
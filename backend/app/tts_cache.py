@@ -0,0 +1,207 @@
+"""
+tts_cache.py - Content-addressed disk cache for synthesized speech.
+
+Audio is keyed by a SHA-256 hash of the text, voice and TTS model and stored as
+one file per entry under TTS_CACHE_DIR. A SQLite index next to the files
+records size and last access, so every uvicorn worker (and every restart)
+shares the same cache, and the least recently used files are evicted once the
+total size exceeds TTS_CACHE_MAX_MB. Files are written to a temporary name and
+renamed into place, so readers never see a partial file.
+
+Environment:
+    TTS_CACHE_ENABLED   "true"/"false" (default true)
+    TTS_CACHE_DIR       directory of the audio files and index (default ./cache/tts)
+    TTS_CACHE_MAX_MB    size bound of the cache in megabytes (default 500)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = os.environ.get("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+TTS_CACHE_MAX_MB = float(os.environ.get("TTS_CACHE_MAX_MB", "500"))
+
+# Last-access times are only rewritten when older than this, to keep hits read-only
+TOUCH_INTERVAL_SECONDS = 60
+# Eviction frees space down to this fraction of the bound, so it does not run on every store
+EVICT_TO_FRACTION = 0.9
+
+
+def make_cache_key(text: str, voice: str, model: str, audio_format: str = "mp3") -> str:
+    """Return the content-addressed key for a speech request."""
+    payload = json.dumps(
+        {"text": text, "voice": voice, "model": model, "format": audio_format},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Size-bounded LRU cache of audio files with a shared SQLite index."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_served": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False, timeout=10)
+        # WAL lets the workers read the index while one of them writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tts_cache ("
+            "key TEXT PRIMARY KEY, voice TEXT, model TEXT, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_tts_cache_last_access ON tts_cache (last_access)")
+        self._db.commit()
+        logger.info(f"TTS cache at {directory} (max {max_bytes // (1024 * 1024)} MB)")
+
+    def path_for(self, key: str, audio_format: str = "mp3") -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{audio_format}")
+
+    def lookup(self, key: str, audio_format: str = "mp3") -> Optional[str]:
+        """Path of the cached audio for `key`, or None on a miss."""
+        path = self.path_for(key, audio_format)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT last_access FROM tts_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and not os.path.exists(path):
+                    # Evicted (or removed by hand) behind the index's back
+                    self._db.execute("DELETE FROM tts_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    row = None
+                if row is not None and now - row[0] > TOUCH_INTERVAL_SECONDS:
+                    self._db.execute("UPDATE tts_cache SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"TTS cache read failed: {e}")
+                row = None
+            self._stats["hits" if row is not None else "misses"] += 1
+        return path if row is not None else None
+
+    def get(self, key: str, audio_format: str = "mp3") -> Optional[bytes]:
+        path = self.lookup(key, audio_format)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+        except OSError as e:
+            logger.warning(f"TTS cache file {path} unreadable: {e}")
+            return None
+        with self._lock:
+            self._stats["bytes_served"] += len(audio)
+        return audio
+
+    def set(self, key: str, audio: bytes, voice: str, model: str, audio_format: str = "mp3") -> Optional[str]:
+        """Store audio for `key` and return its path."""
+        if not audio or len(audio) > self.max_bytes:
+            return None
+        path = self.path_for(key, audio_format)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        now = time.time()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"TTS cache write failed: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tts_cache (key, voice, model, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, voice, model, len(audio), now, now),
+                )
+                self._db.commit()
+                self._stats["stores"] += 1
+                self._evict()
+            except sqlite3.Error as e:
+                logger.error(f"TTS cache index write failed: {e}")
+        return path
+
+    def _evict(self):
+        """Delete the least recently used files while the cache is over its bound. Caller holds the lock."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM tts_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO_FRACTION
+        rows = self._db.execute("SELECT key, size FROM tts_cache ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict TTS cache file for {key}: {e}")
+                continue
+            evicted.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM tts_cache WHERE key = ?", evicted)
+        self._db.commit()
+        self._stats["evictions"] += len(evicted)
+        logger.info(f"TTS cache evicted {len(evicted)} files")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            try:
+                entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tts_cache").fetchone()
+            except sqlite3.Error:
+                entries, total = None, None
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": True,
+                "directory": self.directory,
+                "entries": entries,
+                "total_bytes": total,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[TTSCache]:
+    """Return the process-wide cache, or None when disabled or the directory is unusable."""
+    global _cache, TTS_CACHE_ENABLED
+    if not TTS_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = TTSCache(TTS_CACHE_DIR, int(TTS_CACHE_MAX_MB * 1024 * 1024))
+                except (OSError, sqlite3.Error) as e:
+                    logger.error(f"Could not open TTS cache at {TTS_CACHE_DIR}, caching disabled: {e}")
+                    TTS_CACHE_ENABLED = False
+                    return None
+    return _cache
+
+
+def get_stats() -> Dict:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,154 @@
+"""
+voice_pipeline.py - Sentence-pipelined speech for streamed replies in PACER AI Service.
+
+A spoken reply used to start only after the whole text had been generated and
+then synthesized in one piece. speak_stream() sits behind a streamed LLM reply:
+it passes the text through unchanged, cuts it into sentences as they complete,
+and synthesizes each sentence as soon as it is complete (at most
+TTS_PIPELINE_PARALLELISM at a time). Audio segments are emitted strictly in
+sentence order, so the persona starts speaking after the first sentence while
+the rest of the reply is still being written.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import re
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Sentences synthesized at the same time for one reply
+TTS_PIPELINE_PARALLELISM = int(os.environ.get("TTS_PIPELINE_PARALLELISM", "3"))
+# Shorter sentences are merged with the next one: a lone "Sure." sounds clipped
+TTS_PIPELINE_MIN_SENTENCE_CHARS = int(os.environ.get("TTS_PIPELINE_MIN_SENTENCE_CHARS", "20"))
+
+# End of a sentence: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or a line break
+_BOUNDARY_RE = re.compile(r"([.!?…]+[\"'”’)\]]*)\s+|\n+")
+_ABBREVIATION_RE = re.compile(r"\b(mr|mrs|ms|dr|prof|sr|jr|st|vs|etc|inc|ltd|co|e\.g|i\.e|approx|no)\.$", re.IGNORECASE)
+
+
+class SentenceSegmenter:
+    """Incrementally split streamed text into complete sentences."""
+
+    def __init__(self, min_chars: int = TTS_PIPELINE_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _BOUNDARY_RE.finditer(self._buffer):
+            end = match.end(1) if match.group(1) else match.start()
+            candidate = self._buffer[start:end].strip()
+            if not candidate:
+                start = match.end()
+                continue
+            if _ABBREVIATION_RE.search(candidate) or len(candidate) < self.min_chars:
+                # Not a sentence end yet ("Dr. Smith"), or too short to speak on its own
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """The trailing text once the stream has ended."""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def _as_control(chunk: Union[str, Dict]) -> Optional[Dict]:
+    """The control message a chunk carries, or None for reply text."""
+    # Same convention as the stream routes: JSON objects are control messages, anything else is text
+    if isinstance(chunk, dict):
+        return chunk
+    if chunk.lstrip().startswith("{"):
+        try:
+            return json.loads(chunk)
+        except ValueError:
+            return None
+    return None
+
+
+def _segment(index: int, sentence: str, audio: bytes) -> Dict:
+    return {
+        "audio_segment": {
+            "index": index,
+            "text": sentence,
+            "format": "mp3",
+            "audio": base64.b64encode(audio).decode("ascii"),
+        }
+    }
+
+
+async def speak_stream(
+    chunks: AsyncIterator[Union[str, Dict]],
+    synthesize: Callable[[str], Awaitable[bytes]],
+    parallelism: int = TTS_PIPELINE_PARALLELISM,
+) -> AsyncIterator[Union[str, Dict]]:
+    """
+    Relay a streamed reply and interleave ordered {"audio_segment": ...} messages.
+    Text chunks pass through as they arrive. Control messages (the final chunk,
+    errors) are held back until every audio segment has been emitted, so the
+    final chunk is still the last message of the stream.
+    """
+    segmenter = SentenceSegmenter()
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    pending = deque()  # (index, sentence, task) in sentence order
+    held = []
+    next_index = 0
+    streamed_text = False
+
+    async def synthesize_bounded(sentence: str) -> bytes:
+        async with semaphore:
+            return await synthesize(sentence)
+
+    def start(sentences: List[str]):
+        nonlocal next_index
+        for sentence in sentences:
+            pending.append((next_index, sentence, asyncio.create_task(synthesize_bounded(sentence))))
+            next_index += 1
+
+    async def pop_segment() -> Dict:
+        index, sentence, task = pending.popleft()
+        try:
+            audio = await task
+        except Exception as e:
+            logger.warning(f"Speech synthesis failed for sentence {index}: {e}")
+            audio = b""
+        return _segment(index, sentence, audio)
+
+    try:
+        async for chunk in chunks:
+            control = _as_control(chunk)
+            if control is not None:
+                held.append(control)
+                continue
+            streamed_text = True
+            yield chunk
+            start(segmenter.feed(chunk))
+            # Emit whatever is ready at the head of the queue without waiting
+            while pending and pending[0][2].done():
+                yield await pop_segment()
+
+        final = next((control for control in held if control.get("is_final")), None)
+        if final is not None and not streamed_text and final.get("text"):
+            # Nothing was streamed (e.g. a non-streaming fallback): speak the final text
+            start(segmenter.feed(final["text"]))
+        if final is None or not final.get("partial"):
+            # A partial reply was cut back to its last complete sentence; do not speak the rest
+            start(segmenter.flush())
+        while pending:
+            yield await pop_segment()
+        for control in held:
+            yield control
+    finally:
+        for _, _, task in pending:
+            task.cancel()
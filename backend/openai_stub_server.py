@@ -0,0 +1,384 @@
+"""
+openai_stub_server.py - Local OpenAI-compatible stub for load testing the PACER backend.
+
+Implements the subset of the OpenAI API the backend uses, so the real client code
+paths can be benchmarked offline:
+
+    POST /v1/chat/completions       (streaming and non-streaming)
+    POST /v1/audio/transcriptions
+    POST /v1/audio/speech           (chunked MP3 of silence)
+    POST /v1/realtime/sessions      (ephemeral token)
+    WS   /v1/realtime               (session/response event flow with PCM16 audio)
+    GET  /stats                     (request and injected-error counters)
+
+Point the backend at it with:
+    OPENAI_BASE_URL=http://localhost:8010/v1
+    OPENAI_API_KEY=stub
+
+Behaviour is configured from the environment (or the matching CLI flags):
+    STUB_LATENCY_DIST       fixed | uniform | normal | lognormal (default lognormal)
+    STUB_LATENCY_MS         median/mean time to first byte in ms (default 400)
+    STUB_LATENCY_JITTER_MS  spread of the distribution in ms (default 150)
+    STUB_TOKENS_PER_SECOND  generation speed for streamed text (default 60)
+    STUB_ERROR_RATE         fraction of requests answered with HTTP 500 (default 0)
+    STUB_RATE_LIMIT_RATE    fraction of requests answered with HTTP 429 (default 0)
+    STUB_TIMEOUT_RATE       fraction of requests that hang for STUB_TIMEOUT_SECONDS (default 0)
+    STUB_TIMEOUT_SECONDS    how long a "timed out" request hangs (default 120)
+    STUB_SEED               random seed for reproducible runs
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger("openai_stub")
+
+CONFIG = {
+    "latency_dist": os.environ.get("STUB_LATENCY_DIST", "lognormal"),
+    "latency_ms": float(os.environ.get("STUB_LATENCY_MS", "400")),
+    "latency_jitter_ms": float(os.environ.get("STUB_LATENCY_JITTER_MS", "150")),
+    "tokens_per_second": float(os.environ.get("STUB_TOKENS_PER_SECOND", "60")),
+    "error_rate": float(os.environ.get("STUB_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.environ.get("STUB_RATE_LIMIT_RATE", "0")),
+    "timeout_rate": float(os.environ.get("STUB_TIMEOUT_RATE", "0")),
+    "timeout_seconds": float(os.environ.get("STUB_TIMEOUT_SECONDS", "120")),
+}
+
+if os.environ.get("STUB_SEED"):
+    random.seed(int(os.environ["STUB_SEED"]))
+
+stats = Counter()
+
+app = FastAPI(title="OpenAI stub for PACER load tests")
+
+CLIENT_REPLIES = [
+    "That's an interesting point. Our main concern right now is how long settlement takes with our current provider, and the fees keep creeping up.",
+    "We've looked at a few options already. What would make your solution different when it comes to integrating with our existing ERP?",
+    "Security is non-negotiable for us. Can you walk me through how you handle PCI compliance and fraud monitoring?",
+    "I'd need to understand the total cost of ownership before taking this to our CFO. Do you have any references from companies our size?",
+    "Honestly, the team is stretched thin. Any migration would have to be low-touch for our developers.",
+]
+
+EVALUATION_JSON = {
+    "methodology_score": 72,
+    "rapport_score": 68,
+    "progress_score": 64,
+    "outcome_score": 60,
+    "feedback": "Good discovery question; tie it back to the client's stated pain points.",
+    "skills_demonstrated": {"questioning": 3, "active_listening": 2},
+    "strength": "Asked an open question that invites the client to share priorities.",
+    "improvement": "Quantify the impact of the pain point before proposing a solution.",
+    "methodology_feedback": "Follows the current PACER stage reasonably well.",
+    "rapport_feedback": "Tone is professional and friendly.",
+    "progress_feedback": "The conversation moves forward but lacks a clear next step.",
+    "outcome_feedback": "No commitment secured yet.",
+}
+
+
+# --- Latency, token rate and error injection ---
+
+def sample_latency() -> float:
+    """Time to first byte in seconds, drawn from the configured distribution."""
+    mean = CONFIG["latency_ms"] / 1000
+    jitter = CONFIG["latency_jitter_ms"] / 1000
+    dist = CONFIG["latency_dist"]
+    if dist == "fixed":
+        value = mean
+    elif dist == "uniform":
+        value = random.uniform(mean - jitter, mean + jitter)
+    elif dist == "normal":
+        value = random.gauss(mean, jitter)
+    else:
+        # Lognormal with the given median; jitter controls the tail
+        sigma = math.log1p(jitter / mean) if mean > 0 else 0.5
+        value = random.lognormvariate(math.log(mean) if mean > 0 else -5, sigma)
+    return max(0.0, value)
+
+
+def token_delay() -> float:
+    rate = CONFIG["tokens_per_second"]
+    return 1.0 / rate if rate > 0 else 0.0
+
+
+async def inject_failure(endpoint: str):
+    """Return an error response to send instead of the real one, or None."""
+    stats[f"requests:{endpoint}"] += 1
+    roll = random.random()
+    if roll < CONFIG["timeout_rate"]:
+        stats[f"timeouts:{endpoint}"] += 1
+        await asyncio.sleep(CONFIG["timeout_seconds"])
+        return JSONResponse(status_code=504, content={"error": {"message": "Stub timeout", "type": "timeout"}})
+    roll -= CONFIG["timeout_rate"]
+    if roll < CONFIG["rate_limit_rate"]:
+        stats[f"rate_limited:{endpoint}"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": "1"},
+            content={"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+        )
+    roll -= CONFIG["rate_limit_rate"]
+    if roll < CONFIG["error_rate"]:
+        stats[f"errors:{endpoint}"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Injected server error (stub)", "type": "server_error"}})
+    return None
+
+
+def _tokens(text: str):
+    # Split into word-ish pieces that keep their leading space, like real deltas
+    words = text.split(" ")
+    return [words[0]] + [f" {w}" for w in words[1:]]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# --- Chat completions ---
+
+def _reply_for(messages) -> str:
+    """Pick a plausible reply shape for the backend's prompt types."""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    last_user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    prompt = f"{system}\n{last_user}".lower()
+    if "determines conversation flow" in system:
+        return "none"
+    if "running summaries" in system:
+        return "The client described slow settlement and rising fees, and asked about ERP integration and security."
+    if "json" in prompt and ("evaluat" in prompt or "score" in prompt):
+        if "impact_score" in prompt:
+            return json.dumps({"impact_score": 65, "resolution": "Thanks for handling that calmly.", "feedback": "Acknowledge the issue before moving on."})
+        return json.dumps(EVALUATION_JSON)
+    if "json" in prompt:
+        return json.dumps({"summary": "Stub summary.", "advantages": [], "objections": [], "talking_points": [], "emphasis_points": []})
+    reply = random.choice(CLIENT_REPLIES)
+    if "thoughts:" in system:
+        reply += "\nTHOUGHTS: Cautiously interested, waiting to see concrete numbers."
+    return reply
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await inject_failure("chat")
+    if failure is not None:
+        return failure
+
+    model = body.get("model", "gpt-4o-mini")
+    messages = body.get("messages", [])
+    reply = _reply_for(messages)
+    max_tokens = body.get("max_tokens")
+    if max_tokens:
+        reply = "".join(_tokens(reply)[:max_tokens])
+    completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    prompt_tokens = sum(_estimate_tokens(m.get("content", "") or "") for m in messages)
+
+    await asyncio.sleep(sample_latency())
+
+    if not body.get("stream"):
+        await asyncio.sleep(token_delay() * len(_tokens(reply)))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": _estimate_tokens(reply),
+                "total_tokens": prompt_tokens + _estimate_tokens(reply),
+            },
+        }
+
+    async def event_stream():
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }) + "\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        for token in _tokens(reply):
+            yield chunk({"content": token})
+            await asyncio.sleep(token_delay())
+        yield chunk({}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+# --- Audio ---
+
+@app.post("/v1/audio/transcriptions")
+async def audio_transcriptions(request: Request):
+    form = await request.form()
+    failure = await inject_failure("transcriptions")
+    if failure is not None:
+        return failure
+    upload = form.get("file")
+    size = len(await upload.read()) if upload is not None and hasattr(upload, "read") else 0
+    # Roughly scale with the amount of audio, as the real service does
+    await asyncio.sleep(sample_latency() + size / 2_000_000)
+    text = "Hello, I'd like to understand how your payment platform could reduce our processing costs."
+    if form.get("response_format") == "text":
+        return StreamingResponse(iter([text]), media_type="text/plain")
+    return {"text": text}
+
+
+# One MPEG-1 Layer III frame (128 kbps, 44.1 kHz) of silence: 417 bytes, ~26 ms of audio
+_MP3_SILENT_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+
+
+@app.post("/v1/audio/speech")
+async def audio_speech(request: Request):
+    body = await request.json()
+    failure = await inject_failure("speech")
+    if failure is not None:
+        return failure
+    text = body.get("input", "")
+    # ~15 characters per second of speech, 26 ms per frame
+    frames = max(1, int(len(text) / 15 / 0.026))
+    frames_per_chunk = 40
+
+    await asyncio.sleep(sample_latency())
+
+    async def audio_stream():
+        sent = 0
+        while sent < frames:
+            count = min(frames_per_chunk, frames - sent)
+            yield _MP3_SILENT_FRAME * count
+            sent += count
+            # Synthesis runs several times faster than real time
+            await asyncio.sleep(count * 0.026 / 8)
+
+    return StreamingResponse(audio_stream(), media_type="audio/mpeg")
+
+
+# --- Realtime ---
+
+@app.post("/v1/realtime/sessions")
+async def realtime_sessions(request: Request):
+    body = await request.json()
+    failure = await inject_failure("realtime_sessions")
+    if failure is not None:
+        return failure
+    await asyncio.sleep(sample_latency())
+    return {
+        "id": f"sess_stub_{uuid.uuid4().hex[:12]}",
+        "object": "realtime.session",
+        "model": body.get("model"),
+        "voice": body.get("voice", "alloy"),
+        "client_secret": {"value": f"ek_stub_{uuid.uuid4().hex}", "expires_at": int(time.time()) + 60},
+    }
+
+
+def _event(event_type: str, **fields) -> str:
+    return json.dumps({"type": event_type, "event_id": f"event_{uuid.uuid4().hex[:12]}", **fields})
+
+
+async def _realtime_response(websocket: WebSocket):
+    response_id = f"resp_{uuid.uuid4().hex[:12]}"
+    item_id = f"item_{uuid.uuid4().hex[:12]}"
+    reply = random.choice(CLIENT_REPLIES)
+    await asyncio.sleep(sample_latency())
+    await websocket.send_text(_event("response.created", response={"id": response_id, "status": "in_progress"}))
+    for token in _tokens(reply):
+        await websocket.send_text(_event("response.audio_transcript.delta", response_id=response_id, item_id=item_id, delta=token))
+        # 24 kHz PCM16 mono silence, ~100 ms per token
+        await websocket.send_text(_event(
+            "response.audio.delta",
+            response_id=response_id,
+            item_id=item_id,
+            delta=base64.b64encode(bytes(4800)).decode("ascii"),
+        ))
+        await asyncio.sleep(token_delay())
+    await websocket.send_text(_event("response.audio_transcript.done", response_id=response_id, item_id=item_id, transcript=reply))
+    await websocket.send_text(_event("response.audio.done", response_id=response_id, item_id=item_id))
+    await websocket.send_text(_event("response.done", response={"id": response_id, "status": "completed"}))
+
+
+@app.websocket("/v1/realtime")
+async def realtime(websocket: WebSocket):
+    await websocket.accept()
+    stats["requests:realtime_ws"] += 1
+    session_id = f"sess_stub_{uuid.uuid4().hex[:12]}"
+    await websocket.send_text(_event("session.created", session={"id": session_id, "model": websocket.query_params.get("model")}))
+    buffered_bytes = 0
+    try:
+        while True:
+            message = json.loads(await websocket.receive_text())
+            msg_type = message.get("type")
+            if msg_type == "session.update":
+                await websocket.send_text(_event("session.updated", session={"id": session_id, **message.get("session", {})}))
+            elif msg_type == "input_audio_buffer.append":
+                buffered_bytes += len(message.get("audio", "")) * 3 // 4
+            elif msg_type == "input_audio_buffer.commit":
+                await websocket.send_text(_event("input_audio_buffer.committed", item_id=f"item_{uuid.uuid4().hex[:12]}"))
+                if buffered_bytes:
+                    await websocket.send_text(_event(
+                        "conversation.item.input_audio_transcription.completed",
+                        transcript="Can you tell me more about your pricing?",
+                    ))
+                buffered_bytes = 0
+                await _realtime_response(websocket)
+            elif msg_type == "response.create":
+                await _realtime_response(websocket)
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/stats")
+async def get_stats():
+    return {"config": CONFIG, "counters": dict(stats)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server for PACER load tests")
+    parser.add_argument("--host", default=os.environ.get("STUB_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("STUB_PORT", "8010")))
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--latency-ms", type=float)
+    parser.add_argument("--latency-jitter-ms", type=float)
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--rate-limit-rate", type=float)
+    parser.add_argument("--timeout-rate", type=float)
+    args = parser.parse_args()
+
+    for key in ("latency_dist", "latency_ms", "latency_jitter_ms", "tokens_per_second",
+                "error_rate", "rate_limit_rate", "timeout_rate"):
+        value = getattr(args, key)
+        if value is not None:
+            CONFIG[key] = value
+
+    logger.info(f"Starting OpenAI stub on {args.host}:{args.port} with {CONFIG}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
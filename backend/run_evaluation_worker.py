@@ -0,0 +1,70 @@
+"""
+Standalone worker for the durable evaluation queue (app/evaluation_queue.py).
+
+Run one or more of these next to the API to scale scoring independently of the
+API workers; set EVALUATION_EMBEDDED_WORKER=false on the API in that case.
+
+    python run_evaluation_worker.py --concurrency 8
+    python run_evaluation_worker.py --once   # drain the due jobs and exit
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+
+from dotenv import load_dotenv
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+# Load .env before importing the app so the database URL and OpenAI settings are picked up
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+
+async def main(args):
+    from app import models
+    from app.database import engine
+    from app import evaluation_jobs  # noqa: F401 - registers the job handlers
+    from app import evaluation_queue
+
+    models.Base.metadata.create_all(bind=engine)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows; Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    await evaluation_queue.run_worker(
+        concurrency=args.concurrency,
+        poll_interval=args.poll_interval,
+        stop=stop,
+        once=args.once
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run PACER evaluation jobs from the database queue")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("EVALUATION_WORKER_CONCURRENCY", "4")),
+                        help="Maximum number of jobs running at once")
+    parser.add_argument("--poll-interval", type=float, default=float(os.environ.get("EVALUATION_POLL_INTERVAL", "1.0")),
+                        help="Seconds between queue polls when idle")
+    parser.add_argument("--once", action="store_true", help="Exit once no due jobs are left")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        logger.info("Evaluation worker interrupted")
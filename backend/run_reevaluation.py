@@ -0,0 +1,119 @@
+"""
+Bulk re-evaluation of stored interactions (app/reevaluation.py).
+
+Re-scores every evaluated interaction with the current evaluation rubric and
+recomputes the scores of the completed sessions they belong to. Progress is
+checkpointed per chunk: stop it with Ctrl+C and pick it up again with --resume.
+
+    python run_reevaluation.py --rate 30 --concurrency 2
+    python run_reevaluation.py --since 2025-01-01
+    python run_reevaluation.py --resume 3
+    python run_reevaluation.py --status 3
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+# Load .env before importing the app so the database URL and OpenAI settings are picked up
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+
+def print_status(db, run_id):
+    from app import models, reevaluation
+
+    run = db.get(models.ReevaluationRun, run_id)
+    if run is None:
+        logger.error(f"Re-evaluation run {run_id} not found")
+        return False
+    print(json.dumps(reevaluation.run_status(db, run), indent=2, default=str))
+    return True
+
+
+async def main(args):
+    from app import models
+    from app.database import engine, SessionLocal
+    from app import evaluation_queue, reevaluation
+
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        if args.status is not None:
+            return 0 if print_status(db, args.status) else 1
+        if args.resume is not None:
+            run_id = args.resume
+        else:
+            run_id = reevaluation.create_run(
+                db,
+                since=args.since,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                rate_per_minute=args.rate
+            ).id
+        worker_id = evaluation_queue.new_worker_id()
+        try:
+            claimed = reevaluation.claim_run(db, run_id, worker_id)
+        except RuntimeError as e:
+            logger.error(str(e))
+            return 1
+        if not claimed:
+            logger.error(f"Re-evaluation run {run_id} does not exist, is completed or is held by another process")
+            return 1
+    finally:
+        db.close()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows; Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    status = await reevaluation.run_reevaluation(run_id, worker_id, stop)
+    db = SessionLocal()
+    try:
+        print_status(db, run_id)
+    finally:
+        db.close()
+    if status == "paused":
+        logger.info(f"Resume with: python run_reevaluation.py --resume {run_id}")
+    return 0 if status in ("completed", "paused") else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-evaluate stored PACER interactions with the current rubric")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="Only re-score interactions from this ISO date/time on")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Interactions per checkpointed chunk (REEVALUATION_BATCH_SIZE)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Maximum LLM calls in flight (REEVALUATION_CONCURRENCY)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum LLM calls started per minute (REEVALUATION_RATE_PER_MINUTE)")
+    parser.add_argument("--resume", type=int, metavar="RUN_ID", help="Resume an existing run from its checkpoint")
+    parser.add_argument("--status", type=int, metavar="RUN_ID", help="Print the progress of a run and exit")
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(main(args)))
+    except KeyboardInterrupt:
+        logger.info("Re-evaluation interrupted; resume it with --resume")
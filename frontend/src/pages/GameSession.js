@@ -879,6 +879,18 @@
                     hasReceivedFinalChunk = true;
                     if (chunk.evaluation) {
                       processEvaluationData(chunk.evaluation);
+                    } else if (chunk.evaluation_pending && chunk.interaction_id) {
+                      // Show the instant pre-score until the full evaluation replaces it
+                      if (chunk.provisional_evaluation) {
+                        processEvaluationData(chunk.provisional_evaluation);
+                      }
+                      apiService.sessions.waitForInteractionEvaluation(sessionId, chunk.interaction_id)
+                        .then(evaluation => {
+                          if (evaluation) {
+                            processEvaluationData(evaluation);
+                          }
+                        })
+                        .catch(err => console.error(`[STREAM ${conversationId}] Failed to fetch evaluation:`, err));
                     }
                     const createDeterministicId = (role, content) => {
                       const contentHash = (content || '')
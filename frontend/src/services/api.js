@@ -338,6 +338,25 @@ const apiService = {
         throw error;
       }
     },
+    // Poll for the background evaluation of a streamed turn; `wait` long-polls on the server
+    waitForInteractionEvaluation: async (sessionId, interactionId, { wait = 10, maxAttempts = 6 } = {}) => {
+      for (let attempt = 0; attempt < maxAttempts; attempt++) {
+        const response = await axiosInstance.get(
+          `/game/sessions/${sessionId}/interactions/${interactionId}/evaluation`,
+          { params: { wait } }
+        );
+        const { status, evaluation } = response.data;
+        if (status === 'completed') {
+          return evaluation;
+        }
+        if (status !== 'pending') {
+          console.warn(`Evaluation for interaction ${interactionId} ended with status ${status}`);
+          return null;
+        }
+      }
+      console.warn(`Evaluation for interaction ${interactionId} still pending after ${maxAttempts} attempts`);
+      return null;
+    },
     speechToText: (sessionId, audioBlob) => {
       const formData = new FormData();
       formData.append('audio_file', audioBlob, 'audio.wav');